@@ -0,0 +1,122 @@
+# core/catalogo.py
+"""
+Caché de las consultas AJAX del asistente de ventas (lotes de un proyecto,
+configuración Commeta de un lote, datos de un plan).
+
+Cada proyecto lleva un contador, Proyecto.version_catalogo, que las señales
+de core/signals.py suben cuando cambia algo que esas consultas devuelven: el
+proyecto, sus lotes, sus configuraciones Commeta o sus vendedores. Con la
+versión (y el actualizado_en del plan) se arma el ETag de cada respuesta:
+
+  - si el navegador ya tiene esa versión se responde 304 sin cuerpo;
+  - si no, el cuerpo sale de la caché de Django con el ETag como llave y
+    sólo se arma con la vista la primera vez.
+
+Validar cuesta una consulta por llave primaria, en lugar de las consultas
+de la vista.
+"""
+from functools import wraps
+
+from django.core.cache import cache
+from django.db.models import F
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .models import Lote, Proyecto
+
+TIEMPO_CACHE = 60 * 60  # el ETag cambia con la versión, así que puede vivir mucho
+
+
+def subir_version(proyecto_ids):
+    """Invalida las consultas en caché de los proyectos `proyecto_ids`."""
+    proyecto_ids = [pk for pk in proyecto_ids if pk is not None]
+    if proyecto_ids:
+        Proyecto.objects.filter(pk__in=proyecto_ids).update(
+            version_catalogo=F('version_catalogo') + 1,
+            catalogo_actualizado_en=timezone.now(),
+        )
+
+
+def version_proyecto(proyecto_id):
+    """(etag, última modificación) de los lotes del proyecto, o None si no existe."""
+    fila = Proyecto.objects.filter(pk=proyecto_id).values_list(
+        'version_catalogo', 'catalogo_actualizado_en'
+    ).first()
+    if fila is None:
+        return None
+    version, modificado = fila
+    return f'proyecto-{proyecto_id}-v{version}', modificado
+
+
+def version_lote(lote_id):
+    """(etag, última modificación) de los datos de un lote, o None si no existe."""
+    fila = Lote.objects.filter(pk=lote_id).values_list(
+        'proyecto__version_catalogo', 'proyecto__catalogo_actualizado_en'
+    ).first()
+    if fila is None:
+        return None
+    version, modificado = fila
+    return f'lote-{lote_id}-v{version}', modificado
+
+
+def version_plan(financiamiento_id):
+    """
+    (etag, última modificación) de los datos de un plan: su actualizado_en y
+    la versión de su proyecto. None si el plan no existe.
+    """
+    from financiamiento.models import Financiamiento
+
+    fila = Financiamiento.objects.filter(pk=financiamiento_id).values_list(
+        'actualizado_en', 'lote__proyecto__version_catalogo', 'lote__proyecto__catalogo_actualizado_en'
+    ).first()
+    if fila is None:
+        return None
+    actualizado_en, version, modificado = fila
+    if modificado is None or actualizado_en > modificado:
+        modificado = actualizado_en
+    return f'plan-{financiamiento_id}-{actualizado_en.timestamp():.6f}-v{version}', modificado
+
+
+def consulta_en_cache(validador, prefijo):
+    """
+    Decorador para vistas GET de consulta. `validador(request, *args, **kwargs)`
+    devuelve (etag, última modificación) o None si no hay qué validar (la
+    vista responde como siempre, p. ej. con un 404). `prefijo` distingue las
+    vistas que comparten validador.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            validacion = validador(request, *args, **kwargs)
+            if validacion is None:
+                return vista(request, *args, **kwargs)
+
+            etag, modificado = validacion
+            etag = quote_etag(f'{prefijo}-{etag}')
+            modificado = int(modificado.timestamp()) if modificado else None
+
+            respuesta = get_conditional_response(request, etag=etag, last_modified=modificado)
+            if respuesta is None:
+                guardada = cache.get(f'consulta:{etag}')
+                if guardada is not None:
+                    contenido, content_type = guardada
+                    respuesta = HttpResponse(contenido, content_type=content_type)
+                else:
+                    respuesta = vista(request, *args, **kwargs)
+                    if respuesta.status_code == 200:
+                        cache.set(
+                            f'consulta:{etag}',
+                            (respuesta.content, respuesta['Content-Type']),
+                            TIEMPO_CACHE,
+                        )
+
+            respuesta.headers.setdefault('ETag', etag)
+            if modificado:
+                respuesta.headers.setdefault('Last-Modified', http_date(modificado))
+            # El navegador guarda la respuesta pero la valida en cada uso
+            patch_cache_control(respuesta, private=True, no_cache=True)
+            return respuesta
+        return envoltura
+    return decorador
@@ -0,0 +1,49 @@
+# Generated by Django 5.0.3 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+from core.utils import normalizar_busqueda
+
+
+def llenar_nombre_busqueda(apps, schema_editor):
+    Cliente = apps.get_model('core', 'Cliente')
+    clientes = []
+    for cliente in Cliente.objects.only('pk', 'nombre_completo').iterator(chunk_size=1000):
+        cliente.nombre_busqueda = normalizar_busqueda(cliente.nombre_completo)
+        clientes.append(cliente)
+    Cliente.objects.bulk_update(clientes, ['nombre_busqueda'], batch_size=1000)
+
+
+def crear_indice_trigramas(apps, schema_editor):
+    # En PostgreSQL un índice de trigramas hace que el LIKE '%...%' de la
+    # búsqueda use índice; en otras bases basta el índice normal.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS core_cliente_nombre_busqueda_trgm '
+        'ON core_cliente USING gin (nombre_busqueda gin_trgm_ops)'
+    )
+
+
+def borrar_indice_trigramas(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS core_cliente_nombre_busqueda_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_beneficiario_parentesco'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='nombre_busqueda',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=150),
+        ),
+        migrations.RunPython(llenar_nombre_busqueda, migrations.RunPython.noop),
+        migrations.RunPython(crear_indice_trigramas, borrar_indice_trigramas),
+    ]
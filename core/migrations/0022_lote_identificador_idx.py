@@ -0,0 +1,17 @@
+# Generated by Django 5.0.3 on 2026-10-18 22:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_cliente_nombre_busqueda'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lote',
+            index=models.Index(fields=['identificador'], name='lote_identificador_idx'),
+        ),
+    ]
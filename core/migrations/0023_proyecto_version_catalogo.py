@@ -0,0 +1,23 @@
+# Generated by Django 5.0.3 on 2026-10-18 23:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_lote_identificador_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proyecto',
+            name='version_catalogo',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='proyecto',
+            name='catalogo_actualizado_en',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
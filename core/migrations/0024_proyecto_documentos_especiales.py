@@ -0,0 +1,52 @@
+# Los campos incluir_* de Proyecto se perdieron al compactar las migraciones
+# 0012-0018: las bases existentes ya tienen las columnas, pero una base nueva
+# (la de pruebas, por ejemplo) no. Se registran en el estado y sólo se crean
+# las columnas que falten.
+
+from django.db import migrations, models
+
+
+CAMPOS = ('incluir_cesion_derechos', 'incluir_constancia_cesion', 'incluir_constancia_posesion')
+
+
+def agregar_columnas_faltantes(apps, schema_editor):
+    Proyecto = apps.get_model('core', 'Proyecto')
+    conexion = schema_editor.connection
+    with conexion.cursor() as cursor:
+        columnas = {
+            columna.name
+            for columna in conexion.introspection.get_table_description(cursor, Proyecto._meta.db_table)
+        }
+    for nombre in CAMPOS:
+        if nombre not in columnas:
+            schema_editor.add_field(Proyecto, Proyecto._meta.get_field(nombre))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_proyecto_version_catalogo'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddField(
+                    model_name='proyecto',
+                    name='incluir_cesion_derechos',
+                    field=models.BooleanField(default=False, help_text='Indica si el proyecto cuenta con documento de Cesión de Derechos', verbose_name='Incluir Cesión de Derechos'),
+                ),
+                migrations.AddField(
+                    model_name='proyecto',
+                    name='incluir_constancia_cesion',
+                    field=models.BooleanField(default=False, help_text='Indica si el proyecto cuenta con Constancia de Cesión de Derechos', verbose_name='Incluir Constancia de Cesión'),
+                ),
+                migrations.AddField(
+                    model_name='proyecto',
+                    name='incluir_constancia_posesion',
+                    field=models.BooleanField(default=False, help_text='Indica si el proyecto cuenta con Constancia de Posesión', verbose_name='Incluir Constancia de Posesión'),
+                ),
+            ],
+        ),
+        migrations.RunPython(agregar_columnas_faltantes, migrations.RunPython.noop),
+    ]
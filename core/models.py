@@ -3,6 +3,7 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
 from workflow.utils import calcular_superficie
+from .utils import normalizar_busqueda
 
 class Proyecto(models.Model):
     TIPO_PROYECTO_CHOICES = [
@@ -41,9 +42,28 @@ class Proyecto(models.Model):
         help_text="Indica si el proyecto cuenta con Constancia de Posesión"
     )
 
+    # Sube cuando cambia algo de las consultas AJAX del asistente (ver core/catalogo.py)
+    version_catalogo = models.PositiveIntegerField(default=0, editable=False)
+    catalogo_actualizado_en = models.DateTimeField(null=True, blank=True, editable=False)
+
+    # Sólo los escribe subir_version(), con F(). Si save() los incluyera, una
+    # instancia cargada antes de subir la versión la regresaría al guardarse
+    # y el siguiente ETag repetiría uno ya emitido para otro contenido.
+    CAMPOS_CATALOGO = ('version_catalogo', 'catalogo_actualizado_en')
+
     def __str__(self):
         return self.nombre
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not kwargs.get('force_insert'):
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                update_fields = [f.name for f in self._meta.concrete_fields if not f.primary_key]
+            kwargs['update_fields'] = [
+                campo for campo in update_fields if campo not in self.CAMPOS_CATALOGO
+            ]
+        super().save(*args, **kwargs)
+
     # NUEVO MÉTODO
     def es_ejido(self):
         """Verifica si el proyecto es de tipo EJIDO"""
@@ -71,6 +91,11 @@ class Lote(models.Model):
         help_text="Si se deja vacío, se calcula automáticamente a partir de las medidas."
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['identificador'], name='lote_identificador_idx'),
+        ]
+
     def save(self, *args, **kwargs):
         if self.superficie_m2 is None:
             self.superficie_m2 = calcular_superficie(self.norte, self.sur, self.este, self.oeste)
@@ -280,12 +305,22 @@ class Cliente(models.Model):
     #nombre_firma_cliente  = models.CharField("Nombre para firma del cliente", max_length=150, blank=True)
     #nombre_firma_vendedor = models.CharField("Nombre para firma del vendedor", max_length=150, blank=True)
 
+    # nombre_completo normalizado (minúsculas, sin acentos) para la búsqueda
+    nombre_busqueda = models.CharField(max_length=150, blank=True, editable=False, db_index=True)
+
     creado_en      = models.DateTimeField(auto_now_add=True)
     actualizado_en = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.nombre_completo
 
+    def save(self, *args, **kwargs):
+        self.nombre_busqueda = normalizar_busqueda(self.nombre_completo)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'nombre_completo' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'nombre_busqueda'}
+        super().save(*args, **kwargs)
+
 class Beneficiario(models.Model):
     SEXO_CHOICES = [
         ('M', 'Masculino'),
@@ -0,0 +1,50 @@
+# core/signals.py
+"""Suben la versión del catálogo del proyecto afectado (ver core/catalogo.py)."""
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .catalogo import subir_version
+from .models import ConfiguracionCommeta, Lote, Proyecto, Vendedor
+
+
+@receiver(post_save, sender=Proyecto)
+def proyecto_guardado(sender, instance, raw=False, **kwargs):
+    if not raw:
+        subir_version([instance.pk])
+
+
+@receiver(post_save, sender=Lote)
+@receiver(post_delete, sender=Lote)
+def lote_cambiado(sender, instance, raw=False, **kwargs):
+    if not raw:
+        subir_version([instance.proyecto_id])
+
+
+@receiver(post_save, sender=ConfiguracionCommeta)
+@receiver(post_delete, sender=ConfiguracionCommeta)
+def configuracion_commeta_cambiada(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    proyecto_id = Lote.objects.filter(pk=instance.lote_id).values_list('proyecto_id', flat=True).first()
+    subir_version([proyecto_id])
+
+
+@receiver(post_save, sender=Vendedor)
+@receiver(pre_delete, sender=Vendedor)
+def vendedor_cambiado(sender, instance, raw=False, **kwargs):
+    # Antes de borrar, porque el borrado se lleva la relación con los proyectos
+    if not raw and instance.pk:
+        subir_version(instance.proyectos.values_list('pk', flat=True))
+
+
+@receiver(m2m_changed, sender=Vendedor.proyectos.through)
+def proyectos_de_vendedor_cambiados(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        # instance es el Proyecto
+        subir_version([instance.pk])
+    elif action == 'pre_clear':
+        subir_version(instance.proyectos.values_list('pk', flat=True))
+    else:
+        subir_version(pk_set or ())
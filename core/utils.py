@@ -0,0 +1,15 @@
+# core/utils.py
+import re
+import unicodedata
+
+
+def normalizar_busqueda(texto):
+    """
+    Texto en minúsculas, sin acentos y con los espacios colapsados, para
+    buscar nombres sin importar mayúsculas ni acentos ("José" → "jose").
+    """
+    if not texto:
+        return ''
+    texto = unicodedata.normalize('NFKD', texto)
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r'\s+', ' ', texto).strip().lower()
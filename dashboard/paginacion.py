@@ -0,0 +1,87 @@
+# dashboard/paginacion.py
+"""
+Paginación por cursor (keyset) sobre (creado_en, id), de más reciente a
+más antiguo.
+
+En lugar de OFFSET cada página se pide a partir del último (o primer)
+registro de la anterior, así que el costo no crece con el número de página
+y la paginación puede seguir activa con filtros y búsqueda.
+"""
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+
+def codificar_cursor(obj, campo='creado_en'):
+    valor = f'{getattr(obj, campo).isoformat()}|{obj.pk}'
+    return base64.urlsafe_b64encode(valor.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """(fecha, pk) del cursor, o None si no es válido."""
+    if not cursor:
+        return None
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        fecha, pk = base64.urlsafe_b64decode(cursor + relleno).decode().split('|')
+        return datetime.fromisoformat(fecha), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+class PaginaCursor:
+    """Página de resultados; sustituye al page_obj de Django en el contexto."""
+
+    def __init__(self, object_list, cursor_anterior=None, cursor_siguiente=None):
+        self.object_list = object_list
+        self.cursor_anterior = cursor_anterior
+        self.cursor_siguiente = cursor_siguiente
+
+    @property
+    def has_previous(self):
+        return self.cursor_anterior is not None
+
+    @property
+    def has_next(self):
+        return self.cursor_siguiente is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def paginar_por_cursor(queryset, tam_pagina, despues=None, antes=None, campo='creado_en'):
+    """
+    Página de `tam_pagina` registros de `queryset` posteriores al cursor
+    `despues` (página siguiente) o anteriores a `antes` (página anterior).
+    Sin cursor devuelve la primera página.
+    """
+    posicion_antes = decodificar_cursor(antes)
+    posicion_despues = None if posicion_antes else decodificar_cursor(despues)
+
+    if posicion_antes:
+        fecha, pk = posicion_antes
+        filas = list(
+            queryset.filter(Q(**{f'{campo}__gt': fecha}) | Q(**{campo: fecha, 'pk__gt': pk}))
+            .order_by(campo, 'pk')[:tam_pagina + 1]
+        )
+        hay_mas = len(filas) > tam_pagina
+        filas = filas[:tam_pagina][::-1]
+        hay_anterior, hay_siguiente = hay_mas, bool(filas)
+    else:
+        if posicion_despues:
+            fecha, pk = posicion_despues
+            queryset = queryset.filter(Q(**{f'{campo}__lt': fecha}) | Q(**{campo: fecha, 'pk__lt': pk}))
+        filas = list(queryset.order_by(f'-{campo}', '-pk')[:tam_pagina + 1])
+        hay_mas = len(filas) > tam_pagina
+        filas = filas[:tam_pagina]
+        hay_anterior, hay_siguiente = posicion_despues is not None and bool(filas), hay_mas
+
+    return PaginaCursor(
+        filas,
+        cursor_anterior=codificar_cursor(filas[0], campo) if hay_anterior else None,
+        cursor_siguiente=codificar_cursor(filas[-1], campo) if hay_siguiente else None,
+    )
@@ -60,6 +60,7 @@ urlpatterns = [
 
     path('health-check/', views.health_check, name='health_check'),
     path('tramites/<int:pk>/generate-links/', views.TramiteGenerateLinksView.as_view(), name='tramite_generate_links'),
+    path('tramites/generate-links/', views.TramiteBulkLinksView.as_view(), name='tramite_bulk_links'),
     #path('tramites/<int:pk>/send-links/', views.TramiteSendLinksView.as_view(), name='tramite_send_links'),
 
     # Cartas de Intención
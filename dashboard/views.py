@@ -16,8 +16,9 @@ from django.core.paginator import Paginator
 from django.http import HttpResponseBadRequest, HttpResponseRedirect, JsonResponse, HttpResponse
 from django.urls import reverse
 from .forms import PropietarioForm, ProyectoForm,LoteForm, TramiteForm
-from django.db.models import Q
+from django.db.models import Count, Q
 from financiamiento.forms import FinanciamientoForm, CartaIntencionForm
+from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
 from django.contrib.auth.models import User
 from financiamiento.models import CartaIntencion
 #class DashboardHomeView(TemplateView):
@@ -25,11 +26,17 @@ from financiamiento.models import CartaIntencion
 
 import os
 import io
-from workflow.docs import DOCUMENTOS
-from pdfs.utils import convert_docx_to_pdf 
+from workflow.docs import DOCUMENTOS, construir_contexto, obtener_plantilla, slug_contrato
+from workflow import doc_cache
+from workflow.borradores import peticion_documentos
+from workflow.snapshot import TramiteSnapshot
+from workflow.links_firma import exportar_csv, exportar_json, filas_urls_firma, generar_links_masivo
+from pdfs.utils import convert_docx_to_pdf, espacio_temporal
 from docxtpl import DocxTemplate
 from django.conf import settings
 from .utils import crear_usuario_para_vendedor
+from .paginacion import paginar_por_cursor
+from core.utils import normalizar_busqueda
 from django.contrib import messages
 from financiamiento.views import build_carta_intencion_from_instance
 from pdfs.utils import convert_docx_to_pdf
@@ -68,73 +75,13 @@ class DownloadDocumentView(View):
                 response['Content-Disposition'] = f'attachment; filename="{filename}"'
                 return response
         
-        # 1. Obtener el trámite
-        tramite = get_object_or_404(Tramite, pk=pk)
+        # 1. Obtener el trámite con todo lo que leen los builders
+        snapshot = TramiteSnapshot.cargar(pk)
+        tramite = snapshot.tramite
         
         # 2. Para el caso especial del contrato, determinar el tipo específico
         if document_type == 'contrato':
-            fin = tramite.financiamiento
-            regime = fin.lote.proyecto.tipo_contrato.lower()
-            pago = fin.tipo_pago
-            has_second_client = tramite.cliente_2 is not None
-
-            if 'propiedad definitiva' in regime:
-                if has_second_client:
-                    if pago == 'contado':
-                        document_type = 'contrato_definitiva_contado_varios'
-                    else:
-                       document_type = 'contrato_definitiva_pagos_varios'
-                else:
-                    if pago == 'contado':
-                        document_type = 'contrato_definitiva_contado'
-                    else:
-                        document_type = 'contrato_definitiva_pagos'
-            elif 'pequeña propiedad' in regime:
-                if has_second_client:
-                    if pago == 'contado':
-                        document_type = 'contrato_propiedad_contado_varios'
-                    else:
-                        document_type = 'contrato_propiedad_pagos_varios'
-                else:
-                    if pago == 'contado':
-                        document_type = 'contrato_propiedad_contado'
-                    else:
-                        document_type = 'contrato_propiedad_pagos'
-            elif 'ejido' in regime:
-                # ejidal o comunal
-                if has_second_client:
-                    if pago == 'contado':
-                        document_type = 'contrato_ejidal_contado_varios'
-                    else:
-                        document_type = 'contrato_ejidal_pagos_varios'
-                else:
-                    if pago == 'contado':
-                        document_type = 'contrato_ejidal_contado'
-                    else:
-                        document_type = 'contrato_ejidal_pagos'
-            else:
-                if fin.es_commeta:
-                    if has_second_client:
-                        if pago == 'contado':
-                            document_type = 'contrato_canario_contado_varios'
-                        else:
-                            document_type = 'contrato_commeta_pagos_varios'
-                    else:
-                        if pago == 'contado':
-                            document_type = 'contrato_canario_contado'
-                        else:
-                            document_type = 'contrato_commeta_pagos'
-                else:
-                    if has_second_client:
-                        if pago == 'contado':
-                            document_type = 'contrato_canario_contado_varios'
-                        else:
-                            document_type = 'contrato_canario_pagos_varios'
-                    else:
-                        if pago == 'contado':
-                            document_type = 'contrato_canario_contado'
-                        else:
-                            document_type = 'contrato_canario_pagos'
+            document_type = slug_contrato(tramite)
         
         # 3. Para plan_financiamiento, si no existe en DOCUMENTOS, usar uno por defecto
         if document_type == 'plan_financiamiento' and document_type not in DOCUMENTOS:
@@ -147,179 +94,77 @@ class DownloadDocumentView(View):
             
         doc_info = DOCUMENTOS[document_type]
         
-        # 5. Obtener los datos necesarios del trámite
-        fin = tramite.financiamiento
-        cli = tramite.cliente
-        fecha = tramite.creado_en
-        # Obtener la persona correcta según el tipo
-        if tramite.persona_tipo == 'vendedor':
-            ven = tramite.vendedor
-        else:
-            ven = tramite.propietario
-        cli2 = tramite.cliente_2  # Segundo cliente
-        
-        # Obtener cláusulas especiales de la base de datos
-        clausulas_adicionales = {}
-        if hasattr(tramite, 'clausulas_especiales'):
-            clausulas_db = tramite.clausulas_especiales
-            clausulas_adicionales = {
-                'pago': clausulas_db.clausula_pago,
-                'deslinde': clausulas_db.clausula_deslinde,
-                'promesa': clausulas_db.clausula_promesa,
-            }
-        
-        # 6. Construir el contexto
-        builder = doc_info['builder']
-        tpl_path = os.path.join(settings.BASE_DIR, doc_info['plantilla'])
-        tpl = DocxTemplate(tpl_path)
-        
-        # Manejo especial para el documento de financiamiento
+        # 5. Nombre del archivo más descriptivo
         if document_type == 'financiamiento':
-            try:
-                if tramite.es_commeta:
-                    # CORRECCIÓN: obtener_detalle_commeta es una propiedad, NO un método
-                    fin_commeta = tramite.obtener_detalle_commeta  # SIN PARÉNTESIS
-                    print(f"📊 Dashboard - Generando financiamiento Commeta, esquema: {fin_commeta.tipo_esquema if fin_commeta else 'N/A'}")
-                    
-                    # Llamar al builder con parámetros Commeta
-                    context = builder(
-                        fin, cli, ven, 
-                        request=request, 
-                        tpl=tpl, 
-                        firma_data=tramite.firma_cliente,
-                        clausulas_adicionales=clausulas_adicionales,
-                        cliente2=cli2,
-                        tramite=tramite,
-                        fecha=fecha,
-                        is_commeta=True,
-                        fin_commeta=fin_commeta
-                    )
-                else:
-                    # Llamar al builder para financiamiento normal
-                    context = builder(
-                        fin, cli, ven, 
-                        request=request, 
-                        tpl=tpl, 
-                        firma_data=tramite.firma_cliente,
-                        clausulas_adicionales=clausulas_adicionales,
-                        cliente2=cli2,
-                        tramite=tramite,
-                        fecha=fecha,
-                        is_commeta=False,
-                        fin_commeta=None
-                    )
-            except Exception as e:
-                print(f"❌ Error en builder de financiamiento (dashboard): {str(e)}")
-                import traceback
-                traceback.print_exc()
-                # Fallback a la versión simple
-                try:
-                    context = builder(
-                        fin, cli, ven, 
-                        request=request, 
-                        tpl=tpl, 
-                        firma_data=tramite.firma_cliente,
-                        fecha=fecha
-                    )
-                except TypeError:
-                    context = builder(fin, cli, ven, request=request, tpl=tpl, firma_data=tramite.firma_cliente)
+            cliente_nombre = snapshot.cli.nombre_completo.replace(' ', '_')
+            tipo = 'commeta' if tramite.es_commeta else 'normal'
+            nombre_base = f"tabla_financiamiento_{tipo}_{cliente_nombre}"
         else:
-            # Para los otros documentos, usar el método existente
-            try:
-                context = builder(
-                    fin, cli, ven, 
-                    cliente2=cli2,
-                    request=request, 
-                    tpl=tpl, 
-                    firma_data=tramite.firma_cliente, 
-                    clausulas_adicionales=clausulas_adicionales,
-                    tramite=tramite,
-                    fecha=fecha
+            nombre_base = document_type
+
+        # 6. Servir desde la caché si el trámite no ha cambiado
+        tpl_path = os.path.join(settings.BASE_DIR, doc_info['plantilla'])
+        # Sin firma guardada, los builders toman la capturada en el aviso (borrador del trámite)
+        peticion = peticion_documentos(request, tramite)
+        extra = () if tramite.firma_cliente else (peticion.session.get('firma_cliente_data'),)
+        clave = doc_cache.clave_documento(document_type, tpl_path, tramite, extra=extra)
+
+        if format == 'word':
+            cached = doc_cache.obtener(tramite.pk, document_type, clave, 'docx')
+            if cached is not None:
+                response = HttpResponse(
+                    cached,
+                    content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
                 )
-            except TypeError as e:
-                # Si el builder no acepta cliente2, intentar sin él
-                try:
-                    context = builder(
-                        fin, cli, ven, 
-                        request=request, 
-                        tpl=tpl, 
-                        firma_data=tramite.firma_cliente, 
-                        clausulas_adicionales=clausulas_adicionales,
-                        tramite=tramite,
-                        fecha=fecha
-                    )
-                except TypeError:
-                    try:
-                        # Versión mínima con Trámite (Ej. Solicitud de contrato)
-                        context = builder(fin, cli, ven, request=request, tpl=tpl, firma_data=tramite.firma_cliente, tramite=tramite, fecha=fecha)
-                    except TypeError:
-                        try:
-                            # Versión con fecha pero sin tramite
-                            context = builder(fin, cli, ven, request=request, tpl=tpl, firma_data=tramite.firma_cliente, fecha=fecha)
-                        except TypeError:
-                            #Versión sin Trámite ni fecha
-                            context = builder(fin, cli, ven, request=request, tpl=tpl, firma_data=tramite.firma_cliente)
+                response['Content-Disposition'] = f'attachment; filename="{nombre_base}.docx"'
+                return response
+        elif format == 'pdf':
+            cached = doc_cache.obtener(tramite.pk, document_type, clave, 'pdf')
+            if cached is not None:
+                response = HttpResponse(cached, content_type='application/pdf')
+                response['Content-Disposition'] = f'attachment; filename="{nombre_base}.pdf"'
+                return response
 
-        
-        # 7. Generar el documento Word
+        # 7. Construir el contexto
+        tpl = obtener_plantilla(tpl_path)
+        context = construir_contexto(document_type, snapshot, peticion, tpl, fecha=snapshot.fecha)
+
+        # 8. Generar el documento Word
         output = io.BytesIO()
         tpl.render(context)
         tpl.save(output)
         output.seek(0)
+        doc_cache.guardar(tramite.pk, document_type, clave, 'docx', output.getvalue())
         
-        # 8. Si el formato es Word, devolver el docx
+        # 9. Si el formato es Word, devolver el docx
         if format == 'word':
             response = HttpResponse(
                 output.getvalue(),
                 content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
             )
-            
-            # Nombre del archivo más descriptivo
-            if document_type == 'financiamiento':
-                cliente_nombre = cli.nombre_completo.replace(' ', '_')
-                tipo = 'commeta' if tramite.es_commeta else 'normal'
-                filename = f"tabla_financiamiento_{tipo}_{cliente_nombre}.docx"
-            else:
-                filename = f"{document_type}.docx"
-                
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+            response['Content-Disposition'] = f'attachment; filename="{nombre_base}.docx"'
             return response
         
-        # 9. Si el formato es PDF, convertir el Word a PDF y devolverlo
+        # 10. Si el formato es PDF, convertir el Word a PDF y devolverlo
         elif format == 'pdf':
-            # Guardar temporalmente el docx
-            temp_docx_path = os.path.join(settings.MEDIA_ROOT, 'temp', f"{document_type}.docx")
-            os.makedirs(os.path.dirname(temp_docx_path), exist_ok=True)
-            with open(temp_docx_path, 'wb') as f:
-                f.write(output.getvalue())
-            
-            # Convertir a PDF
-            temp_pdf_path = os.path.join(settings.MEDIA_ROOT, 'temp', f"{document_type}.pdf")
-            success = convert_docx_to_pdf(temp_docx_path, temp_pdf_path)
+            # Guardar el docx y convertirlo en un directorio propio de esta petición
+            with espacio_temporal() as temp_dir:
+                temp_docx_path = os.path.join(temp_dir, f"{document_type}.docx")
+                with open(temp_docx_path, 'wb') as f:
+                    f.write(output.getvalue())
+
+                temp_pdf_path = os.path.join(temp_dir, f"{document_type}.pdf")
+                success = convert_docx_to_pdf(temp_docx_path, temp_pdf_path)
+                pdf_data = None
+                if success:
+                    with open(temp_pdf_path, 'rb') as f:
+                        pdf_data = f.read()
             
             if success:
-                # Leer el PDF y devolverlo
-                with open(temp_pdf_path, 'rb') as f:
-                    pdf_data = f.read()
-                
-                # Nombre del archivo más descriptivo
-                if document_type == 'financiamiento':
-                    cliente_nombre = cli.nombre_completo.replace(' ', '_')
-                    tipo = 'commeta' if tramite.es_commeta else 'normal'
-                    filename = f"tabla_financiamiento_{tipo}_{cliente_nombre}.pdf"
-                else:
-                    filename = f"{document_type}.pdf"
+                doc_cache.guardar(tramite.pk, document_type, clave, 'pdf', pdf_data)
                     
                 response = HttpResponse(pdf_data, content_type='application/pdf')
-                response['Content-Disposition'] = f'attachment; filename="{filename}"'
-                
-                # Limpiar archivos temporales
-                try:
-                    os.remove(temp_docx_path)
-                    os.remove(temp_pdf_path)
-                except:
-                    pass
-                    
+                response['Content-Disposition'] = f'attachment; filename="{nombre_base}.pdf"'
                 return response
             else:
                 # Si falla la conversión, devolver el Word
@@ -333,12 +178,36 @@ class DownloadDocumentView(View):
         else:
             return HttpResponse("Formato no válido", status=400)
 
+def filtrar_tramites(queryset, params):
+    """Aplica los filtros del listado de trámites (usuario y búsqueda) de `params`."""
+    usuario_id = params.get('usuario')
+    search_term = params.get('search')
+    
+    # Aplicar filtro por usuario si se especificó
+    if usuario_id:
+        queryset = queryset.filter(usuario_creador_id=usuario_id)
+    
+    # Aplicar búsqueda si se especificó
+    if search_term:
+        # Buscar por ID de trámite o nombre de cliente
+        try:
+            # Intentar convertir a número para búsqueda por ID
+            tramite_id = int(search_term)
+            queryset = queryset.filter(id=tramite_id)
+        except ValueError:
+            # Búsqueda por nombre de cliente (columna normalizada e indexada)
+            queryset = queryset.filter(
+                cliente__nombre_busqueda__contains=normalizar_busqueda(search_term)
+            )
+
+    return queryset
+
 class TramiteListView(ListView):
     """Listado de Trámites."""
     model = Tramite
     context_object_name = 'tramites'
     paginate_by = 5
-    ordering = ['-creado_en']  # Ordenar por fecha de creación descendente
+    ordering = ['-creado_en', '-id']  # Ordenar por fecha de creación descendente
 
     def get_template_names(self):
         # Si es una solicitud HTMX, devolvemos un template parcial
@@ -373,13 +242,13 @@ class TramiteListView(ListView):
         # Ordenar alfabéticamente por nombre
         usuarios_filtro.sort(key=lambda x: x['nombre'].lower())
 
-        # NUEVO: Estadísticas de firmas
-        total_tramites = Tramite.objects.count()
-        # Contar trámites con firmas pendientes usando la propiedad del modelo
-        tramites_con_firmas_pendientes = 0
-        for tramite in Tramite.objects.all():
-            if tramite.tiene_firmas_pendientes:
-                tramites_con_firmas_pendientes += 1
+        # NUEVO: Estadísticas de firmas (una sola consulta agregada)
+        totales = Tramite.objects.con_estado_firmas().aggregate(
+            total=Count('pk'),
+            pendientes=Count('pk', filter=Q(con_firmas_pendientes=True)),
+        )
+        total_tramites = totales['total']
+        tramites_con_firmas_pendientes = totales['pendientes']
 
         context.update({
             'total_tramites': total_tramites,
@@ -407,32 +276,20 @@ class TramiteListView(ListView):
             'beneficiario_2'
         ).prefetch_related(
             'usuario_creador__vendedor'
+        ).con_estado_firmas()
+
+        # Filtros de usuario y búsqueda
+        return filtrar_tramites(queryset, self.request.GET)
+
+    def paginate_queryset(self, queryset, page_size):
+        # Paginación por cursor: sigue activa con filtros y búsqueda
+        pagina = paginar_por_cursor(
+            queryset,
+            page_size,
+            despues=self.request.GET.get('despues'),
+            antes=self.request.GET.get('antes'),
         )
-
-        # Obtener parámetros de filtro
-        usuario_id = self.request.GET.get('usuario')
-        search_term = self.request.GET.get('search')
-        
-        # Aplicar filtro por usuario si se especificó
-        if usuario_id:
-            queryset = queryset.filter(usuario_creador_id=usuario_id)
-        
-        # Aplicar búsqueda si se especificó
-        if search_term:
-            # Buscar por ID de trámite o nombre de cliente
-            try:
-                # Intentar convertir a número para búsqueda por ID
-                tramite_id = int(search_term)
-                queryset = queryset.filter(id=tramite_id)
-            except ValueError:
-                # Búsqueda por nombre de cliente
-                queryset = queryset.filter(cliente__nombre_completo__icontains=search_term)
-        
-        # Si hay filtro o búsqueda, desactivar paginación
-        if usuario_id or search_term:
-            self.paginate_by = None
-
-        return queryset
+        return None, pagina, pagina.object_list, pagina.has_previous or pagina.has_next
 
 class TramiteGenerateLinksView(View):
     """Genera los links de firma para un trámite"""
@@ -466,6 +323,42 @@ class TramiteGenerateLinksView(View):
                 messages.error(request, f'Error generando links: {str(e)}')
                 return redirect('dashboard:tramite_detail', pk=pk)
 
+class TramiteBulkLinksView(LoginRequiredMixin, PermissionRequiredMixin, View):
+    """
+    Genera los links de firma que falten a los trámites filtrados del
+    listado y descarga sus URLs en CSV o JSON. Exige un filtro (usuario o
+    búsqueda) y un máximo de `max_tramites` por petición: generar_links_masivo
+    bloquea todos los trámites que toca.
+    """
+    permission_required = 'workflow.change_tramite'
+    max_tramites = 500
+    formatos = {
+        'csv': (exportar_csv, 'text/csv; charset=utf-8'),
+        'json': (exportar_json, 'application/json'),
+    }
+
+    def post(self, request):
+        formato = request.POST.get('formato', 'csv')
+        if formato not in self.formatos:
+            return HttpResponseBadRequest("Formato no válido")
+        exportar, content_type = self.formatos[formato]
+
+        if not (request.POST.get('usuario') or request.POST.get('search')):
+            return HttpResponseBadRequest("Filtra el listado por usuario o búsqueda antes de generar links")
+        tramites = filtrar_tramites(Tramite.objects.all(), request.POST)
+        total = tramites.count()
+        if total > self.max_tramites:
+            return HttpResponseBadRequest(
+                f"El filtro incluye {total} trámites; el máximo por descarga es {self.max_tramites}"
+            )
+        generar_links_masivo(tramites)
+        filas = filas_urls_firma(tramites, f"{request.scheme}://{request.get_host()}")
+
+        response = HttpResponse(content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="links_firma.{formato}"'
+        exportar(filas, response)
+        return response
+
 class TramiteDetailView(DetailView):
     """Detalle de un Trámite."""
     model = Tramite
@@ -1844,7 +1737,7 @@ class CartaIntencionDownloadView(DetailView):
         
         try:
             # Cargar plantilla
-            tpl = DocxTemplate(tpl_path)
+            tpl = obtener_plantilla(tpl_path)
             
             # Generar contexto usando la función existente
             context = build_carta_intencion_from_instance(carta, request=self.request, tpl=tpl)
@@ -1852,50 +1745,35 @@ class CartaIntencionDownloadView(DetailView):
             # Renderizar plantilla
             tpl.render(context)
             
-            # Crear directorio temporal si no existe
-            temp_dir = os.path.join(settings.MEDIA_ROOT, 'temp')
-            os.makedirs(temp_dir, exist_ok=True)
+            # Directorio de trabajo propio de esta petición (se borra al salir)
+            with espacio_temporal() as temp_dir:
+                # Guardar DOCX temporal
+                tmp_docx = os.path.join(temp_dir, f"carta_intencion_{carta.id}.docx")
+                tpl.save(tmp_docx)
             
-            # Guardar DOCX temporal
-            tmp_docx = os.path.join(temp_dir, f"carta_intencion_{carta.id}.docx")
-            tpl.save(tmp_docx)
+                # Convertir a PDF
+                pdf_filename = f"carta_intencion_{carta.nombre_cliente.replace(' ', '_')}_{carta.id}.pdf"
+                tmp_pdf = os.path.join(temp_dir, pdf_filename)
             
-            # Convertir a PDF
-            pdf_filename = f"carta_intencion_{carta.nombre_cliente.replace(' ', '_')}_{carta.id}.pdf"
-            tmp_pdf = os.path.join(temp_dir, pdf_filename)
+                success = convert_docx_to_pdf(tmp_docx, tmp_pdf)
             
-            success = convert_docx_to_pdf(tmp_docx, tmp_pdf)
-            
-            if success and os.path.exists(tmp_pdf):
-                # Leer el PDF y enviarlo como respuesta
-                with open(tmp_pdf, 'rb') as pdf_file:
-                    response = HttpResponse(pdf_file.read(), content_type='application/pdf')
-                    response['Content-Disposition'] = f'attachment; filename="{pdf_filename}"'
-                    
-                    # Limpiar archivos temporales después de enviar
-                    try:
-                        os.remove(tmp_docx)
-                        os.remove(tmp_pdf)
-                    except:
-                        pass  # Ignorar errores de limpieza
+                if success and os.path.exists(tmp_pdf):
+                    # Leer el PDF y enviarlo como respuesta
+                    with open(tmp_pdf, 'rb') as pdf_file:
+                        response = HttpResponse(pdf_file.read(), content_type='application/pdf')
+                        response['Content-Disposition'] = f'attachment; filename="{pdf_filename}"'
                     
-                    return response
-            else:
-                # Si falla la conversión a PDF, enviar el DOCX
-                with open(tmp_docx, 'rb') as docx_file:
-                    response = HttpResponse(
-                        docx_file.read(), 
-                        content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-                    )
-                    response['Content-Disposition'] = f'attachment; filename="carta_intencion_{carta.id}.docx"'
-                    
-                    # Limpiar archivo temporal
-                    try:
-                        os.remove(tmp_docx)
-                    except:
-                        pass
+                        return response
+                else:
+                    # Si falla la conversión a PDF, enviar el DOCX
+                    with open(tmp_docx, 'rb') as docx_file:
+                        response = HttpResponse(
+                            docx_file.read(), 
+                            content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+                        )
+                        response['Content-Disposition'] = f'attachment; filename="carta_intencion_{carta.id}.docx"'
                     
-                    return response
+                        return response
         
         except Exception as e:
             # En caso de error, retornar mensaje
@@ -1914,7 +1792,7 @@ class CartaIntencionDownloadView(DetailView):
         
         try:
             # Cargar plantilla
-            tpl = DocxTemplate(tpl_path)
+            tpl = obtener_plantilla(tpl_path)
             
             # Generar contexto usando la función existente
             context = build_carta_intencion_from_instance(carta, request=self.request, tpl=tpl)
@@ -11,5 +11,17 @@ for lote in lotes:
 print(f'{count} lotes actualizados.')
 "
 
+# El worker corre en un ciclo que lo reinicia si termina: sin él, los
+# paquetes encolados desde el paso 3 se quedarían pendientes para siempre.
+echo "Iniciando worker de documentos..."
+(
+    set +e
+    while true; do
+        python manage.py procesar_documentos
+        echo "El worker de documentos terminó (código $?); reiniciando en 5 s..." >&2
+        sleep 5
+    done
+) &
+
 echo "Iniciando servidor..."
 exec gunicorn inmobiliaria.wsgi:application --bind 0.0.0.0:8000
@@ -0,0 +1,164 @@
+# financiamiento/amortizacion.py
+"""
+Tabla de amortización única para todo el sistema.
+
+La usan la tabla de financiamiento del contrato (workflow.builders), la
+cotización Commeta (financiamiento.views) y la generación de cuotas
+(pagos.services), así que el documento firmado y los registros de Pago
+salen del mismo cálculo y no pueden diferir.
+
+El calendario se calcula por columnas (fechas, cuotas, saldos, meses
+fuertes) de una sola pasada y con Decimal, sin pasar por float.
+
+Reglas (las del contrato):
+  - normal:              mensualidad fija; la última cuota liquida el saldo.
+  - mensualidades_fijas: mensualidad fija; la última es el pago final
+                         del financiamiento o, si no hay, el saldo.
+  - meses_fuertes:       mes fuerte (monto personalizado o monto_mes_fuerte)
+                         o mensualidad normal; la última igual que arriba.
+  - cualquier otro:      periodo de gracia, todo el saldo en la última cuota.
+Las fechas se calculan desde la fecha del primer pago (mismo día de cada mes,
+ajustado al último día en los meses cortos).
+"""
+from decimal import Decimal
+from itertools import accumulate
+
+from dateutil.relativedelta import relativedelta
+
+from .utils import calcular_meses_fuertes_inicio
+
+CENTAVO = Decimal('0.01')
+CERO = Decimal('0.00')
+
+
+def a_decimal(valor):
+    """Decimal con dos decimales para montos que pueden venir vacíos."""
+    if valor in (None, ''):
+        return CERO
+    return Decimal(str(valor)).quantize(CENTAVO)
+
+
+class TablaAmortizacion:
+    """
+    Calendario de pagos por columnas. La posición k de cada columna es la
+    cuota número k + 1.
+    """
+
+    __slots__ = ('esquema', 'total_financiar', 'fechas', 'cuotas',
+                 'saldos_iniciales', 'saldos_finales', 'fuertes', 'meses_fuertes')
+
+    def __init__(self, esquema, total_financiar, fechas, cuotas,
+                 saldos_iniciales, saldos_finales, fuertes, meses_fuertes):
+        self.esquema = esquema
+        self.total_financiar = total_financiar
+        self.fechas = fechas
+        self.cuotas = cuotas
+        self.saldos_iniciales = saldos_iniciales
+        self.saldos_finales = saldos_finales
+        self.fuertes = fuertes
+        self.meses_fuertes = meses_fuertes
+
+    def __len__(self):
+        return len(self.cuotas)
+
+    @property
+    def total(self):
+        return sum(self.cuotas, CERO)
+
+    def filas(self):
+        """(numero, fecha, saldo_inicial, cuota, saldo_final, es_fuerte) por cuota."""
+        return zip(
+            range(1, len(self.cuotas) + 1),
+            self.fechas,
+            self.saldos_iniciales,
+            self.cuotas,
+            self.saldos_finales,
+            self.fuertes,
+        )
+
+
+def esquema_de(fin, fin_commeta=None):
+    """Esquema de pagos del financiamiento ('normal' si no es Commeta)."""
+    if fin_commeta is None:
+        return 'normal'
+    return fin_commeta.tipo_esquema
+
+
+def meses_fuertes_de(fin, fin_commeta):
+    """
+    (meses fuertes, {mes: monto especial}) del financiamiento Commeta.
+    Los meses personalizados tienen prioridad sobre la distribución calculada.
+    """
+    if fin_commeta is None or fin_commeta.tipo_esquema != 'meses_fuertes':
+        return [], {}
+    if fin_commeta.meses_fuertes_personalizados:
+        especiales = {
+            int(mes): a_decimal(monto)
+            for mes, monto in (fin_commeta.montos_fuertes_personalizados or {}).items()
+        }
+        return [int(mes) for mes in fin_commeta.meses_fuertes_personalizados], especiales
+    meses = calcular_meses_fuertes_inicio(
+        total_meses=fin.num_mensualidades,
+        cantidad_meses_fuertes=fin_commeta.cantidad_meses_fuertes,
+        frecuencia=fin_commeta.frecuencia_meses_fuertes,
+    )
+    return meses, {}
+
+
+def calcular_tabla(fin, fin_commeta=None):
+    """
+    Tabla de amortización de `fin`. Con `fin_commeta` se aplican las reglas
+    de su esquema; sin él, las de un financiamiento normal.
+    """
+    n = fin.num_mensualidades or 0
+    esquema = esquema_de(fin, fin_commeta)
+    total_financiar = a_decimal(fin.precio_lote) - a_decimal(fin.apartado) - a_decimal(fin.enganche)
+
+    # Fechas de vencimiento
+    inicio = fin.fecha_primer_pago
+    if inicio:
+        fechas = tuple(inicio + relativedelta(months=k) for k in range(n))
+    else:
+        fechas = (None,) * n
+
+    # Meses fuertes
+    meses_fuertes, especiales = meses_fuertes_de(fin, fin_commeta)
+    marcados = set(meses_fuertes)
+    fuertes = tuple(mes in marcados for mes in range(1, n + 1))
+
+    # Cuotas de la 1 a la n-1
+    if esquema in ('normal', 'mensualidades_fijas'):
+        mensualidad = a_decimal(fin.monto_mensualidad)
+        cuotas = [mensualidad] * (n - 1)
+    elif esquema == 'meses_fuertes':
+        normal = a_decimal(fin_commeta.monto_mensualidad_normal)
+        fuerte = a_decimal(fin_commeta.monto_mes_fuerte)
+        cuotas = [
+            especiales.get(mes, fuerte) if fuertes[mes - 1] else normal
+            for mes in range(1, n)
+        ]
+    else:
+        cuotas = [CERO] * (n - 1)
+
+    # Saldos hasta antes de la última cuota
+    saldos = list(accumulate(cuotas, lambda saldo, cuota: max(CERO, saldo - cuota), initial=total_financiar))
+
+    # Última cuota: pago final (sólo Commeta) o el saldo restante
+    if n:
+        if esquema != 'normal' and fin.monto_pago_final:
+            ultima = a_decimal(fin.monto_pago_final)
+        else:
+            ultima = saldos[-1]
+        cuotas.append(ultima)
+        saldos.append(max(CERO, saldos[-1] - ultima))
+
+    return TablaAmortizacion(
+        esquema=esquema,
+        total_financiar=total_financiar,
+        fechas=fechas,
+        cuotas=tuple(cuotas),
+        saldos_iniciales=tuple(saldos[:-1]) if n else (),
+        saldos_finales=tuple(saldos[1:]),
+        fuertes=fuertes,
+        meses_fuertes=meses_fuertes,
+    )
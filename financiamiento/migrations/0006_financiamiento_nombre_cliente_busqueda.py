@@ -0,0 +1,53 @@
+# Generated by Django 5.0.3 on 2026-10-18 22:40
+
+from django.db import migrations, models
+
+from core.utils import normalizar_busqueda
+
+
+def llenar_nombre_cliente_busqueda(apps, schema_editor):
+    Financiamiento = apps.get_model('financiamiento', 'Financiamiento')
+    planes = []
+    for plan in Financiamiento.objects.only('pk', 'nombre_cliente').iterator(chunk_size=1000):
+        plan.nombre_cliente_busqueda = normalizar_busqueda(plan.nombre_cliente)
+        planes.append(plan)
+    Financiamiento.objects.bulk_update(planes, ['nombre_cliente_busqueda'], batch_size=1000)
+
+
+def crear_indice_trigramas(apps, schema_editor):
+    # Igual que core_cliente_nombre_busqueda_trgm: en PostgreSQL el
+    # LIKE '%...%' de la búsqueda de planes usa este índice.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS financiamiento_nombre_cliente_busqueda_trgm '
+        'ON financiamiento_financiamiento USING gin (nombre_cliente_busqueda gin_trgm_ops)'
+    )
+
+
+def borrar_indice_trigramas(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS financiamiento_nombre_cliente_busqueda_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financiamiento', '0005_financiamientocommeta_meses_fuertes_personalizados_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='financiamiento',
+            name='nombre_cliente_busqueda',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=150),
+        ),
+        migrations.AddIndex(
+            model_name='financiamiento',
+            index=models.Index(fields=['activo', 'es_cotizacion', '-creado_en', '-id'], name='fin_disponibles_idx'),
+        ),
+        migrations.RunPython(llenar_nombre_cliente_busqueda, migrations.RunPython.noop),
+        migrations.RunPython(crear_indice_trigramas, borrar_indice_trigramas),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from core.models import Lote, Vendedor, ConfiguracionCommeta  # asume que el modelo Lote ya existe
+from core.utils import normalizar_busqueda
 
 class Financiamiento(models.Model):
     TIPO_PAGO_CHOICES = [
@@ -46,13 +47,29 @@ class Financiamiento(models.Model):
     activo = models.BooleanField("Activo", default=True,
                                 help_text="Desmarcar para desactivar este plan")
     
+    # nombre_cliente normalizado (minúsculas, sin acentos) para la búsqueda
+    nombre_cliente_busqueda = models.CharField(max_length=150, blank=True, editable=False, db_index=True)
+
     # Metadatos
     creado_en        = models.DateTimeField(auto_now_add=True)
     actualizado_en   = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Planes disponibles del paso 1, de más reciente a más antiguo
+            models.Index(fields=['activo', 'es_cotizacion', '-creado_en', '-id'], name='fin_disponibles_idx'),
+        ]
+
     def __str__(self):
         return f"Financiamiento Lote {self.lote.identificador} — {self.nombre_cliente} {self.tipo_pago}"
 
+    def save(self, *args, **kwargs):
+        self.nombre_cliente_busqueda = normalizar_busqueda(self.nombre_cliente)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'nombre_cliente' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'nombre_cliente_busqueda'}
+        super().save(*args, **kwargs)
+
     @property
     def es_commeta(self):
         """Propiedad para verificar si el financiamiento es para Commeta"""
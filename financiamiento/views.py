@@ -4,13 +4,16 @@ from django.contrib import messages
 from .models import Financiamiento, CartaIntencion, FinanciamientoCommeta
 from .forms import FinanciamientoForm, CartaIntencionForm, FinanciamientoCommetaForm
 from core.models import Lote, ConfiguracionCommeta, Proyecto  # Importamos el modelo Lote
+from core.catalogo import consulta_en_cache, version_lote, version_plan
 from django.http import JsonResponse
 from django.views.decorators.http import require_GET, require_POST
 from django.views.decorators.csrf import csrf_exempt
 import json
 
 from datetime import date
-from workflow.builders import fmt_money
+from workflow.builders import fmt_money, filas_tabla_pagos
+from .amortizacion import calcular_tabla
+from workflow.docs import obtener_plantilla
 import os, base64, tempfile
 from docxtpl import DocxTemplate,InlineImage
 
@@ -45,6 +48,7 @@ def ajax_validar_estructura_commeta(request):
         }, status=400)
 
 @require_GET
+@consulta_en_cache(lambda request, lote_id: version_lote(lote_id), 'commeta')
 def ajax_configuracion_commeta(request, lote_id):
     """Vista AJAX para obtener configuración Commeta de un lote"""
     try:
@@ -490,6 +494,7 @@ class CartaIntencionUpdateView(UpdateView):
         return context
     
 @require_GET
+@consulta_en_cache(lambda request, pk: version_plan(pk), 'resumen-plan')
 def financiamiento_ajax_data(request, pk):
     """Vista AJAX para obtener datos de un financiamiento específico"""
     try:
@@ -513,7 +518,7 @@ from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from django.conf import settings
 from workflow.utils import numero_a_letras, calcular_superficie
-from pdfs.utils import convert_docx_to_pdf
+from pdfs.utils import convert_docx_to_pdf, espacio_temporal
 
 def build_carta_intencion_from_instance(carta, request=None, tpl=None):
     """
@@ -662,7 +667,7 @@ def descargar_carta_intencion_pdf(request, pk):
     
     try:
         # Cargar plantilla
-        tpl = DocxTemplate(tpl_path)
+        tpl = obtener_plantilla(tpl_path)
         
         # Generar contexto
         context = builder(carta, request=request, tpl=tpl)
@@ -670,50 +675,35 @@ def descargar_carta_intencion_pdf(request, pk):
         # Renderizar plantilla
         tpl.render(context)
         
-        # Crear directorio temporal si no existe
-        temp_dir = os.path.join(settings.MEDIA_ROOT, 'temp')
-        os.makedirs(temp_dir, exist_ok=True)
+        # Directorio de trabajo propio de esta petición (se borra al salir)
+        with espacio_temporal() as temp_dir:
+            # Guardar DOCX temporal
+            tmp_docx = os.path.join(temp_dir, f"carta_intencion_{carta.id}.docx")
+            tpl.save(tmp_docx)
         
-        # Guardar DOCX temporal
-        tmp_docx = os.path.join(temp_dir, f"carta_intencion_{carta.id}.docx")
-        tpl.save(tmp_docx)
+            # Convertir a PDF
+            pdf_filename = f"carta_intencion_{carta.nombre_cliente.replace(' ', '_')}_{carta.id}.pdf"
+            tmp_pdf = os.path.join(temp_dir, pdf_filename)
         
-        # Convertir a PDF
-        pdf_filename = f"carta_intencion_{carta.nombre_cliente.replace(' ', '_')}_{carta.id}.pdf"
-        tmp_pdf = os.path.join(temp_dir, pdf_filename)
+            success = convert_docx_to_pdf(tmp_docx, tmp_pdf)
         
-        success = convert_docx_to_pdf(tmp_docx, tmp_pdf)
-        
-        if success and os.path.exists(tmp_pdf):
-            # Leer el PDF y enviarlo como respuesta
-            with open(tmp_pdf, 'rb') as pdf_file:
-                response = HttpResponse(pdf_file.read(), content_type='application/pdf')
-                response['Content-Disposition'] = f'attachment; filename="{pdf_filename}"'
-                
-                # Limpiar archivos temporales después de enviar
-                try:
-                    os.remove(tmp_docx)
-                    os.remove(tmp_pdf)
-                except:
-                    pass  # Ignorar errores de limpieza
+            if success and os.path.exists(tmp_pdf):
+                # Leer el PDF y enviarlo como respuesta
+                with open(tmp_pdf, 'rb') as pdf_file:
+                    response = HttpResponse(pdf_file.read(), content_type='application/pdf')
+                    response['Content-Disposition'] = f'attachment; filename="{pdf_filename}"'
                 
-                return response
-        else:
-            # Si falla la conversión a PDF, enviar el DOCX
-            with open(tmp_docx, 'rb') as docx_file:
-                response = HttpResponse(
-                    docx_file.read(), 
-                    content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-                )
-                response['Content-Disposition'] = f'attachment; filename="carta_intencion_{carta.id}.docx"'
-                
-                # Limpiar archivo temporal
-                try:
-                    os.remove(tmp_docx)
-                except:
-                    pass
+                    return response
+            else:
+                # Si falla la conversión a PDF, enviar el DOCX
+                with open(tmp_docx, 'rb') as docx_file:
+                    response = HttpResponse(
+                        docx_file.read(), 
+                        content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+                    )
+                    response['Content-Disposition'] = f'attachment; filename="carta_intencion_{carta.id}.docx"'
                 
-                return response
+                    return response
     
     except Exception as e:
         # En caso de error, retornar mensaje
@@ -862,7 +852,7 @@ def descargar_financiamiento_cotiza_pdf(request, pk):
     
     try:
         # Cargar plantilla
-        tpl = DocxTemplate(tpl_path)
+        tpl = obtener_plantilla(tpl_path)
         print("✅ Template cargado exitosamente")
         
         # Generar contexto - pasamos request para obtener el usuario actual
@@ -874,52 +864,37 @@ def descargar_financiamiento_cotiza_pdf(request, pk):
         tpl.render(context)
         print("✅ Renderizado exitoso")
         
-        # Crear directorio temporal si no existe
-        temp_dir = os.path.join(settings.MEDIA_ROOT, 'temp')
-        os.makedirs(temp_dir, exist_ok=True)
-        
-        # Guardar DOCX temporal
-        tmp_docx = os.path.join(temp_dir, f"financiamiento_cotiza_{fin.id}.docx")
-        tpl.save(tmp_docx)
-        
-        # Convertir a PDF
-        # Nombre del archivo similar a carta de intención
-        cliente_nombre = fin.nombre_cliente.replace(' ', '_')
-        pdf_filename = f"financiamiento_cotiza_{cliente_nombre}_{fin.id}.pdf"
-        tmp_pdf = os.path.join(temp_dir, pdf_filename)
-        
-        success = convert_docx_to_pdf(tmp_docx, tmp_pdf)
-        
-        if success and os.path.exists(tmp_pdf):
-            # Leer el PDF y enviarlo como respuesta
-            with open(tmp_pdf, 'rb') as pdf_file:
-                response = HttpResponse(pdf_file.read(), content_type='application/pdf')
-                response['Content-Disposition'] = f'attachment; filename="{pdf_filename}"'
-                
-                # Limpiar archivos temporales después de enviar
-                try:
-                    os.remove(tmp_docx)
-                    os.remove(tmp_pdf)
-                except:
-                    pass  # Ignorar errores de limpieza
-                
-                return response
-        else:
-            # Si falla la conversión a PDF, enviar el DOCX
-            with open(tmp_docx, 'rb') as docx_file:
-                response = HttpResponse(
-                    docx_file.read(), 
-                    content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-                )
-                response['Content-Disposition'] = f'attachment; filename="financiamiento_cotiza_{fin.id}.docx"'
+        # Directorio de trabajo propio de esta petición (se borra al salir)
+        with espacio_temporal() as temp_dir:
+            # Guardar DOCX temporal
+            tmp_docx = os.path.join(temp_dir, f"financiamiento_cotiza_{fin.id}.docx")
+            tpl.save(tmp_docx)
+        
+            # Convertir a PDF
+            # Nombre del archivo similar a carta de intención
+            cliente_nombre = fin.nombre_cliente.replace(' ', '_')
+            pdf_filename = f"financiamiento_cotiza_{cliente_nombre}_{fin.id}.pdf"
+            tmp_pdf = os.path.join(temp_dir, pdf_filename)
+        
+            success = convert_docx_to_pdf(tmp_docx, tmp_pdf)
+        
+            if success and os.path.exists(tmp_pdf):
+                # Leer el PDF y enviarlo como respuesta
+                with open(tmp_pdf, 'rb') as pdf_file:
+                    response = HttpResponse(pdf_file.read(), content_type='application/pdf')
+                    response['Content-Disposition'] = f'attachment; filename="{pdf_filename}"'
                 
-                # Limpiar archivo temporal
-                try:
-                    os.remove(tmp_docx)
-                except:
-                    pass
+                    return response
+            else:
+                # Si falla la conversión a PDF, enviar el DOCX
+                with open(tmp_docx, 'rb') as docx_file:
+                    response = HttpResponse(
+                        docx_file.read(), 
+                        content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+                    )
+                    response['Content-Disposition'] = f'attachment; filename="financiamiento_cotiza_{fin.id}.docx"'
                 
-                return response
+                    return response
     
     except Exception as e:
         # En caso de error, retornar mensaje
@@ -927,50 +902,6 @@ def descargar_financiamiento_cotiza_pdf(request, pk):
         error_details = traceback.format_exc()
         return HttpResponse(f"Error al generar el documento: {str(e)}\n\nDetalles:\n{error_details}", status=500)
     
-def calcular_distribucion_meses_fuertes(total_meses, cantidad_meses_fuertes, frecuencia=None):
-    """
-    Replica exactamente la lógica de JavaScript para Commeta.
-    """
-    # Caso especial: si todos los meses son fuertes
-    if cantidad_meses_fuertes >= total_meses:
-        return list(range(1, total_meses + 1))
-    
-    if frecuencia:
-        # Distribución con frecuencia fija
-        meses_fuertes = []
-        mes_actual = frecuencia
-        while len(meses_fuertes) < cantidad_meses_fuertes and mes_actual <= total_meses:
-            meses_fuertes.append(mes_actual)
-            mes_actual += frecuencia
-        return meses_fuertes
-    else:
-        # Distribución automática (equidistante)
-        if cantidad_meses_fuertes == 0:
-            return []
-        
-        espaciado = max(1, total_meses // cantidad_meses_fuertes)
-        meses_fuertes = []
-        
-        # Comenzar desde el primer mes disponible
-        for i in range(cantidad_meses_fuertes):
-            mes = min((i * espaciado) + 1, total_meses)
-            meses_fuertes.append(mes)
-        
-        # Eliminar duplicados y ordenar
-        meses_unicos = sorted(set(meses_fuertes))
-        meses_filtrados = [mes for mes in meses_unicos if mes <= total_meses]
-        
-        # Si nos faltan meses fuertes, agregar al final
-        meses_finales = list(meses_filtrados)
-        while len(meses_finales) < cantidad_meses_fuertes and meses_finales[-1] < total_meses:
-            nuevo_mes = min(meses_finales[-1] + 1, total_meses)
-            if nuevo_mes not in meses_finales:
-                meses_finales.append(nuevo_mes)
-        
-        return sorted(meses_finales[:cantidad_meses_fuertes])
-    
-# En financiamiento/views.py (junto a tu builder normal)
-
 def build_financiamiento_commeta_cotiza_context(fin_commeta, request=None):
     """
     Context para Tabla de Financiamiento Commeta (cotización)
@@ -988,21 +919,7 @@ def build_financiamiento_commeta_cotiza_context(fin_commeta, request=None):
     resta_apartado = float(fin.precio_lote) - float(fin.apartado)
     resta_enganche = resta_apartado - float(fin.enganche or 0)
     
-    # 3) Determinar meses fuertes y montos especiales si aplica
-    meses_fuertes_lista = []
-    montos_especiales = {}
-    if fin_commeta.tipo_esquema == 'meses_fuertes':
-        if fin_commeta.meses_fuertes_personalizados:
-            meses_fuertes_lista = fin_commeta.meses_fuertes_personalizados
-            montos_especiales = fin_commeta.montos_fuertes_personalizados or {}
-        else:
-            meses_fuertes_lista = calcular_distribucion_meses_fuertes(
-                total_meses=fin.num_mensualidades,
-                cantidad_meses_fuertes=fin_commeta.cantidad_meses_fuertes,
-                frecuencia=fin_commeta.frecuencia_meses_fuertes
-            )
-    
-    # 4) Determinar montos según esquema
+    # 3) Determinar montos según esquema
     es_meses_fuertes = fin_commeta.tipo_esquema == 'meses_fuertes'
     
     # Para ABONO_NORMAL:
@@ -1025,56 +942,10 @@ def build_financiamiento_commeta_cotiza_context(fin_commeta, request=None):
     else:
         periodo_fuerte = None
     
-    # 5) Generar lista de pagos según esquema
-    pagos = []
-    saldo_actual = resta_enganche
-    fecha_pago = fin.fecha_primer_pago
+    # 4) Tabla de pagos (mismo cálculo que el contrato y las cuotas)
+    pagos = filas_tabla_pagos(calcular_tabla(fin, fin_commeta))
     
-    for i in range(1, fin.num_mensualidades + 1):
-        es_mes_fuerte = i in meses_fuertes_lista
-        es_ultimo_mes = (i == fin.num_mensualidades)
-        
-        # Determinar monto de la cuota según esquema
-        if fin_commeta.tipo_esquema == 'mensualidades_fijas':
-            if es_ultimo_mes and fin.monto_pago_final:
-                cuota = float(fin.monto_pago_final)
-            elif es_ultimo_mes and not fin.monto_pago_final:
-                cuota = saldo_actual
-            else:
-                cuota = float(fin.monto_mensualidad)
-        else:  # meses_fuertes
-            if es_ultimo_mes and fin.monto_pago_final:
-                cuota = float(fin.monto_pago_final)
-            elif es_mes_fuerte:
-                # Verificar si tiene monto especial para este mes
-                if str(i) in montos_especiales:
-                    cuota = float(montos_especiales[str(i)])
-                else:
-                    cuota = float(fin_commeta.monto_mes_fuerte)
-            else:
-                cuota = float(fin_commeta.monto_mensualidad_normal)
-        
-        saldo_final = max(0, saldo_actual - cuota)
-        
-        pagos.append({
-            'numero': str(i),  # Convertir a string
-            'fecha': fecha_pago.strftime("%d/%m/%Y") if fecha_pago else '',
-            'saldo_inicial': fmt_money(saldo_actual),
-            'cuota': fmt_money(cuota),
-            'saldo_final': fmt_money(saldo_final),
-        })
-        
-        saldo_actual = saldo_final
-        if fecha_pago:
-            try:
-                if fecha_pago.month == 12:
-                    fecha_pago = fecha_pago.replace(year=fecha_pago.year + 1, month=1)
-                else:
-                    fecha_pago = fecha_pago.replace(month=fecha_pago.month + 1)
-            except:
-                pass
-    
-    # 6) Obtener nombre del vendedor
+    # 5) Obtener nombre del vendedor
     nombre_vendedor = "Administración"
     if request and request.user.is_authenticated:
         if request.user.first_name and request.user.last_name:
@@ -1099,7 +970,7 @@ def build_financiamiento_commeta_cotiza_context(fin_commeta, request=None):
     else:
         precio_metro_str = '0.00'
     
-    # 7) Construir contexto con validación de tipos
+    # 6) Construir contexto con validación de tipos
     context = {
         # Fechas (asegurar strings)
         'FECHA_FINANCIAMIENTO': f"{hoy.day} de {meses[hoy.month-1]} de {hoy.year}",
@@ -1180,7 +1051,7 @@ def descargar_financiamiento_commeta_cotiza_pdf(request, pk):
         print("🔄 Intentando cargar template...")
 
         try:
-            tpl = DocxTemplate(tpl_path)
+            tpl = obtener_plantilla(tpl_path)
             print("✅ Template cargado exitosamente")
         except Exception as e:
             print(f"❌ Error al cargar template: {str(e)}")
@@ -1188,7 +1059,7 @@ def descargar_financiamiento_commeta_cotiza_pdf(request, pk):
             simple_tpl_path = os.path.join(settings.BASE_DIR, 'pdfs/templates/pdfs/cotiza_financia_n.docx')
             if os.path.exists(simple_tpl_path):
                 print("🔄 Intentando con template normal...")
-                tpl = DocxTemplate(simple_tpl_path)
+                tpl = obtener_plantilla(simple_tpl_path)
             else:
                 raise
         
@@ -1197,48 +1068,35 @@ def descargar_financiamiento_commeta_cotiza_pdf(request, pk):
         tpl.render(context)
         print("✅ Renderizado exitoso")
         
-        # Crear directorio temporal si no existe
-        temp_dir = os.path.join(settings.MEDIA_ROOT, 'temp')
-        os.makedirs(temp_dir, exist_ok=True)
-        
-        # Guardar DOCX temporal
-        tmp_docx = os.path.join(temp_dir, f"financiamiento_commeta_cotiza_{fin_commeta.id}.docx")
-        tpl.save(tmp_docx)
+        # Directorio de trabajo propio de esta petición (se borra al salir)
+        with espacio_temporal() as temp_dir:
+            # Guardar DOCX temporal
+            tmp_docx = os.path.join(temp_dir, f"financiamiento_commeta_cotiza_{fin_commeta.id}.docx")
+            tpl.save(tmp_docx)
         
-        # Convertir a PDF
-        cliente_nombre = fin_commeta.financiamiento.nombre_cliente.replace(' ', '_')
-        pdf_filename = f"financiamiento_commeta_cotiza_{cliente_nombre}_{fin_commeta.id}.pdf"
-        tmp_pdf = os.path.join(temp_dir, pdf_filename)
+            # Convertir a PDF
+            cliente_nombre = fin_commeta.financiamiento.nombre_cliente.replace(' ', '_')
+            pdf_filename = f"financiamiento_commeta_cotiza_{cliente_nombre}_{fin_commeta.id}.pdf"
+            tmp_pdf = os.path.join(temp_dir, pdf_filename)
         
-        success = convert_docx_to_pdf(tmp_docx, tmp_pdf)
+            success = convert_docx_to_pdf(tmp_docx, tmp_pdf)
         
-        if success and os.path.exists(tmp_pdf):
-            with open(tmp_pdf, 'rb') as pdf_file:
-                response = HttpResponse(pdf_file.read(), content_type='application/pdf')
-                response['Content-Disposition'] = f'attachment; filename="{pdf_filename}"'
-                
-                try:
-                    os.remove(tmp_docx)
-                    os.remove(tmp_pdf)
-                except:
-                    pass
-                
-                return response
-        else:
-            # Si falla la conversión a PDF, enviar el DOCX
-            with open(tmp_docx, 'rb') as docx_file:
-                response = HttpResponse(
-                    docx_file.read(), 
-                    content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-                )
-                response['Content-Disposition'] = f'attachment; filename="financiamiento_commeta_cotiza_{fin_commeta.id}.docx"'
+            if success and os.path.exists(tmp_pdf):
+                with open(tmp_pdf, 'rb') as pdf_file:
+                    response = HttpResponse(pdf_file.read(), content_type='application/pdf')
+                    response['Content-Disposition'] = f'attachment; filename="{pdf_filename}"'
                 
-                try:
-                    os.remove(tmp_docx)
-                except:
-                    pass
+                    return response
+            else:
+                # Si falla la conversión a PDF, enviar el DOCX
+                with open(tmp_docx, 'rb') as docx_file:
+                    response = HttpResponse(
+                        docx_file.read(), 
+                        content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+                    )
+                    response['Content-Disposition'] = f'attachment; filename="financiamiento_commeta_cotiza_{fin_commeta.id}.docx"'
                 
-                return response
+                    return response
     
     except Exception as e:
         print(f"❌ ERROR: {str(e)}")
@@ -197,6 +197,16 @@ STATICFILES_DIRS = [ BASE_DIR / "static" ]
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Conversión DOCX→PDF con LibreOffice (ver pdfs/soffice_pool.py)
+SOFFICE_BINARY = os.environ.get('SOFFICE_BINARY', 'soffice')
+SOFFICE_POOL_SIZE = int(os.environ.get('SOFFICE_POOL_SIZE', 2))   # 0 = un soffice por documento
+SOFFICE_JOB_TIMEOUT = int(os.environ.get('SOFFICE_JOB_TIMEOUT', 120))  # segundos por conversión
+SOFFICE_POOL_DIR = os.environ.get('SOFFICE_POOL_DIR', '')  # vacío = /tmp/soffice_pool
+
+# Los paquetes de documentos se generan en segundo plano con `python manage.py procesar_documentos`.
+# En False la vista genera el ZIP dentro de la petición (sin worker).
+DOCUMENTOS_ASINCRONOS = os.environ.get('DOCUMENTOS_ASINCRONOS', 'True').lower() in ('1', 'true', 'yes')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
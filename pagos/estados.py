@@ -0,0 +1,44 @@
+# pagos/estados.py
+"""
+Registro en memoria de EstadoPago.
+
+La tabla tiene unas cuantas filas que casi nunca cambian, así que se carga
+completa la primera vez que se pide un estado y después se resuelve por
+`codigo` sin ir a la base de datos. Las señales de pagos/signals.py vacían
+el registro cuando se guarda o borra un EstadoPago; si otro proceso creó un
+estado nuevo, un código desconocido fuerza una recarga.
+"""
+import threading
+
+from .models import EstadoPago
+
+_estados = None  # {codigo: EstadoPago}
+_lock = threading.Lock()
+
+
+def _cargar():
+    global _estados
+    with _lock:
+        _estados = {estado.codigo: estado for estado in EstadoPago.objects.all()}
+    return _estados
+
+
+def obtener_estado(codigo):
+    """
+    EstadoPago con ese código. Lanza EstadoPago.DoesNotExist si no existe,
+    igual que EstadoPago.objects.get(codigo=...).
+    """
+    estados = _estados if _estados is not None else _cargar()
+    estado = estados.get(codigo)
+    if estado is None:
+        estado = _cargar().get(codigo)
+        if estado is None:
+            raise EstadoPago.DoesNotExist(f"No existe el estado de pago '{codigo}'")
+    return estado
+
+
+def invalidar_estados():
+    """Vacía el registro; se vuelve a cargar en la siguiente consulta."""
+    global _estados
+    with _lock:
+        _estados = None
@@ -0,0 +1,47 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from pagos.services import GeneradorCuotasService
+from workflow.models import Tramite
+
+
+class Command(BaseCommand):
+    help = 'Genera las cuotas de todos los trámites financiados que todavía no tienen cuotas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--proyecto', type=int,
+                            help='Sólo trámites de lotes de este proyecto (ID)')
+        parser.add_argument('--tramite', type=int, nargs='+',
+                            help='Sólo estos trámites (IDs)')
+        parser.add_argument('--usuario',
+                            help='Username que quedará como creador de las cuotas')
+        parser.add_argument('--lote', type=int, default=1000,
+                            help='Tamaño de lote para la lectura y el bulk_create')
+
+    def handle(self, *args, **options):
+        usuario = None
+        if options['usuario']:
+            try:
+                usuario = User.objects.get(username=options['usuario'])
+            except User.DoesNotExist:
+                raise CommandError(f"No existe el usuario '{options['usuario']}'")
+
+        tramites = Tramite.objects.all()
+        if options['proyecto']:
+            tramites = tramites.filter(financiamiento__lote__proyecto_id=options['proyecto'])
+        if options['tramite']:
+            tramites = tramites.filter(pk__in=options['tramite'])
+
+        resultado = GeneradorCuotasService.generar_cuotas_masivo(
+            usuario=usuario, tramites=tramites, tam_lote=options['lote']
+        )
+
+        for tramite_id, motivo in resultado['omitidos']:
+            self.stdout.write(self.style.WARNING(f'Trámite #{tramite_id} omitido: {motivo}'))
+
+        segundos = resultado['segundos']
+        por_segundo = resultado['cuotas'] / segundos if segundos else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['cuotas']} cuotas generadas para {resultado['tramites']} trámites "
+            f"en {segundos:.2f} s ({por_segundo:,.0f} cuotas/s)"
+        ))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from pagos.resumen import reconstruir_resumenes
+from workflow.models import Tramite
+
+
+class Command(BaseCommand):
+    help = 'Recalcula la tabla ResumenPagos (resumen de cuotas por trámite) desde los pagos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tramite', type=int, nargs='+',
+                            help='Sólo estos trámites (IDs)')
+        parser.add_argument('--lote', type=int, default=500,
+                            help='Trámites por lote')
+
+    def handle(self, *args, **options):
+        tramites = Tramite.objects.all()
+        if options['tramite']:
+            tramites = tramites.filter(pk__in=options['tramite'])
+
+        total = reconstruir_resumenes(tramites, tam_lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'{total} resúmenes de pagos recalculados'))
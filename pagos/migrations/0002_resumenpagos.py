@@ -0,0 +1,37 @@
+# Generated by Django 5.0.3 on 2026-10-18 20:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagos', '0001_initial'),
+        ('workflow', '0011_trabajodocumentos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenPagos',
+            fields=[
+                ('tramite', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumen_pagos', serialize=False, to='workflow.tramite')),
+                ('total_cuotas', models.PositiveIntegerField(default=0)),
+                ('cuotas_pendientes', models.PositiveIntegerField(default=0, help_text="Cuotas con estado 'pendiente'")),
+                ('cuotas_atrasadas', models.PositiveIntegerField(default=0, help_text="Cuotas 'atrasado' o pendientes vencidas")),
+                ('monto_total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('monto_pagado', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('saldo_pendiente', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('saldo_favor', models.DecimalField(decimal_places=2, default=0, help_text='Saldos a favor sin utilizar', max_digits=12)),
+                ('proximo_vencimiento', models.DateField(blank=True, null=True)),
+                ('estado', models.CharField(choices=[('sin_cuotas', 'Sin cuotas'), ('pendiente', 'Pendiente'), ('atrasado', 'Atrasado'), ('pagado', 'Pagado')], default='sin_cuotas', max_length=20)),
+                ('calculado_el', models.DateField()),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Resumen de pagos',
+                'verbose_name_plural': 'Resúmenes de pagos',
+                'indexes': [models.Index(fields=['estado'], name='resumen_pagos_estado_idx'), models.Index(fields=['proximo_vencimiento'], name='resumen_pagos_venc_idx')],
+            },
+        ),
+    ]
@@ -120,4 +120,57 @@ class AplicacionSaldo(models.Model):
         verbose_name_plural = 'Aplicaciones de saldo'
     
     def __str__(self):
-        return f"Aplicación ${self.monto_aplicado} a Pago #{self.pago.numero_cuota}"
\ No newline at end of file
+        return f"Aplicación ${self.monto_aplicado} a Pago #{self.pago.numero_cuota}"
+
+
+class ResumenPagos(models.Model):
+    """
+    Resumen de las cuotas de un trámite para el dashboard de pagos.
+
+    Es una tabla desnormalizada: la mantienen las señales de pagos/signals.py
+    cada vez que cambia un Pago, SaldoAFavor o AplicacionSaldo, y se puede
+    reconstruir con `python manage.py reconstruir_resumen_pagos`.
+    """
+    ESTADOS = [
+        ('sin_cuotas', 'Sin cuotas'),
+        ('pendiente', 'Pendiente'),
+        ('atrasado', 'Atrasado'),
+        ('pagado', 'Pagado'),
+    ]
+
+    tramite = models.OneToOneField(
+        'workflow.Tramite',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='resumen_pagos'
+    )
+    total_cuotas = models.PositiveIntegerField(default=0)
+    cuotas_pendientes = models.PositiveIntegerField(default=0, help_text="Cuotas con estado 'pendiente'")
+    cuotas_atrasadas = models.PositiveIntegerField(default=0, help_text="Cuotas 'atrasado' o pendientes vencidas")
+    monto_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    monto_pagado = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    saldo_pendiente = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    saldo_favor = models.DecimalField(max_digits=12, decimal_places=2, default=0,
+                                      help_text="Saldos a favor sin utilizar")
+    proximo_vencimiento = models.DateField(null=True, blank=True)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='sin_cuotas')
+    # Los atrasos dependen del día en que se calculan
+    calculado_el = models.DateField()
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Resumen de pagos'
+        verbose_name_plural = 'Resúmenes de pagos'
+        indexes = [
+            models.Index(fields=['estado'], name='resumen_pagos_estado_idx'),
+            models.Index(fields=['proximo_vencimiento'], name='resumen_pagos_venc_idx'),
+        ]
+
+    def __str__(self):
+        return f"Resumen de pagos - Trámite #{self.tramite_id} ({self.estado})"
+
+    @property
+    def porcentaje_pagado(self):
+        if not self.monto_total:
+            return 0
+        return self.monto_pagado * 100 / self.monto_total
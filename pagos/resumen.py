@@ -0,0 +1,144 @@
+# pagos/resumen.py
+"""
+Mantenimiento de la tabla ResumenPagos.
+
+Los totales de cada trámite se calculan en SQL (las anotaciones de
+Tramite.objects.con_resumen_pagos() y un GROUP BY sobre SaldoAFavor) y se escriben con un solo upsert por lote. Las
+señales llaman a actualizar_resumenes() dentro de la misma transacción que
+modificó el pago, así que el resumen nunca queda a medias.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Min, Q, Sum, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import ResumenPagos, SaldoAFavor
+
+CAMPOS_RESUMEN = [
+    'total_cuotas', 'cuotas_pendientes', 'cuotas_atrasadas', 'monto_total',
+    'monto_pagado', 'saldo_pendiente', 'saldo_favor', 'proximo_vencimiento',
+    'estado', 'calculado_el',
+]
+
+
+def expresiones_resumen(hoy, prefijo=''):
+    """
+    Agregados de las cuotas. `prefijo` es la ruta hasta Pago: '' para
+    agrupar Pago por trámite, 'pagos__' para anotar un queryset de Tramite.
+    Los nombres no coinciden con campos de Pago para poder usarlos en
+    un mismo annotate().
+    """
+    def q(**filtros):
+        return Q(**{f'{prefijo}{campo}': valor for campo, valor in filtros.items()})
+
+    pendiente = q(estado__codigo='pendiente')
+    atrasada = q(estado__codigo='atrasado') | (pendiente & q(fecha_vencimiento__lt=hoy))
+    decimal = DecimalField(max_digits=12, decimal_places=2)
+    return {
+        'total_cuotas': Count(f'{prefijo}id'),
+        'cuotas_pendientes': Count(f'{prefijo}id', filter=pendiente),
+        'cuotas_atrasadas': Count(f'{prefijo}id', filter=atrasada),
+        'cuotas_pagadas': Count(f'{prefijo}id', filter=q(estado__codigo='pagado')),
+        'monto_cuotas': Sum(f'{prefijo}monto'),
+        'monto_abonado': Sum(f'{prefijo}monto_pagado'),
+        # Una cuota sobrepagada no resta saldo a las demás
+        'saldo_cuotas': Sum(
+            Greatest(F(f'{prefijo}monto') - F(f'{prefijo}monto_pagado'), Value(Decimal('0')), output_field=decimal),
+            output_field=decimal,
+        ),
+        'proximo_vencimiento': Min(f'{prefijo}fecha_vencimiento', filter=pendiente),
+    }
+
+
+def calcular_resumenes(tramite_ids, hoy=None):
+    """
+    ResumenPagos sin guardar para cada trámite de `tramite_ids` que exista.
+    Los totales salen de Tramite.objects.con_resumen_pagos(); el saldo a
+    favor va en otra consulta para no multiplicar las filas de Pago.
+    """
+    from workflow.models import Tramite
+
+    hoy = hoy or timezone.localdate()
+    tramite_ids = set(tramite_ids)
+
+    filas = (
+        Tramite.objects.filter(pk__in=tramite_ids)
+        .con_resumen_pagos(hoy)
+        .values('pk', 'total_cuotas', 'cuotas_pendientes', 'cuotas_atrasadas', 'monto_cuotas',
+                'monto_abonado', 'saldo_cuotas', 'proximo_vencimiento', 'estado_pagos')
+        .order_by()
+    )
+    saldos_favor = dict(
+        SaldoAFavor.objects.filter(tramite_id__in=tramite_ids, utilizado=False)
+        .values('tramite_id')
+        .annotate(total=Sum('monto'))
+        .order_by()
+        .values_list('tramite_id', 'total')
+    )
+
+    return [
+        ResumenPagos(
+            tramite_id=fila['pk'],
+            total_cuotas=fila['total_cuotas'],
+            cuotas_pendientes=fila['cuotas_pendientes'],
+            cuotas_atrasadas=fila['cuotas_atrasadas'],
+            monto_total=fila['monto_cuotas'] or 0,
+            monto_pagado=fila['monto_abonado'] or 0,
+            saldo_pendiente=fila['saldo_cuotas'] or 0,
+            saldo_favor=saldos_favor.get(fila['pk']) or 0,
+            proximo_vencimiento=fila['proximo_vencimiento'],
+            estado=fila['estado_pagos'],
+            calculado_el=hoy,
+        )
+        for fila in filas
+    ]
+
+
+def actualizar_resumenes(tramite_ids, hoy=None):
+    """Recalcula y guarda (upsert) el resumen de los trámites indicados."""
+    resumenes = calcular_resumenes(tramite_ids, hoy)
+    if not resumenes:
+        return 0
+
+    with transaction.atomic():
+        ResumenPagos.objects.bulk_create(
+            resumenes,
+            update_conflicts=True,
+            unique_fields=['tramite'],
+            update_fields=CAMPOS_RESUMEN + ['actualizado_en'],
+        )
+    return len(resumenes)
+
+
+def refrescar_resumenes(tramites, hoy=None):
+    """
+    Pone al día los resúmenes de un queryset de trámites antes de mostrarlos:
+    crea los que faltan y recalcula los que tienen una cuota pendiente que
+    venció después del último cálculo.
+    """
+    hoy = hoy or timezone.localdate()
+    faltantes = tramites.filter(resumen_pagos__isnull=True).values_list('pk', flat=True)
+    vencidos = tramites.filter(
+        resumen_pagos__calculado_el__lt=hoy,
+        resumen_pagos__proximo_vencimiento__lt=hoy,
+    ).values_list('pk', flat=True)
+    pendientes = set(faltantes) | set(vencidos)
+    if pendientes:
+        actualizar_resumenes(pendientes, hoy)
+    return len(pendientes)
+
+
+def reconstruir_resumenes(tramites=None, tam_lote=500):
+    """Recalcula el resumen de todos los trámites (o de `tramites`) por lotes."""
+    from workflow.models import Tramite
+
+    if tramites is None:
+        tramites = Tramite.objects.all()
+    ids = list(tramites.order_by('pk').values_list('pk', flat=True))
+    hoy = timezone.localdate()
+    total = 0
+    for i in range(0, len(ids), tam_lote):
+        total += actualizar_resumenes(ids[i:i + tam_lote], hoy)
+    return total
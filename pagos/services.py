@@ -1,10 +1,15 @@
 # pagos/services.py
-from datetime import datetime, timedelta
-from dateutil.relativedelta import relativedelta
+import time
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
 from django.utils import timezone
 from pagos.models import Pago, EstadoPago
+from pagos.estados import obtener_estado
+from pagos.resumen import actualizar_resumenes
 from workflow.models import Tramite
 from financiamiento.models import Financiamiento, FinanciamientoCommeta
+from financiamiento.amortizacion import calcular_tabla
 
 class GeneradorCuotasService:
     @staticmethod
@@ -19,13 +24,21 @@ class GeneradorCuotasService:
                 return False, "Ya existen cuotas generadas para este trámite"
             
             # Obtener estado "pendiente"
-            estado_pendiente = EstadoPago.objects.get(codigo='pendiente')
+            estado_pendiente = obtener_estado('pendiente')
+            
+            tabla, error = GeneradorCuotasService._tabla_para_tramite(tramite)
+            if error:
+                return False, error
             
-            # Determinar tipo de financiamiento y generar cuotas
+            # Guardar todas las cuotas
+            cuotas = GeneradorCuotasService._cuotas_desde_tabla(tramite, tabla, usuario, estado_pendiente)
+            with transaction.atomic():
+                Pago.objects.bulk_create(cuotas)
+                # bulk_create no dispara señales
+                actualizar_resumenes([tramite.pk])
             if financiamiento.es_commeta:
-                return GeneradorCuotasService._generar_commeta(tramite, usuario, estado_pendiente)
-            else:
-                return GeneradorCuotasService._generar_normal(tramite, usuario, estado_pendiente)
+                return True, f"Se generaron {len(cuotas)} cuotas Commeta correctamente"
+            return True, f"Se generaron {len(cuotas)} cuotas correctamente"
                 
         except Tramite.DoesNotExist:
             return False, "Trámite no encontrado"
@@ -33,150 +46,93 @@ class GeneradorCuotasService:
             return False, f"Error al generar cuotas: {str(e)}"
     
     @staticmethod
-    def _generar_normal(tramite, usuario, estado_pendiente):
-        """Genera cuotas para financiamiento normal"""
-        financiamiento = tramite.financiamiento
-        
-        if not financiamiento.num_mensualidades or not financiamiento.monto_mensualidad:
-            return False, "Faltan datos en el financiamiento (número de mensualidades o monto)"
+    def tramites_sin_cuotas(tramites=None):
+        """
+        Trámites financiados que todavía no tienen cuotas, en una sola consulta
+        y con el financiamiento (y su detalle Commeta) ya cargado.
+        """
+        if tramites is None:
+            tramites = Tramite.objects.all()
+        return (
+            tramites
+            .filter(financiamiento__tipo_pago='financiado')
+            .filter(~Exists(Pago.objects.filter(tramite=OuterRef('pk'))))
+            .select_related('financiamiento__lote__proyecto', 'financiamiento__detalle_commeta')
+            .order_by('pk')
+        )
+    
+    @staticmethod
+    def generar_cuotas_masivo(usuario=None, tramites=None, tam_lote=1000):
+        """
+        Genera las cuotas de todos los trámites sin cuotas (o de los del
+        queryset `tramites`). Las tablas se calculan en memoria y las cuotas se
+        insertan con bulk_create por lotes dentro de una sola transacción.
         
-        if not financiamiento.fecha_primer_pago:
-            return False, "Falta fecha de primer pago en el financiamiento"
+        Devuelve un dict con tramites, cuotas, omitidos [(id, motivo)] y segundos.
+        """
+        inicio = time.monotonic()
+        estado_pendiente = obtener_estado('pendiente')
         
         cuotas = []
-        fecha_actual = financiamiento.fecha_primer_pago
+        omitidos = []
+        procesados = []
+        for tramite in GeneradorCuotasService.tramites_sin_cuotas(tramites).iterator(chunk_size=tam_lote):
+            tabla, error = GeneradorCuotasService._tabla_para_tramite(tramite)
+            if error:
+                omitidos.append((tramite.pk, error))
+                continue
+            cuotas.extend(GeneradorCuotasService._cuotas_desde_tabla(tramite, tabla, usuario, estado_pendiente))
+            procesados.append(tramite.pk)
         
-        # Generar cuotas mensuales
-        for i in range(1, financiamiento.num_mensualidades + 1):
-            monto = financiamiento.monto_mensualidad
-            
-            # Última cuota puede ser diferente (pago final)
-            if i == financiamiento.num_mensualidades and financiamiento.monto_pago_final:
-                monto = financiamiento.monto_pago_final
-            
-            cuota = Pago(
-                tramite=tramite,
-                numero_cuota=i,
-                fecha_vencimiento=fecha_actual,
-                monto=monto,
-                monto_pagado=0,
-                estado=estado_pendiente,
-                creado_por=usuario
-            )
-            cuotas.append(cuota)
-            
-            # Avanzar un mes
-            fecha_actual = fecha_actual + relativedelta(months=1)
+        with transaction.atomic():
+            Pago.objects.bulk_create(cuotas, batch_size=tam_lote)
+            # bulk_create no dispara señales
+            for i in range(0, len(procesados), tam_lote):
+                actualizar_resumenes(procesados[i:i + tam_lote])
         
-        # Guardar todas las cuotas
-        Pago.objects.bulk_create(cuotas)
-        return True, f"Se generaron {len(cuotas)} cuotas correctamente"
+        return {
+            'tramites': len(procesados),
+            'cuotas': len(cuotas),
+            'omitidos': omitidos,
+            'segundos': time.monotonic() - inicio,
+        }
     
     @staticmethod
-    def _generar_commeta(tramite, usuario, estado_pendiente):
-        """Genera cuotas para financiamiento Commeta"""
+    def _tabla_para_tramite(tramite):
+        """(tabla, None) con la tabla de amortización del trámite, o (None, motivo) si faltan datos"""
+        financiamiento = tramite.financiamiento
+        
+        if not financiamiento.fecha_primer_pago:
+            return None, "Falta fecha de primer pago en el financiamiento"
+        
+        if not financiamiento.es_commeta:
+            if not financiamiento.num_mensualidades or not financiamiento.monto_mensualidad:
+                return None, "Faltan datos en el financiamiento (número de mensualidades o monto)"
+            return calcular_tabla(financiamiento), None
+        
         try:
-            financiamiento = tramite.financiamiento
             detalle_commeta = financiamiento.detalle_commeta
-            
-            if not detalle_commeta:
-                return False, "No se encontró detalle Commeta para este financiamiento"
-            
-            if not financiamiento.fecha_primer_pago:
-                return False, "Falta fecha de primer pago en el financiamiento"
-            
-            cuotas = []
-            fecha_actual = financiamiento.fecha_primer_pago
-            
-            # Determinar tipo de esquema
-            if detalle_commeta.tipo_esquema == 'mensualidades_fijas':
-                cuotas = GeneradorCuotasService._generar_mensualidades_fijas(
-                    tramite, usuario, estado_pendiente, financiamiento, detalle_commeta, fecha_actual
-                )
-            elif detalle_commeta.tipo_esquema == 'meses_fuertes':
-                cuotas = GeneradorCuotasService._generar_meses_fuertes(
-                    tramite, usuario, estado_pendiente, financiamiento, detalle_commeta, fecha_actual
-                )
-            else:
-                return False, f"Tipo de esquema no soportado: {detalle_commeta.tipo_esquema}"
-            
-            # Guardar todas las cuotas
-            Pago.objects.bulk_create(cuotas)
-            return True, f"Se generaron {len(cuotas)} cuotas Commeta correctamente"
-            
         except AttributeError as e:
-            return False, f"Error en la estructura de datos Commeta: {str(e)}"
-    
-    @staticmethod
-    def _generar_mensualidades_fijas(tramite, usuario, estado_pendiente, financiamiento, detalle_commeta, fecha_inicio):
-        """Genera cuotas con mensualidades fijas"""
-        cuotas = []
-        fecha_actual = fecha_inicio
+            return None, f"Error en la estructura de datos Commeta: {str(e)}"
         
-        for i in range(1, financiamiento.num_mensualidades + 1):
-            monto = financiamiento.monto_mensualidad
-            
-            # Última cuota puede ser diferente
-            if i == financiamiento.num_mensualidades and detalle_commeta.monto_pago_final:
-                monto = detalle_commeta.monto_pago_final
-            
-            cuota = Pago(
-                tramite=tramite,
-                numero_cuota=i,
-                fecha_vencimiento=fecha_actual,
-                monto=monto,
-                monto_pagado=0,
-                estado=estado_pendiente,
-                creado_por=usuario
-            )
-            cuotas.append(cuota)
-            fecha_actual = fecha_actual + relativedelta(months=1)
+        if detalle_commeta.tipo_esquema not in ('mensualidades_fijas', 'meses_fuertes'):
+            return None, f"Tipo de esquema no soportado: {detalle_commeta.tipo_esquema}"
         
-        return cuotas
+        return calcular_tabla(financiamiento, detalle_commeta), None
     
     @staticmethod
-    def _generar_meses_fuertes(tramite, usuario, estado_pendiente, financiamiento, detalle_commeta, fecha_inicio):
-        """Genera cuotas con meses fuertes"""
-        cuotas = []
-        fecha_actual = fecha_inicio
-        
-        for i in range(1, financiamiento.num_mensualidades + 1):
-            # Determinar si es mes fuerte
-            es_mes_fuerte = False
-            
-            if detalle_commeta.usar_meses_especificos:
-                # Usar lista específica de meses fuertes
-                if i in (detalle_commeta.meses_fuertes_calculados or []):
-                    es_mes_fuerte = True
-            else:
-                # Calcular por frecuencia
-                if (detalle_commeta.frecuencia_meses_fuertes and 
-                    i % detalle_commeta.frecuencia_meses_fuertes == 0):
-                    es_mes_fuerte = True
-            
-            # Determinar monto
-            if es_mes_fuerte and detalle_commeta.monto_mes_fuerte:
-                monto = detalle_commeta.monto_mes_fuerte
-            elif detalle_commeta.monto_mensualidad_normal:
-                monto = detalle_commeta.monto_mensualidad_normal
-            else:
-                monto = financiamiento.monto_mensualidad
-            
-            # Última cuota puede ser diferente
-            if i == financiamiento.num_mensualidades and detalle_commeta.monto_pago_final:
-                monto = detalle_commeta.monto_pago_final
-            
-            cuota = Pago(
+    def _cuotas_desde_tabla(tramite, tabla, usuario, estado_pendiente):
+        """Una cuota (Pago sin guardar) por fila de la tabla de amortización"""
+        return [
+            Pago(
                 tramite=tramite,
-                numero_cuota=i,
-                fecha_vencimiento=fecha_actual,
-                monto=monto,
+                numero_cuota=numero,
+                fecha_vencimiento=fecha,
+                monto=cuota,
                 monto_pagado=0,
                 estado=estado_pendiente,
                 creado_por=usuario,
-                observaciones="Mes fuerte" if es_mes_fuerte else ""
+                observaciones="Mes fuerte" if es_fuerte else ""
             )
-            cuotas.append(cuota)
-            fecha_actual = fecha_actual + relativedelta(months=1)
-        
-        return cuotas
\ No newline at end of file
+            for numero, fecha, _, cuota, _, es_fuerte in tabla.filas()
+        ]
@@ -1,9 +1,12 @@
 # pagos/signals.py
-from django.db.models.signals import post_migrate
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_migrate, post_save
 from django.contrib.auth.models import Group, Permission
 from django.contrib.contenttypes.models import ContentType
 from django.dispatch import receiver
-from .models import Pago  # Importar el modelo directamente
+from .models import AplicacionSaldo, EstadoPago, Pago, SaldoAFavor  # Importar el modelo directamente
+from .estados import invalidar_estados
+from .resumen import actualizar_resumenes
 
 @receiver(post_migrate)
 def crear_grupo_contabilidad(sender, **kwargs):
@@ -19,4 +22,42 @@ def crear_grupo_contabilidad(sender, **kwargs):
         for perm in permisos:
             grupo.permissions.add(perm)
         
-        print(f"✅ Grupo 'Contabilidad' creado/actualizado con permisos de pagos")
\ No newline at end of file
+        print(f"✅ Grupo 'Contabilidad' creado/actualizado con permisos de pagos")
+
+
+@receiver(post_save, sender=EstadoPago)
+@receiver(post_delete, sender=EstadoPago)
+def invalidar_registro_estados(sender, **kwargs):
+    """Cualquier cambio en EstadoPago invalida el registro en memoria."""
+    invalidar_estados()
+
+
+def _borrado_en_cascada(origin):
+    """
+    True si el borrado viene de otro modelo (p. ej. se borró el trámite):
+    el resumen se va con él y no hay que recalcularlo.
+    """
+    if origin is None:
+        return False
+    modelo = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return modelo not in (Pago, SaldoAFavor, AplicacionSaldo)
+
+
+@receiver(post_save, sender=Pago)
+@receiver(post_delete, sender=Pago)
+@receiver(post_save, sender=SaldoAFavor)
+@receiver(post_delete, sender=SaldoAFavor)
+def actualizar_resumen_pagos(sender, instance, origin=None, **kwargs):
+    """Recalcula el ResumenPagos del trámite, en la misma transacción."""
+    if _borrado_en_cascada(origin):
+        return
+    actualizar_resumenes([instance.tramite_id])
+
+
+@receiver(post_save, sender=AplicacionSaldo)
+@receiver(post_delete, sender=AplicacionSaldo)
+def actualizar_resumen_por_aplicacion(sender, instance, origin=None, **kwargs):
+    if _borrado_en_cascada(origin):
+        return
+    tramite_ids = Pago.objects.filter(pk=instance.pago_id).values_list('tramite_id', flat=True)
+    actualizar_resumenes(tramite_ids)
@@ -4,9 +4,8 @@ from datetime import date
 from django.conf import settings
 from docxtpl import InlineImage
 from docx.shared import Mm
-import base64
-import tempfile
 from workflow.utils import calcular_superficie, numero_a_letras
+from workflow.firmas import imagen_firma
 
 def build_recibo_pago_from_instance(pago, request=None, tpl=None, firma_data=None):
     """
@@ -143,17 +142,8 @@ def build_recibo_pago_from_instance(pago, request=None, tpl=None, firma_data=Non
                 return ''
             
             try:
-                # Decodificar base64
-                header, b64 = data_url.split(',', 1)
-                img_data = base64.b64decode(b64)
-                
-                # Crear archivo temporal
-                fd, temp_path = tempfile.mkstemp(suffix='.png')
-                with os.fdopen(fd, 'wb') as f:
-                    f.write(img_data)
-                
-                # ✅ MISMO TAMAÑO para todas las firmas
-                return InlineImage(tpl, temp_path, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
+                # La imagen ya decodificada sale del almacén de firmas
+                return imagen_firma(tpl, data_url, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
                 
             except Exception as e:
                 print(f"Error al procesar firma: {e}")
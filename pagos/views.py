@@ -10,10 +10,12 @@ from django.http import JsonResponse, HttpResponse
 from datetime import datetime, timedelta
 
 from workflow.models import Tramite
-from .models import AplicacionSaldo, Pago, EstadoPago, HistorialPago, SaldoAFavor
+from workflow.docs import obtener_plantilla
+from .models import AplicacionSaldo, Pago, EstadoPago, HistorialPago, ResumenPagos, SaldoAFavor
+from .resumen import refrescar_resumenes
+from .estados import obtener_estado
 from .forms import AplicarSaldoFavorForm, RegistroPagoForm
 from .services import GeneradorCuotasService
-from django.db.models import Prefetch
 from django.views.generic import View
 from django.contrib import messages
 from django.db import models
@@ -28,17 +30,15 @@ class DashboardPagosView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
     permission_required = 'pagos.view_pago'
     
     def get_queryset(self):
-        # Prefetch optimizado para evitar consultas N+1
-        pagos_prefetch = Prefetch(
-            'pagos',
-            queryset=Pago.objects.select_related('estado').order_by('fecha_vencimiento')
-        )
+        tramites = Tramite.objects.filter(financiamiento__tipo_pago='financiado')
         
-        queryset = Tramite.objects.filter(
-            financiamiento__tipo_pago='financiado'
-        ).prefetch_related(
-            pagos_prefetch
-        ).select_related(
+        # Crear los resúmenes que falten y recalcular los que tengan cuotas
+        # vencidas desde el último cálculo
+        refrescar_resumenes(tramites)
+        
+        # Todo lo de pagos sale de ResumenPagos: una fila por trámite
+        queryset = tramites.select_related(
+            'resumen_pagos',
             'cliente',
             'vendedor',
             'financiamiento',
@@ -51,22 +51,21 @@ class DashboardPagosView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Calcular estadísticas generales
-        tramites = context['tramites']
-        total_pendientes = 0
-        total_atrasados = 0
-        total_saldo = 0
-        
-        for tramite in tramites:
-            pagos_tramite = list(tramite.pagos.all())
-            if pagos_tramite:
-                total_pendientes += sum(1 for p in pagos_tramite if p.estado.codigo == 'pendiente')
-                # CORRECCIÓN: Considerar que monto_pagado no debe exceder monto
-                total_saldo += sum(max(0, p.monto - p.monto_pagado) for p in pagos_tramite)
+        # Calcular estadísticas generales en una sola consulta
+        totales = ResumenPagos.objects.filter(
+            tramite__financiamiento__tipo_pago='financiado'
+        ).aggregate(
+            total_tramites=Count('pk'),
+            total_pendientes=Sum('cuotas_pendientes'),
+            total_atrasados=Sum('cuotas_atrasadas'),
+            total_saldo=Sum('saldo_pendiente'),
+        )
         
         context.update({
-            'total_pendientes': total_pendientes,
-            'total_saldo': total_saldo,
+            'total_tramites': totales['total_tramites'],
+            'total_pendientes': totales['total_pendientes'] or 0,
+            'total_atrasados': totales['total_atrasados'] or 0,
+            'total_saldo': totales['total_saldo'] or 0,
         })
         
         return context
@@ -242,7 +241,7 @@ class RegistrarPagoView(LoginRequiredMixin, PermissionRequiredMixin, CreateView)
         # Ahora self.pago.monto_pagado incluye tanto el saldo como el efectivo
         if self.pago.monto_pagado >= monto_cuota:
             # Pago completo
-            self.pago.estado = EstadoPago.objects.get(codigo='pagado')
+            self.pago.estado = obtener_estado('pagado')
             
             # Calcular excedente (solo del efectivo, porque el saldo ya se aplicó hasta lo necesario)
             # El excedente sería: monto_pagado - (monto_pendiente - saldo_usado)
@@ -258,7 +257,7 @@ class RegistrarPagoView(LoginRequiredMixin, PermissionRequiredMixin, CreateView)
                 )
         else:
             # Pago parcial
-            self.pago.estado = EstadoPago.objects.get(codigo='parcial')
+            self.pago.estado = obtener_estado('parcial')
         
         # Actualizar otros campos del pago
         self.pago.fecha_pago = form.cleaned_data['fecha_pago']
@@ -358,9 +357,9 @@ class RegistrarPagoView(LoginRequiredMixin, PermissionRequiredMixin, CreateView)
                 
                 proxima_cuota.monto_pagado += monto_a_aplicar
                 if proxima_cuota.monto_pagado >= proxima_cuota.monto:
-                    proxima_cuota.estado = EstadoPago.objects.get(codigo='pagado')
+                    proxima_cuota.estado = obtener_estado('pagado')
                 else:
-                    proxima_cuota.estado = EstadoPago.objects.get(codigo='parcial')
+                    proxima_cuota.estado = obtener_estado('parcial')
                 proxima_cuota.save()
                 
                 # Registrar en historial
@@ -418,9 +417,9 @@ class RegistrarPagoView(LoginRequiredMixin, PermissionRequiredMixin, CreateView)
                     
                     proxima_cuota.monto_pagado += monto_a_aplicar
                     if proxima_cuota.monto_pagado >= proxima_cuota.monto:
-                        proxima_cuota.estado = EstadoPago.objects.get(codigo='pagado')
+                        proxima_cuota.estado = obtener_estado('pagado')
                     else:
-                        proxima_cuota.estado = EstadoPago.objects.get(codigo='parcial')
+                        proxima_cuota.estado = obtener_estado('parcial')
                     proxima_cuota.save()
                     
                     # Registrar en historial
@@ -641,9 +640,9 @@ class AplicarSaldoFavorView(LoginRequiredMixin, PermissionRequiredMixin, FormVie
             pago.monto_pagado = min(pago.monto_pagado, pago.monto)
             
             if pago.monto_pagado >= pago.monto:
-                pago.estado = EstadoPago.objects.get(codigo='pagado')
+                pago.estado = obtener_estado('pagado')
             else:
-                pago.estado = EstadoPago.objects.get(codigo='parcial')
+                pago.estado = obtener_estado('parcial')
             
             monto_restante -= monto_a_usar
         
@@ -674,62 +673,49 @@ def descargar_recibo_pago_pdf(request, pago_id):
     
     try:
         # Cargar plantilla
-        tpl = DocxTemplate(tpl_path)
+        tpl = obtener_plantilla(tpl_path)
         
         # Generar contexto usando nuestro builder
         from .utils.recibo_builder import build_recibo_pago_from_instance
+        from workflow.borradores import peticion_documentos
         firma = pago.tramite.firma_cliente
-        context = build_recibo_pago_from_instance(pago, request=request, tpl=tpl, firma_data=firma)
+        peticion = peticion_documentos(request, pago.tramite)
+        context = build_recibo_pago_from_instance(pago, request=peticion, tpl=tpl, firma_data=firma)
         
         # Renderizar plantilla
         tpl.render(context)
         
-        # Crear directorio temporal si no existe
-        temp_dir = os.path.join(settings.MEDIA_ROOT, 'temp')
-        os.makedirs(temp_dir, exist_ok=True)
-        
-        # Guardar DOCX temporal
-        tmp_docx = os.path.join(temp_dir, f"recibo_pago_{pago.id}.docx")
-        tpl.save(tmp_docx)
-        
-        # Convertir a PDF usando tu función existente
-        from pdfs.utils import convert_docx_to_pdf
-        
-        # Nombre del archivo PDF
-        pdf_filename = f"recibo_pago_{pago.tramite.cliente.nombre_completo.replace(' ', '_')}_{pago.id}.pdf"
-        tmp_pdf = os.path.join(temp_dir, pdf_filename)
-        
-        success = convert_docx_to_pdf(tmp_docx, tmp_pdf)
-        
-        if success and os.path.exists(tmp_pdf):
-            # Leer el PDF y enviarlo como respuesta
-            with open(tmp_pdf, 'rb') as pdf_file:
-                response = HttpResponse(pdf_file.read(), content_type='application/pdf')
-                response['Content-Disposition'] = f'attachment; filename="{pdf_filename}"'
-                
-                # Limpiar archivos temporales
-                try:
-                    os.remove(tmp_docx)
-                    os.remove(tmp_pdf)
-                except:
-                    pass
+        # Directorio de trabajo propio de esta petición (se borra al salir)
+        from pdfs.utils import convert_docx_to_pdf, espacio_temporal
+        with espacio_temporal() as temp_dir:
+            # Guardar DOCX temporal
+            tmp_docx = os.path.join(temp_dir, f"recibo_pago_{pago.id}.docx")
+            tpl.save(tmp_docx)
+        
+            # Convertir a PDF usando tu función existente
+            # Nombre del archivo PDF
+            pdf_filename = f"recibo_pago_{pago.tramite.cliente.nombre_completo.replace(' ', '_')}_{pago.id}.pdf"
+            tmp_pdf = os.path.join(temp_dir, pdf_filename)
+        
+            success = convert_docx_to_pdf(tmp_docx, tmp_pdf)
+        
+            if success and os.path.exists(tmp_pdf):
+                # Leer el PDF y enviarlo como respuesta
+                with open(tmp_pdf, 'rb') as pdf_file:
+                    response = HttpResponse(pdf_file.read(), content_type='application/pdf')
+                    response['Content-Disposition'] = f'attachment; filename="{pdf_filename}"'
                 
-                return response
-        else:
-            # Si falla la conversión a PDF, enviar el DOCX
-            with open(tmp_docx, 'rb') as docx_file:
-                response = HttpResponse(
-                    docx_file.read(), 
-                    content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-                )
-                response['Content-Disposition'] = f'attachment; filename="recibo_pago_{pago.id}.docx"'
-                
-                try:
-                    os.remove(tmp_docx)
-                except:
-                    pass
+                    return response
+            else:
+                # Si falla la conversión a PDF, enviar el DOCX
+                with open(tmp_docx, 'rb') as docx_file:
+                    response = HttpResponse(
+                        docx_file.read(), 
+                        content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+                    )
+                    response['Content-Disposition'] = f'attachment; filename="recibo_pago_{pago.id}.docx"'
                 
-                return response
+                    return response
     
     except Exception as e:
         import traceback
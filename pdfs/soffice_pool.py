@@ -0,0 +1,422 @@
+# pdfs/soffice_pool.py
+"""
+Pool de procesos LibreOffice (soffice --headless) de larga duración.
+
+Cada worker tiene su propio directorio de perfil (UserInstallation), de modo
+que varias conversiones pueden correr en paralelo sin pelear por el lock del
+perfil por defecto, y el perfil ya inicializado se reutiliza entre trabajos.
+
+Si el módulo `uno` está disponible (paquete python3-uno de LibreOffice), cada
+worker mantiene un soffice escuchando en un pipe UNO y las conversiones se
+hacen sobre ese proceso ya caliente. Si no, cada trabajo lanza soffice con el
+perfil caliente del worker (sin el costo de crear el perfil desde cero).
+
+Configuración (settings.py):
+    SOFFICE_BINARY       ejecutable de LibreOffice (default 'soffice')
+    SOFFICE_POOL_SIZE    número de workers (0 desactiva el pool)
+    SOFFICE_JOB_TIMEOUT  segundos máximos por conversión
+    SOFFICE_POOL_DIR     directorio base para los perfiles de los workers
+"""
+import atexit
+import logging
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import uno
+    from com.sun.star.beans import PropertyValue
+    UNO_DISPONIBLE = True
+except ImportError:  # pragma: no cover - depende del sistema
+    uno = None
+    PropertyValue = None
+    UNO_DISPONIBLE = False
+
+
+class ConversionError(RuntimeError):
+    """Error al convertir un documento con LibreOffice."""
+
+
+class ConversionTimeout(ConversionError):
+    """La conversión excedió SOFFICE_JOB_TIMEOUT."""
+
+
+def _prop(nombre, valor):
+    p = PropertyValue()
+    p.Name = nombre
+    p.Value = valor
+    return p
+
+
+class SofficeWorker:
+    """Un proceso soffice con perfil propio."""
+
+    ARRANQUE_TIMEOUT = 30
+
+    def __init__(self, indice, base_dir, binario):
+        self.indice = indice
+        self.binario = binario
+        self.nombre_pipe = f"inmobiliaria_{os.getpid()}_{indice}"
+        self.perfil_dir = os.path.join(base_dir, f"worker_{indice}")
+        self.proc = None
+        self.desktop = None
+        self.conversiones = 0
+        self.reinicios = 0
+
+    @property
+    def perfil_url(self):
+        return 'file://' + os.path.abspath(self.perfil_dir)
+
+    @property
+    def modo(self):
+        return 'uno' if UNO_DISPONIBLE else 'cli'
+
+    def _cmd_base(self):
+        return [
+            self.binario,
+            '--headless', '--invisible', '--nologo',
+            '--norestore', '--nodefault', '--nolockcheck',
+            f'-env:UserInstallation={self.perfil_url}',
+        ]
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+    def start(self):
+        os.makedirs(self.perfil_dir, exist_ok=True)
+        if self.modo != 'uno':
+            return
+
+        cmd = self._cmd_base() + [
+            f'--accept=pipe,name={self.nombre_pipe};urp;StarOffice.ComponentContext',
+        ]
+        logger.debug(f"Iniciando worker soffice {self.indice}: {' '.join(cmd)}")
+        self.proc = subprocess.Popen(
+            cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+
+        limite = time.monotonic() + self.ARRANQUE_TIMEOUT
+        while time.monotonic() < limite:
+            if self.proc.poll() is not None:
+                break
+            try:
+                self._conectar()
+                logger.info(f"Worker soffice {self.indice} listo (pid {self.proc.pid})")
+                return
+            except Exception:
+                time.sleep(0.25)
+
+        self.stop()
+        raise ConversionError(f"No se pudo iniciar el worker soffice {self.indice}")
+
+    def stop(self):
+        self.desktop = None
+        if self.proc and self.proc.poll() is None:
+            self.proc.kill()
+            try:
+                self.proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                pass
+        self.proc = None
+
+    def restart(self):
+        logger.warning(f"Reiniciando worker soffice {self.indice}")
+        self.reinicios += 1
+        self.stop()
+        self.start()
+
+    def is_alive(self):
+        """Health check: el proceso sigue vivo y responde por UNO."""
+        if self.modo != 'uno':
+            return os.path.isdir(self.perfil_dir)
+        if not self.proc or self.proc.poll() is not None:
+            return False
+        try:
+            self._conectar()
+            return True
+        except Exception:
+            return False
+
+    def _conectar(self):
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext(
+            'com.sun.star.bridge.UnoUrlResolver', local
+        )
+        ctx = resolver.resolve(
+            f'uno:pipe,name={self.nombre_pipe};urp;StarOffice.ComponentContext'
+        )
+        self.desktop = ctx.ServiceManager.createInstanceWithContext(
+            'com.sun.star.frame.Desktop', ctx
+        )
+        return self.desktop
+
+    # ------------------------------------------------------------------
+    # Conversión
+    # ------------------------------------------------------------------
+    def convert(self, docx_path, output_pdf_path, timeout):
+        if self.modo == 'uno':
+            self._convert_uno(docx_path, output_pdf_path, timeout)
+        else:
+            self._convert_cli(docx_path, output_pdf_path, timeout)
+        self.conversiones += 1
+
+    def _convert_uno(self, docx_path, output_pdf_path, timeout):
+        resultado = {}
+
+        def trabajo():
+            try:
+                desktop = self.desktop or self._conectar()
+                doc = desktop.loadComponentFromURL(
+                    uno.systemPathToFileUrl(os.path.abspath(docx_path)),
+                    '_blank', 0, (_prop('Hidden', True),)
+                )
+                try:
+                    doc.storeToURL(
+                        uno.systemPathToFileUrl(os.path.abspath(output_pdf_path)),
+                        (_prop('FilterName', 'writer_pdf_Export'),)
+                    )
+                finally:
+                    doc.close(True)
+            except Exception as e:
+                resultado['error'] = e
+
+        hilo = threading.Thread(target=trabajo, daemon=True)
+        hilo.start()
+        hilo.join(timeout)
+        if hilo.is_alive():
+            # Matar el proceso desbloquea la llamada UNO pendiente
+            self.restart()
+            raise ConversionTimeout(
+                f"Conversión de {docx_path} excedió {timeout}s (worker {self.indice})"
+            )
+        if 'error' in resultado:
+            self.desktop = None
+            raise ConversionError(f"Error UNO convirtiendo {docx_path}: {resultado['error']}")
+
+    def convert_many(self, pares, timeout):
+        """Convierte varios (docx, pdf) en una sola sesión del worker."""
+        if self.modo == 'uno':
+            for docx_path, output_pdf_path in pares:
+                self._convert_uno(docx_path, output_pdf_path, timeout)
+        else:
+            self._convert_cli_many(pares, timeout * len(pares))
+        self.conversiones += len(pares)
+
+    def _convert_cli(self, docx_path, output_pdf_path, timeout):
+        self._convert_cli_many([(docx_path, output_pdf_path)], timeout)
+
+    def _convert_cli_many(self, pares, timeout):
+        # soffice escribe <basename>.pdf en --outdir. Para que dos documentos
+        # con el mismo nombre no choquen, cada entrada se enlaza como <n>.docx
+        # en un directorio propio del trabajo y luego se mueve cada <n>.pdf
+        # a su destino. Todas las entradas van en una sola invocación.
+        trabajo_dir = tempfile.mkdtemp(prefix=f'conv_{self.indice}_', dir=os.path.dirname(self.perfil_dir))
+        try:
+            entradas = []
+            for n, (docx_path, _) in enumerate(pares):
+                entrada = os.path.join(trabajo_dir, f"{n}.docx")
+                os.symlink(os.path.abspath(docx_path), entrada)
+                entradas.append(entrada)
+
+            cmd = self._cmd_base() + [
+                '--convert-to', 'pdf:writer_pdf_Export',
+                '--outdir', trabajo_dir, *entradas,
+            ]
+            logger.debug(f"Ejecutando comando: {' '.join(cmd)}")
+            try:
+                proc = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+            except subprocess.TimeoutExpired:
+                raise ConversionTimeout(
+                    f"Conversión de {len(pares)} documento(s) excedió {timeout}s (worker {self.indice})"
+                )
+            logger.debug(f"soffice returncode={proc.returncode}")
+            if proc.returncode != 0:
+                raise ConversionError(
+                    f"Error en conversión DOCX→PDF (returncode {proc.returncode}).\n"
+                    f"STDOUT: {proc.stdout}\nSTDERR: {proc.stderr}"
+                )
+            for n, (docx_path, output_pdf_path) in enumerate(pares):
+                generado = os.path.join(trabajo_dir, f"{n}.pdf")
+                if not os.path.exists(generado):
+                    raise ConversionError(
+                        f"soffice no generó el PDF de {docx_path}.\n"
+                        f"STDOUT: {proc.stdout}\nSTDERR: {proc.stderr}"
+                    )
+                shutil.move(generado, output_pdf_path)
+        finally:
+            shutil.rmtree(trabajo_dir, ignore_errors=True)
+
+
+class SofficePool:
+    """Pool de SofficeWorker con checkout exclusivo por trabajo."""
+
+    def __init__(self, size, timeout, base_dir, binario='soffice'):
+        self.size = size
+        self.timeout = timeout
+        self.base_dir = base_dir
+        self.binario = binario
+        self._libres = queue.Queue()
+        self.workers = []
+        self._iniciado = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._iniciado:
+                return
+            os.makedirs(self.base_dir, exist_ok=True)
+            if not UNO_DISPONIBLE:
+                logger.warning(
+                    "El módulo uno no está disponible (python3-uno): el pool trabaja en modo cli "
+                    "y cada conversión lanza un soffice nuevo, sin workers persistentes"
+                )
+            for i in range(self.size):
+                worker = SofficeWorker(i, self.base_dir, self.binario)
+                try:
+                    worker.start()
+                except ConversionError as e:
+                    # El worker se reintenta al usarse por primera vez
+                    logger.error(str(e))
+                self.workers.append(worker)
+                self._libres.put(worker)
+            self._iniciado = True
+
+    def shutdown(self):
+        with self._lock:
+            for worker in self.workers:
+                worker.stop()
+            shutil.rmtree(self.base_dir, ignore_errors=True)
+            self.workers = []
+            self._libres = queue.Queue()
+            self._iniciado = False
+
+    def _checkout(self):
+        try:
+            worker = self._libres.get(timeout=self.timeout)
+        except queue.Empty:
+            raise ConversionTimeout("No hay workers soffice libres")
+        if not worker.is_alive():
+            try:
+                worker.restart()
+            except ConversionError:
+                self._libres.put(worker)
+                raise
+        return worker
+
+    def _ejecutar(self, pares, timeout):
+        worker = self._checkout()
+        try:
+            worker.convert_many(pares, timeout)
+        except ConversionTimeout:
+            logger.error(f"Timeout en worker soffice {worker.indice}")
+            raise
+        except ConversionError:
+            # Un fallo puede dejar el proceso en mal estado: reiniciar
+            if worker.modo == 'uno':
+                try:
+                    worker.restart()
+                except ConversionError as e:
+                    logger.error(str(e))
+            raise
+        finally:
+            self._libres.put(worker)
+
+    def convert(self, docx_path, output_pdf_path, timeout=None):
+        self.start()
+        self._ejecutar([(docx_path, output_pdf_path)], timeout or self.timeout)
+        return True
+
+    def convert_many(self, pares, timeout=None):
+        """
+        Convierte una lista de (docx, pdf) repartiéndola entre los workers.
+        Cada worker procesa su parte en una sola sesión (una invocación de
+        soffice en modo cli) y los workers trabajan en paralelo.
+        """
+        pares = list(pares)
+        if not pares:
+            return True
+        self.start()
+        timeout = timeout or self.timeout
+
+        n_grupos = max(1, min(self.size, len(pares)))
+        grupos = [pares[i::n_grupos] for i in range(n_grupos)]
+        if n_grupos == 1:
+            self._ejecutar(grupos[0], timeout)
+            return True
+
+        # {docx: excepción} de los documentos que no se convirtieron
+        errores = {}
+
+        def procesar(grupo):
+            try:
+                self._ejecutar(grupo, timeout)
+            except Exception as e:
+                # Cualquier fallo (OSError al enlazar, error de UNO...) se
+                # registra para cada documento del grupo; si no, el hilo lo
+                # tragaría y sólo se vería un PDF faltante.
+                if not isinstance(e, ConversionError):
+                    logger.exception(f"Error inesperado convirtiendo {len(grupo)} documento(s)")
+                for docx_path, _ in grupo:
+                    errores[docx_path] = e
+
+        hilos = [threading.Thread(target=procesar, args=(g,), daemon=True) for g in grupos]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        if errores:
+            for docx_path, error in errores.items():
+                logger.error(f"No se convirtió {docx_path}: {error}")
+            primero = next(iter(errores.values()))
+            if isinstance(primero, ConversionError):
+                raise primero
+            raise ConversionError(
+                f"Fallaron {len(errores)} de {len(pares)} conversiones: {primero}"
+            ) from primero
+        return True
+
+    def health_check(self):
+        """Estado de cada worker (vivo, conversiones y reinicios)."""
+        estado = []
+        for worker in list(self.workers):
+            vivo = worker.is_alive()
+            estado.append({
+                'worker': worker.indice,
+                'modo': worker.modo,
+                'vivo': vivo,
+                'conversiones': worker.conversiones,
+                'reinicios': worker.reinicios,
+            })
+        return estado
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Devuelve el pool del proceso actual (se crea al primer uso)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                base_dir = getattr(settings, 'SOFFICE_POOL_DIR', None) or os.path.join(
+                    tempfile.gettempdir(), 'soffice_pool'
+                )
+                # Un directorio por proceso: gunicorn levanta varios workers
+                _pool = SofficePool(
+                    size=getattr(settings, 'SOFFICE_POOL_SIZE', 2),
+                    timeout=getattr(settings, 'SOFFICE_JOB_TIMEOUT', 120),
+                    base_dir=os.path.join(str(base_dir), str(os.getpid())),
+                    binario=getattr(settings, 'SOFFICE_BINARY', 'soffice'),
+                )
+                atexit.register(_pool.shutdown)
+    return _pool
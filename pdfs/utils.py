@@ -3,7 +3,11 @@ from docx import Document
 from docx2pdf import convert
 from docxtpl import DocxTemplate
 import os
+import shutil
+import tempfile
 import subprocess, shlex, logging
+from contextlib import contextmanager
+from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
@@ -17,11 +21,56 @@ def fill_word_template(template_path, context, output_docx_path):
     tpl.save(output_docx_path)
     return output_docx_path
 
+@contextmanager
+def espacio_temporal(prefijo='render_'):
+    """
+    Directorio de trabajo exclusivo para renderizar y convertir documentos.
+
+    Se crea bajo MEDIA_ROOT/temp con un nombre único, así que peticiones
+    concurrentes (varios workers o hilos) nunca comparten archivos, y se
+    borra completo al salir del bloque `with`, aunque haya una excepción.
+    """
+    base = os.path.join(settings.MEDIA_ROOT, 'temp')
+    os.makedirs(base, exist_ok=True)
+    ruta = tempfile.mkdtemp(prefix=prefijo, dir=base)
+    try:
+        yield ruta
+    finally:
+        shutil.rmtree(ruta, ignore_errors=True)
+
 def convert_docx_to_pdf(docx_path: str, output_pdf_path: str) -> bool:
     """
     Convierte DOCX a PDF usando soffice con el filtro writer_pdf_Export
     para mantener al máximo la fidelidad de formato.
+
+    Usa el pool de workers LibreOffice de larga duración (pdfs.soffice_pool);
+    con SOFFICE_POOL_SIZE = 0 se lanza un soffice nuevo por documento.
+    El PDF queda exactamente en output_pdf_path.
     """
+    if getattr(settings, 'SOFFICE_POOL_SIZE', 2) > 0:
+        from pdfs.soffice_pool import get_pool
+        return get_pool().convert(docx_path, output_pdf_path)
+    return _convert_docx_to_pdf_subprocess(docx_path, output_pdf_path)
+
+def convert_docx_batch_to_pdf(pares) -> bool:
+    """
+    Convierte varios DOCX a PDF de una sola vez.
+
+    pares: lista de tuplas (docx_path, output_pdf_path).
+    Con el pool activo los documentos se reparten entre los workers y cada
+    worker los procesa en una sola sesión de LibreOffice, en lugar de pagar
+    un arranque de soffice por documento.
+    """
+    pares = list(pares)
+    if getattr(settings, 'SOFFICE_POOL_SIZE', 2) > 0:
+        from pdfs.soffice_pool import get_pool
+        return get_pool().convert_many(pares)
+    for docx_path, output_pdf_path in pares:
+        _convert_docx_to_pdf_subprocess(docx_path, output_pdf_path)
+    return True
+
+def _convert_docx_to_pdf_subprocess(docx_path: str, output_pdf_path: str) -> bool:
+    """Conversión en frío: un proceso soffice por documento."""
     out_dir = os.path.dirname(output_pdf_path)
     # Le decimos explícitamente que use writer_pdf_Export
     cmd = (
@@ -40,4 +89,7 @@ def convert_docx_to_pdf(docx_path: str, output_pdf_path: str) -> bool:
         raise RuntimeError(f"{msg}\nSTDOUT: {proc.stdout}\nSTDERR: {proc.stderr}")
 
     # LibreOffice generará un PDF con el mismo nombre base en out_dir
+    generado = os.path.join(out_dir, os.path.splitext(os.path.basename(docx_path))[0] + '.pdf')
+    if generado != output_pdf_path and os.path.exists(generado):
+        os.replace(generado, output_pdf_path)
     return True
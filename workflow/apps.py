@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class WorkflowConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'workflow'
+
+    def ready(self):
+        # Invalidación de la caché de documentos
+        import workflow.signals
@@ -0,0 +1,73 @@
+# workflow/borradores.py
+"""
+Estado del asistente de captura de trámites.
+
+Cada trámite en captura tiene un BorradorTramite y la sesión sólo guarda su
+id (CLAVE_SESION). Las vistas del asistente leen el borrador con
+borrador_actual(), una vez por petición, y guardan lo que cambió con
+BorradorTramite.actualizar().
+"""
+from datetime import timedelta
+
+from django.utils import timezone
+
+from workflow.models import BorradorTramite
+from workflow.paquetes import PeticionDiferida
+
+CLAVE_SESION = 'borrador_tramite_id'
+
+# Claves sueltas que usaba el asistente antes del borrador
+CLAVES_ANTERIORES = (
+    'financiamiento_id', 'financiamiento_commeta_id', 'tipo_financiamiento',
+    'cliente_id', 'vendedor_id', 'persona_tipo', 'persona_id', 'tramite_id',
+    'privacy_accepted', 'firma_cliente_data', 'tipo_firma', 'cliente2_data',
+    'testigos_data', 'beneficiario_data', 'extra_fields', 'clausulas_especiales',
+)
+
+
+def borrador_actual(request):
+    """Borrador de la sesión (o None). Se consulta una sola vez por petición."""
+    if not hasattr(request, '_borrador_tramite'):
+        pk = request.session.get(CLAVE_SESION)
+        request._borrador_tramite = (
+            BorradorTramite.objects.select_related('financiamiento').filter(pk=pk).first() if pk else None
+        )
+    return request._borrador_tramite
+
+
+def iniciar_borrador(request, **campos):
+    """
+    Abre un borrador nuevo con `campos` y lo deja en la sesión. El anterior
+    se borra si no llegó a crear su trámite.
+    """
+    anterior = borrador_actual(request)
+    if anterior is not None and anterior.tramite_id is None:
+        anterior.delete()
+    for clave in CLAVES_ANTERIORES:
+        request.session.pop(clave, None)
+
+    usuario = request.user if request.user.is_authenticated else None
+    borrador = BorradorTramite.objects.create(usuario=usuario, **campos)
+    request.session[CLAVE_SESION] = borrador.pk
+    request._borrador_tramite = borrador
+    return borrador
+
+
+def peticion_documentos(request, tramite):
+    """
+    PeticionDiferida para generar los documentos de `tramite`. Los builders
+    toman de su sesión la firma capturada en el aviso, que aquí es la clave
+    guardada en el borrador del trámite.
+    """
+    borrador = borrador_actual(request)
+    if borrador is None or borrador.tramite_id != tramite.pk:
+        borrador = BorradorTramite.objects.filter(tramite=tramite).only('firma_cliente').first()
+    session = {'firma_cliente_data': borrador.firma_cliente or None} if borrador else {}
+    return PeticionDiferida(session=session, user=request.user)
+
+
+def purgar_borradores(dias=30):
+    """Borra los borradores sin trámite que no se tocan desde hace más de `dias` días."""
+    limite = timezone.now() - timedelta(days=dias)
+    borrados, _ = BorradorTramite.objects.filter(tramite__isnull=True, actualizado_en__lt=limite).delete()
+    return borrados
@@ -1,10 +1,12 @@
 # workflow/builders.py
-import os, base64, tempfile
+import os
 from docxtpl import DocxTemplate,InlineImage
 from docx.shared import Mm
 from datetime import date
 from django.conf import settings
 from workflow.utils import numero_a_letras, calcular_superficie
+from workflow.firmas import imagen_firma
+from financiamiento.amortizacion import calcular_tabla
 from requests import request
 from django.db.models import Count
 from datetime import date, timedelta
@@ -13,12 +15,13 @@ def obtener_letra_identificador(lote):
     """
     Devuelve 'ÚNICO' si el proyecto tiene solo un lote, 
     de lo contrario convierte el identificador a letras.
-    Versión optimizada con consulta directa.
+    Usa el conteo precargado por TramiteSnapshot si está disponible.
     """
-    # Consulta optimizada: contar lotes directamente por ID de proyecto
-    from core.models import Lote  # Asegúrate de importar tu modelo Lote
-    
-    cantidad_lotes = Lote.objects.filter(proyecto_id=lote.proyecto_id).count()
+    cantidad_lotes = getattr(lote, 'lotes_en_proyecto', None)
+    if cantidad_lotes is None:
+        # Consulta optimizada: contar lotes directamente por ID de proyecto
+        from core.models import Lote  # Asegúrate de importar tu modelo Lote
+        cantidad_lotes = Lote.objects.filter(proyecto_id=lote.proyecto_id).count()
     
     if cantidad_lotes == 1 and lote.identificador == '1':
         return 'ÚNICO'
@@ -68,13 +71,8 @@ def build_aviso_privacidad_context(fin, cli, ven, request=None, tpl=None,firma_d
     if request and tpl:
         data_url = firma_data or (request.session.get('firma_cliente_data') if request else None)
         if data_url:
-            header, b64 = data_url.split(',', 1)
-            img_data = base64.b64decode(b64)
-            fd, tmp = tempfile.mkstemp(suffix='.png')
-            with os.fdopen(fd, 'wb') as f:
-                f.write(img_data)
-            # Inserta la imagen de firma
-            context['FIRMA_CLIENTE'] = InlineImage(tpl, tmp, width=Mm(70))
+            # Inserta la imagen de firma (almacén de firmas)
+            context['FIRMA_CLIENTE'] = imagen_firma(tpl, data_url, width=Mm(70))
         else:
             context['FIRMA_CLIENTE'] = ''
     else:
@@ -82,48 +80,19 @@ def build_aviso_privacidad_context(fin, cli, ven, request=None, tpl=None,firma_d
 
     return context
 
-def calcular_distribucion_meses_fuertes(total_meses, cantidad_meses_fuertes, frecuencia=None):
-    """
-    Replica exactamente la lógica de JavaScript para Commeta.
-    """
-    # Caso especial: si todos los meses son fuertes
-    if cantidad_meses_fuertes >= total_meses:
-        return list(range(1, total_meses + 1))
-    
-    if frecuencia:
-        # Distribución con frecuencia fija
-        meses_fuertes = []
-        mes_actual = frecuencia
-        while len(meses_fuertes) < cantidad_meses_fuertes and mes_actual <= total_meses:
-            meses_fuertes.append(mes_actual)
-            mes_actual += frecuencia
-        return meses_fuertes
-    else:
-        # Distribución automática (equidistante)
-        if cantidad_meses_fuertes == 0:
-            return []
-        
-        espaciado = max(1, total_meses // cantidad_meses_fuertes)
-        meses_fuertes = []
-        
-        # Comenzar desde el primer mes disponible
-        for i in range(cantidad_meses_fuertes):
-            mes = min((i * espaciado) + 1, total_meses)
-            meses_fuertes.append(mes)
-        
-        # Eliminar duplicados y ordenar
-        meses_unicos = sorted(set(meses_fuertes))
-        meses_filtrados = [mes for mes in meses_unicos if mes <= total_meses]
-        
-        # Si nos faltan meses fuertes, agregar al final
-        meses_finales = list(meses_filtrados)
-        while len(meses_finales) < cantidad_meses_fuertes and meses_finales[-1] < total_meses:
-            nuevo_mes = min(meses_finales[-1] + 1, total_meses)
-            if nuevo_mes not in meses_finales:
-                meses_finales.append(nuevo_mes)
-        
-        return sorted(meses_finales[:cantidad_meses_fuertes])
-        
+def filas_tabla_pagos(tabla):
+    """Filas de la tabla de pagos para las plantillas a partir de una TablaAmortizacion."""
+    return [
+        {
+            'numero': numero,
+            'fecha': fecha.strftime("%d/%m/%Y") if fecha else '',
+            'saldo_inicial': fmt_money(saldo_inicial),
+            'cuota': fmt_money(cuota),
+            'saldo_final': fmt_money(saldo_final),
+        }
+        for numero, fecha, saldo_inicial, cuota, saldo_final, _ in tabla.filas()
+    ]
+
 def build_financiamiento_context(fin, cli, ven, request=None, tpl=None, firma_data=None, 
                                  is_commeta=False, fin_commeta=None, **kwargs):
     """
@@ -143,101 +112,14 @@ def build_financiamiento_context(fin, cli, ven, request=None, tpl=None, firma_da
     resta_apartado = float(fin.precio_lote) - float(fin.apartado)
     resta_enganche = resta_apartado - float(fin.enganche or 0)
     
-    # 3) Lógica específica para Commeta - DETERMINAR MESES FUERTES Y MONTOS ESPECIALES
-    meses_fuertes_lista = []
-    montos_especiales = {}
-    if is_commeta and fin_commeta:
-        if fin_commeta.tipo_esquema == 'meses_fuertes':
-            # Verificar si existe personalización (meses específicos)
-            if fin_commeta.meses_fuertes_personalizados:
-                meses_fuertes_lista = fin_commeta.meses_fuertes_personalizados
-                montos_especiales = fin_commeta.montos_fuertes_personalizados or {}
-            else:
-                # Distribución por frecuencia
-                meses_fuertes_lista = calcular_distribucion_meses_fuertes(
-                    total_meses=fin.num_mensualidades,
-                    cantidad_meses_fuertes=fin_commeta.cantidad_meses_fuertes,
-                    frecuencia=fin_commeta.frecuencia_meses_fuertes
-                )
-    
-    # 4) Generar lista de pagos según el tipo
+    # 3) Tabla de pagos (mismo cálculo que las cuotas de pagos.services)
+    tabla = calcular_tabla(fin, fin_commeta if is_commeta else None)
+    meses_fuertes_lista = tabla.meses_fuertes
+
+    # 4) Generar lista de pagos
     pagos = []
-    saldo_actual = resta_enganche
-    
     if fin.tipo_pago == 'financiado' and fin.num_mensualidades:
-        fecha_pago = fin.fecha_primer_pago
-        
-        for i in range(1, fin.num_mensualidades + 1):
-            cuota = 0
-            es_ultimo_mes = (i == fin.num_mensualidades)
-            
-            if is_commeta and fin_commeta:
-                # ========== LÓGICA COMMETA ==========
-                if fin_commeta.tipo_esquema == 'meses_fuertes':
-                    # --- ESQUEMA MESES FUERTES (con soporte personalizado) ---
-                    if es_ultimo_mes and fin.monto_pago_final:
-                        # Pago final explícito
-                        cuota = float(fin.monto_pago_final)
-                    elif es_ultimo_mes:
-                        # Último pago = saldo restante (fallback)
-                        cuota = saldo_actual
-                    elif i in meses_fuertes_lista:
-                        # Mes fuerte: verificar si tiene monto especial
-                        if str(i) in montos_especiales:
-                            cuota = float(montos_especiales[str(i)])
-                        else:
-                            cuota = float(fin_commeta.monto_mes_fuerte)
-                    else:
-                        # Mes normal
-                        cuota = float(fin_commeta.monto_mensualidad_normal or 0)
-                
-                elif fin_commeta.tipo_esquema == 'mensualidades_fijas':
-                    # --- ESQUEMA MENSUALIDADES FIJAS ---
-                    if es_ultimo_mes and fin.monto_pago_final:
-                        cuota = float(fin.monto_pago_final)
-                    elif es_ultimo_mes:
-                        cuota = saldo_actual
-                    else:
-                        cuota = float(fin.monto_mensualidad or 0)
-                
-                else:
-                    # --- ESQUEMA DE GRACIA (caso PROBADON) ---
-                    if es_ultimo_mes:
-                        cuota = saldo_actual
-                    else:
-                        cuota = 0.0
-            
-            else:
-                # ========== LÓGICA FINANCIAMIENTO NORMAL ==========
-                if es_ultimo_mes:
-                    # Último pago = saldo actual
-                    cuota = saldo_actual
-                else:
-                    cuota = float(fin.monto_mensualidad)
-            
-            # Calcular saldo final
-            saldo_final = max(0, saldo_actual - cuota)
-            
-            pagos.append({
-                'numero': i,
-                'fecha': fecha_pago.strftime("%d/%m/%Y") if fecha_pago else '',
-                'saldo_inicial': fmt_money(saldo_actual),
-                'cuota': fmt_money(cuota),
-                'saldo_final': fmt_money(saldo_final),
-            })
-            
-            # Actualizar para siguiente pago
-            saldo_actual = saldo_final
-            if fecha_pago:
-                # Avanzar un mes
-                try:
-                    if fecha_pago.month == 12:
-                        fecha_pago = fecha_pago.replace(year=fecha_pago.year + 1, month=1)
-                    else:
-                        fecha_pago = fecha_pago.replace(month=fecha_pago.month + 1)
-                except:
-                    # En caso de fecha inválida (ej. 31 de febrero)
-                    pass
+        pagos = filas_tabla_pagos(tabla)
 
     # 5) Pronombres según sexo
     def art(sex, masculino, femenino):
@@ -325,17 +207,8 @@ def build_financiamiento_context(fin, cli, ven, request=None, tpl=None, firma_da
                 return ''
             
             try:
-                # Decodificar base64
-                header, b64 = data_url.split(',', 1)
-                img_data = base64.b64decode(b64)
-                
-                # Crear archivo temporal
-                fd, temp_path = tempfile.mkstemp(suffix='.png')
-                with os.fdopen(fd, 'wb') as f:
-                    f.write(img_data)
-                
-                # ✅ MISMO TAMAÑO para todas las firmas
-                return InlineImage(tpl, temp_path, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
+                # La imagen ya decodificada sale del almacén de firmas
+                return imagen_firma(tpl, data_url, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
                 
             except Exception as e:
                 print(f"Error al procesar firma: {e}")
@@ -423,17 +296,8 @@ def build_carta_intencion_context(fin, cli, ven,request=None, tpl=None, firma_da
                 return ''
             
             try:
-                # Decodificar base64
-                header, b64 = data_url.split(',', 1)
-                img_data = base64.b64decode(b64)
-                
-                # Crear archivo temporal
-                fd, temp_path = tempfile.mkstemp(suffix='.png')
-                with os.fdopen(fd, 'wb') as f:
-                    f.write(img_data)
-                
-                # ✅ MISMO TAMAÑO para todas las firmas
-                return InlineImage(tpl, temp_path, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
+                # La imagen ya decodificada sale del almacén de firmas
+                return imagen_firma(tpl, data_url, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
                 
             except Exception as e:
                 print(f"Error al procesar firma: {e}")
@@ -516,12 +380,8 @@ def build_carta_intencion_commeta_context(fin, cli, ven, request=None, tpl=None,
             if not data_url:
                 return ''
             try:
-                header, b64 = data_url.split(',', 1)
-                img_data = base64.b64decode(b64)
-                fd, temp_path = tempfile.mkstemp(suffix='.png')
-                with os.fdopen(fd, 'wb') as f:
-                    f.write(img_data)
-                return InlineImage(tpl, temp_path, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
+                # La imagen ya decodificada sale del almacén de firmas
+                return imagen_firma(tpl, data_url, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
             except Exception as e:
                 print(f"Error al procesar firma: {e}")
                 return ''
@@ -644,17 +504,8 @@ def build_solicitud_contrato_context(fin, cli, ven, request=None, tpl=None, firm
                 return ''
             
             try:
-                # Decodificar base64
-                header, b64 = data_url.split(',', 1)
-                img_data = base64.b64decode(b64)
-                
-                # Crear archivo temporal
-                fd, temp_path = tempfile.mkstemp(suffix='.png')
-                with os.fdopen(fd, 'wb') as f:
-                    f.write(img_data)
-                
-                # ✅ MISMO TAMAÑO para todas las firmas
-                return InlineImage(tpl, temp_path, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
+                # La imagen ya decodificada sale del almacén de firmas
+                return imagen_firma(tpl, data_url, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
                 
             except Exception as e:
                 print(f"Error al procesar firma: {e}")
@@ -789,12 +640,8 @@ def build_solicitud_contrato_commeta_context(fin, cli, ven, request=None, tpl=No
             if not data_url:
                 return ''
             try:
-                header, b64 = data_url.split(',', 1)
-                img_data = base64.b64decode(b64)
-                fd, temp_path = tempfile.mkstemp(suffix='.png')
-                with os.fdopen(fd, 'wb') as f:
-                    f.write(img_data)
-                return InlineImage(tpl, temp_path, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
+                # La imagen ya decodificada sale del almacén de firmas
+                return imagen_firma(tpl, data_url, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
             except Exception as e:
                 print(f"Error al procesar firma: {e}")
                 return ''
@@ -960,13 +807,8 @@ def build_contrato_definitiva_pagos_context(fin, cli, ven, request=None, tpl=Non
     if request and tpl:
         data_url = firma_data or (request.session.get('firma_cliente_data') if request else None)
         if data_url:
-            header, b64 = data_url.split(',', 1)
-            img_data = base64.b64decode(b64)
-            fd, tmp = tempfile.mkstemp(suffix='.png')
-            with os.fdopen(fd, 'wb') as f:
-                f.write(img_data)
-            # Inserta la imagen de firma
-            context['FIRMA_CLIENTE'] = InlineImage(tpl, tmp, width=Mm(40))
+            # Inserta la imagen de firma (almacén de firmas)
+            context['FIRMA_CLIENTE'] = imagen_firma(tpl, data_url, width=Mm(40))
         else:
             context['FIRMA_CLIENTE'] = ''
     else:
@@ -1119,13 +961,8 @@ def build_contrato_definitiva_contado_context(fin, cli, ven, request=None, tpl=N
     if request and tpl:
         data_url = firma_data or (request.session.get('firma_cliente_data') if request else None)
         if data_url:
-            header, b64 = data_url.split(',', 1)
-            img_data = base64.b64decode(b64)
-            fd, tmp = tempfile.mkstemp(suffix='.png')
-            with os.fdopen(fd, 'wb') as f:
-                f.write(img_data)
-            # Inserta la imagen de firma
-            context['FIRMA_CLIENTE'] = InlineImage(tpl, tmp, width=Mm(40))
+            # Inserta la imagen de firma (almacén de firmas)
+            context['FIRMA_CLIENTE'] = imagen_firma(tpl, data_url, width=Mm(40))
         else:
             context['FIRMA_CLIENTE'] = ''
     else:
@@ -1361,17 +1198,8 @@ def build_contrato_propiedad_contado_context(fin, cli, ven, request=None, tpl=No
                 return ''
             
             try:
-                # Decodificar base64
-                header, b64 = data_url.split(',', 1)
-                img_data = base64.b64decode(b64)
-                
-                # Crear archivo temporal
-                fd, temp_path = tempfile.mkstemp(suffix='.png')
-                with os.fdopen(fd, 'wb') as f:
-                    f.write(img_data)
-                
-                # ✅ MISMO TAMAÑO para todas las firmas
-                return InlineImage(tpl, temp_path, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
+                # La imagen ya decodificada sale del almacén de firmas
+                return imagen_firma(tpl, data_url, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
                 
             except Exception as e:
                 print(f"Error al procesar firma: {e}")
@@ -1656,17 +1484,8 @@ def build_contrato_propiedad_contado_varios_context(fin, cli, ven, cliente2=None
                 return ''
             
             try:
-                # Decodificar base64
-                header, b64 = data_url.split(',', 1)
-                img_data = base64.b64decode(b64)
-                
-                # Crear archivo temporal
-                fd, temp_path = tempfile.mkstemp(suffix='.png')
-                with os.fdopen(fd, 'wb') as f:
-                    f.write(img_data)
-                
-                # ✅ MISMO TAMAÑO para todas las firmas
-                return InlineImage(tpl, temp_path, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
+                # La imagen ya decodificada sale del almacén de firmas
+                return imagen_firma(tpl, data_url, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
                 
             except Exception as e:
                 print(f"Error al procesar firma: {e}")
@@ -1945,17 +1764,8 @@ def build_contrato_propiedad_pagos_context(fin, cli, ven, request=None, tpl=None
                 return ''
             
             try:
-                # Decodificar base64
-                header, b64 = data_url.split(',', 1)
-                img_data = base64.b64decode(b64)
-                
-                # Crear archivo temporal
-                fd, temp_path = tempfile.mkstemp(suffix='.png')
-                with os.fdopen(fd, 'wb') as f:
-                    f.write(img_data)
-                
-                # ✅ MISMO TAMAÑO para todas las firmas
-                return InlineImage(tpl, temp_path, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
+                # La imagen ya decodificada sale del almacén de firmas
+                return imagen_firma(tpl, data_url, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
                 
             except Exception as e:
                 print(f"Error al procesar firma: {e}")
@@ -2287,17 +2097,8 @@ def build_contrato_propiedad_pagos_varios_context(fin, cli, ven, cliente2=None,r
                 return ''
             
             try:
-                # Decodificar base64
-                header, b64 = data_url.split(',', 1)
-                img_data = base64.b64decode(b64)
-                
-                # Crear archivo temporal
-                fd, temp_path = tempfile.mkstemp(suffix='.png')
-                with os.fdopen(fd, 'wb') as f:
-                    f.write(img_data)
-                
-                # ✅ MISMO TAMAÑO para todas las firmas
-                return InlineImage(tpl, temp_path, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
+                # La imagen ya decodificada sale del almacén de firmas
+                return imagen_firma(tpl, data_url, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
                 
             except Exception as e:
                 print(f"Error al procesar firma: {e}")
@@ -2535,17 +2336,8 @@ def build_contrato_ejidal_contado_context(fin, cli, ven, request=None, tpl=None,
                 return ''
             
             try:
-                # Decodificar base64
-                header, b64 = data_url.split(',', 1)
-                img_data = base64.b64decode(b64)
-                
-                # Crear archivo temporal
-                fd, temp_path = tempfile.mkstemp(suffix='.png')
-                with os.fdopen(fd, 'wb') as f:
-                    f.write(img_data)
-                
-                # ✅ MISMO TAMAÑO para todas las firmas
-                return InlineImage(tpl, temp_path, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
+                # La imagen ya decodificada sale del almacén de firmas
+                return imagen_firma(tpl, data_url, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
                 
             except Exception as e:
                 print(f"Error al procesar firma: {e}")
@@ -2816,17 +2608,8 @@ def build_contrato_ejidal_contado_varios_context(fin, cli, ven, cliente2=None,re
                 return ''
             
             try:
-                # Decodificar base64
-                header, b64 = data_url.split(',', 1)
-                img_data = base64.b64decode(b64)
-                
-                # Crear archivo temporal
-                fd, temp_path = tempfile.mkstemp(suffix='.png')
-                with os.fdopen(fd, 'wb') as f:
-                    f.write(img_data)
-                
-                # ✅ MISMO TAMAÑO para todas las firmas
-                return InlineImage(tpl, temp_path, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
+                # La imagen ya decodificada sale del almacén de firmas
+                return imagen_firma(tpl, data_url, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
                 
             except Exception as e:
                 print(f"Error al procesar firma: {e}")
@@ -3119,17 +2902,8 @@ def build_contrato_ejidal_pagos_context(fin, cli, ven, request=None, tpl=None, f
                 return ''
             
             try:
-                # Decodificar base64
-                header, b64 = data_url.split(',', 1)
-                img_data = base64.b64decode(b64)
-                
-                # Crear archivo temporal
-                fd, temp_path = tempfile.mkstemp(suffix='.png')
-                with os.fdopen(fd, 'wb') as f:
-                    f.write(img_data)
-                
-                # ✅ MISMO TAMAÑO para todas las firmas
-                return InlineImage(tpl, temp_path, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
+                # La imagen ya decodificada sale del almacén de firmas
+                return imagen_firma(tpl, data_url, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
                 
             except Exception as e:
                 print(f"Error al procesar firma: {e}")
@@ -3461,17 +3235,8 @@ def build_contrato_ejidal_pagos_varios_context(fin, cli, ven, cliente2=None,requ
                 return ''
             
             try:
-                # Decodificar base64
-                header, b64 = data_url.split(',', 1)
-                img_data = base64.b64decode(b64)
-                
-                # Crear archivo temporal
-                fd, temp_path = tempfile.mkstemp(suffix='.png')
-                with os.fdopen(fd, 'wb') as f:
-                    f.write(img_data)
-                
-                # ✅ MISMO TAMAÑO para todas las firmas
-                return InlineImage(tpl, temp_path, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
+                # La imagen ya decodificada sale del almacén de firmas
+                return imagen_firma(tpl, data_url, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
                 
             except Exception as e:
                 print(f"Error al procesar firma: {e}")
@@ -3698,17 +3463,8 @@ def build_contrato_canario_contado_context(fin, cli, ven, request=None, tpl=None
                 return ''
             
             try:
-                # Decodificar base64
-                header, b64 = data_url.split(',', 1)
-                img_data = base64.b64decode(b64)
-                
-                # Crear archivo temporal
-                fd, temp_path = tempfile.mkstemp(suffix='.png')
-                with os.fdopen(fd, 'wb') as f:
-                    f.write(img_data)
-                
-                # ✅ MISMO TAMAÑO para todas las firmas
-                return InlineImage(tpl, temp_path, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
+                # La imagen ya decodificada sale del almacén de firmas
+                return imagen_firma(tpl, data_url, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
                 
             except Exception as e:
                 print(f"Error al procesar firma: {e}")
@@ -3951,17 +3707,8 @@ def build_contrato_canario_contado_varios_context(fin, cli, ven, cliente2=None,r
                 return ''
             
             try:
-                # Decodificar base64
-                header, b64 = data_url.split(',', 1)
-                img_data = base64.b64decode(b64)
-                
-                # Crear archivo temporal
-                fd, temp_path = tempfile.mkstemp(suffix='.png')
-                with os.fdopen(fd, 'wb') as f:
-                    f.write(img_data)
-                
-                # ✅ MISMO TAMAÑO para todas las firmas
-                return InlineImage(tpl, temp_path, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
+                # La imagen ya decodificada sale del almacén de firmas
+                return imagen_firma(tpl, data_url, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
                 
             except Exception as e:
                 print(f"Error al procesar firma: {e}")
@@ -4206,17 +3953,8 @@ def build_contrato_canario_pagos_context(fin, cli, ven, request=None, tpl=None,
                 return ''
             
             try:
-                # Decodificar base64
-                header, b64 = data_url.split(',', 1)
-                img_data = base64.b64decode(b64)
-                
-                # Crear archivo temporal
-                fd, temp_path = tempfile.mkstemp(suffix='.png')
-                with os.fdopen(fd, 'wb') as f:
-                    f.write(img_data)
-                
-                # ✅ MISMO TAMAÑO para todas las firmas
-                return InlineImage(tpl, temp_path, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
+                # La imagen ya decodificada sale del almacén de firmas
+                return imagen_firma(tpl, data_url, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
                 
             except Exception as e:
                 print(f"Error al procesar firma: {e}")
@@ -4512,17 +4250,8 @@ def build_contrato_canario_pagos_varios_context(fin, cli, ven, cliente2=None,req
                 return ''
             
             try:
-                # Decodificar base64
-                header, b64 = data_url.split(',', 1)
-                img_data = base64.b64decode(b64)
-                
-                # Crear archivo temporal
-                fd, temp_path = tempfile.mkstemp(suffix='.png')
-                with os.fdopen(fd, 'wb') as f:
-                    f.write(img_data)
-                
-                # ✅ MISMO TAMAÑO para todas las firmas
-                return InlineImage(tpl, temp_path, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
+                # La imagen ya decodificada sale del almacén de firmas
+                return imagen_firma(tpl, data_url, width=Mm(FIRMA_ANCHO), height=Mm(FIRMA_ALTO))
                 
             except Exception as e:
                 print(f"Error al procesar firma: {e}")
@@ -4897,16 +4626,8 @@ def build_contrato_commeta_pagos_context(fin, cli, ven, request=None, tpl=None,
                 alto = 9.25   # 15mm de alto
             
             try:
-                # Decodificar base64
-                header, b64 = data_url.split(',', 1)
-                img_data = base64.b64decode(b64)
-                
-                # Crear archivo temporal
-                fd, temp_path = tempfile.mkstemp(suffix='.png')
-                with os.fdopen(fd, 'wb') as f:
-                    f.write(img_data)
-                # ✅ MISMO TAMAÑO para todas las firmas
-                return InlineImage(tpl, temp_path, width=Mm(ancho), height=Mm(alto))
+                # La imagen ya decodificada sale del almacén de firmas
+                return imagen_firma(tpl, data_url, width=Mm(ancho), height=Mm(alto))
                 
             except Exception as e:
                 print(f"Error al procesar firma: {e}")
@@ -5166,16 +4887,8 @@ def build_contrato_commeta_pagos_varios_context(fin, cli, ven, cliente2=None, re
                 alto = 9.25   # 15mm de alto
             
             try:
-                # Decodificar base64
-                header, b64 = data_url.split(',', 1)
-                img_data = base64.b64decode(b64)
-                
-                # Crear archivo temporal
-                fd, temp_path = tempfile.mkstemp(suffix='.png')
-                with os.fdopen(fd, 'wb') as f:
-                    f.write(img_data)
-                # ✅ MISMO TAMAÑO para todas las firmas
-                return InlineImage(tpl, temp_path, width=Mm(ancho), height=Mm(alto))
+                # La imagen ya decodificada sale del almacén de firmas
+                return imagen_firma(tpl, data_url, width=Mm(ancho), height=Mm(alto))
                 
             except Exception as e:
                 print(f"Error al procesar firma: {e}")
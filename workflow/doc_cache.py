@@ -0,0 +1,179 @@
+# workflow/doc_cache.py
+"""
+Caché de documentos renderizados (DOCX/PDF) direccionada por contenido.
+
+La clave de cada documento es el hash de:
+  - el slug del documento,
+  - el hash del archivo de plantilla,
+  - el estado de todos los registros que lee el builder (trámite, financiamiento,
+    clientes, vendedor/propietario, beneficiarios, cláusulas, lote, proyecto...),
+  - la fecha del día (varios builders imprimen la fecha actual).
+
+Los archivos se guardan en el storage por defecto bajo
+``cache/documentos/<tramite_id>/<slug>-<clave>.<ext>``. Como la clave cambia en
+cuanto cambia cualquier dato, una entrada nunca puede servir contenido viejo,
+pero la anterior queda inalcanzable y hay que borrarla:
+
+  - ``guardar()`` deja una sola entrada por trámite, documento y formato: al
+    guardar una clave nueva borra las demás (las de días anteriores, por
+    ejemplo);
+  - las señales de ``workflow/signals.py`` borran todas las entradas de un
+    trámite cuando cambia un registro que lo afecta.
+"""
+import hashlib
+import logging
+import os
+from datetime import date
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from core.models import Proyecto
+
+logger = logging.getLogger('pdfs')
+
+CACHE_DIR = 'cache/documentos'
+
+# {ruta_plantilla: (mtime, sha256)}
+_hashes_plantilla = {}
+
+
+def hash_plantilla(ruta):
+    """SHA-256 del archivo de plantilla, recalculado sólo si cambia su mtime."""
+    mtime = os.path.getmtime(ruta)
+    guardado = _hashes_plantilla.get(ruta)
+    if guardado and guardado[0] == mtime:
+        return guardado[1]
+
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(65536), b''):
+            h.update(bloque)
+    digest = h.hexdigest()
+    _hashes_plantilla[ruta] = (mtime, digest)
+    return digest
+
+
+def _instancias_involucradas(tramite):
+    """Registros cuyo contenido puede terminar en el documento del trámite."""
+    fin = tramite.financiamiento
+    instancias = [
+        tramite,
+        fin,
+        fin.lote,
+        fin.lote.proyecto,
+        tramite.cliente,
+        tramite.cliente_2,
+        tramite.vendedor,
+        tramite.propietario,
+        tramite.beneficiario_1,
+        tramite.beneficiario_2,
+        getattr(tramite, 'clausulas_especiales', None),
+        tramite.financiamiento_commeta,
+        getattr(fin, 'detalle_commeta', None),
+    ]
+    instancias.extend(fin.lote.proyecto.propietario.all())
+    return [obj for obj in instancias if obj is not None]
+
+
+# Campos que no llegan al documento: el contador de caché del catálogo, que
+# subir_version() cambia con update() sin disparar señales, y las columnas de
+# búsqueda derivadas del nombre.
+CAMPOS_IGNORADOS = frozenset(Proyecto.CAMPOS_CATALOGO) | {'nombre_busqueda', 'nombre_cliente_busqueda'}
+
+
+def _huella(obj):
+    """Representación estable de los campos concretos de una instancia que pueden salir en el documento."""
+    valores = [
+        f'{campo.attname}={campo.value_from_object(obj)!r}'
+        for campo in obj._meta.concrete_fields
+        if campo.attname not in CAMPOS_IGNORADOS
+    ]
+    return f'{obj._meta.label}:' + '|'.join(valores)
+
+
+def clave_documento(slug, ruta_plantilla, tramite, extra=()):
+    """
+    Clave de caché para el documento ``slug`` del trámite.
+
+    ``extra`` permite añadir entradas del builder que no viven en la base
+    de datos (p. ej. la firma guardada en sesión).
+    """
+    h = hashlib.sha256()
+    h.update(slug.encode())
+    h.update(hash_plantilla(ruta_plantilla).encode())
+    h.update(date.today().isoformat().encode())
+    for obj in _instancias_involucradas(tramite):
+        h.update(_huella(obj).encode())
+    for valor in extra:
+        h.update(repr(valor).encode())
+    return h.hexdigest()
+
+
+def _nombre(tramite_id, slug, clave, ext):
+    return f'{CACHE_DIR}/{tramite_id}/{slug}-{clave}.{ext}'
+
+
+def obtener(tramite_id, slug, clave, ext):
+    """Contenido del documento en caché, o None si no existe."""
+    nombre = _nombre(tramite_id, slug, clave, ext)
+    try:
+        if not default_storage.exists(nombre):
+            return None
+        with default_storage.open(nombre, 'rb') as f:
+            return f.read()
+    except Exception as e:
+        logger.warning('No se pudo leer %s de la caché: %s', nombre, e)
+        return None
+
+
+def guardar(tramite_id, slug, clave, ext, contenido):
+    """
+    Guarda ``contenido`` (bytes) en la caché y borra las demás entradas del
+    mismo documento y formato del trámite. Los errores no se propagan.
+    """
+    nombre = _nombre(tramite_id, slug, clave, ext)
+    try:
+        if not default_storage.exists(nombre):
+            default_storage.save(nombre, ContentFile(contenido))
+    except Exception as e:
+        logger.warning('No se pudo guardar %s en la caché: %s', nombre, e)
+        return
+    _borrar_anteriores(tramite_id, slug, nombre, ext)
+
+
+def _borrar_anteriores(tramite_id, slug, vigente, ext):
+    """
+    Borra las entradas de ``slug`` con extensión ``ext`` distintas de
+    ``vigente``, y las de antes de llevar el slug en el nombre.
+    """
+    directorio = f'{CACHE_DIR}/{tramite_id}'
+    try:
+        _, archivos = default_storage.listdir(directorio)
+    except Exception as e:
+        logger.warning('No se pudo listar %s: %s', directorio, e)
+        return
+    for archivo in archivos:
+        ruta = f'{directorio}/{archivo}'
+        base, extension = os.path.splitext(archivo)
+        if ruta == vigente or extension != f'.{ext}':
+            continue
+        if base.startswith(f'{slug}-') or '-' not in base:
+            try:
+                default_storage.delete(ruta)
+            except Exception as e:
+                logger.warning('No se pudo borrar %s de la caché: %s', ruta, e)
+
+
+def invalidar_tramites(tramite_ids):
+    """Borra todas las entradas en caché de los trámites indicados."""
+    for tramite_id in tramite_ids:
+        directorio = f'{CACHE_DIR}/{tramite_id}'
+        try:
+            _, archivos = default_storage.listdir(directorio)
+            for archivo in archivos:
+                default_storage.delete(f'{directorio}/{archivo}')
+        except FileNotFoundError:
+            continue
+        except Exception as e:
+            logger.warning('No se pudo invalidar la caché de %s: %s', directorio, e)
@@ -1,4 +1,11 @@
 # workflow/docs.py
+import copy
+import inspect
+import os
+import threading
+
+from django.conf import settings
+from docxtpl import DocxTemplate
 
 from workflow.builders import (
     build_aviso_privacidad_context,
@@ -202,4 +209,172 @@ DOCUMENTOS = {
 }
 
 
+# ---------------------------------------------------------------------------
+# Despacho de builders
+# ---------------------------------------------------------------------------
+# Todos los builders reciben (fin, cli, ven) y, de estos argumentos, sólo los
+# que declaran. Lo que acepta cada uno se registra en DOCUMENTOS[slug]['acepta']
+# al importar el módulo, así cada documento se construye con una sola llamada.
+
+ARGUMENTOS_BUILDER = frozenset((
+    'request', 'tpl', 'firma_data', 'clausulas_adicionales', 'cliente2',
+    'tramite', 'fecha', 'is_commeta', 'fin_commeta',
+))
+
+
+def _argumentos_aceptados(builder):
+    """Argumentos de ARGUMENTOS_BUILDER que acepta `builder` (todos si tiene **kwargs)."""
+    parametros = inspect.signature(builder).parameters.values()
+    if any(p.kind is inspect.Parameter.VAR_KEYWORD for p in parametros):
+        return ARGUMENTOS_BUILDER
+    return ARGUMENTOS_BUILDER.intersection(p.name for p in parametros)
+
+
+for _info in DOCUMENTOS.values():
+    _info['acepta'] = _argumentos_aceptados(_info['builder']) if _info['builder'] else frozenset()
+
+
+def construir_contexto(slug, snapshot, request, tpl, fecha=None, clausulas_adicionales=None):
+    """
+    Contexto del documento `slug` para el trámite de `snapshot`
+    (workflow.snapshot.TramiteSnapshot). Sin `clausulas_adicionales` se usan
+    las guardadas en el trámite.
+    """
+    info = DOCUMENTOS[slug]
+    tramite = snapshot.tramite
+    if clausulas_adicionales is None:
+        clausulas_adicionales = snapshot.clausulas_adicionales or {}
+    argumentos = {
+        'request': request,
+        'tpl': tpl,
+        'firma_data': tramite.firma_cliente,
+        'clausulas_adicionales': clausulas_adicionales,
+        'cliente2': snapshot.cli2,
+        'tramite': tramite,
+        'fecha': fecha,
+        'is_commeta': tramite.es_commeta,
+        'fin_commeta': snapshot.fin_commeta if tramite.es_commeta else None,
+    }
+    return info['builder'](
+        snapshot.fin, snapshot.cli, snapshot.ven,
+        **{nombre: valor for nombre, valor in argumentos.items() if nombre in info['acepta']}
+    )
+
+
+# ---------------------------------------------------------------------------
+# Resolución del contrato
+# ---------------------------------------------------------------------------
+# El contrato de un trámite depende del régimen del proyecto, del tipo de pago,
+# de si hay segundo comprador y de si el proyecto es Commeta. La tabla se arma
+# una sola vez al importar el módulo:
+#   (régimen, pago, varios, commeta) -> slug de DOCUMENTOS
+
+# Fragmento de Proyecto.tipo_contrato -> régimen. El orden importa: se toma
+# la primera coincidencia.
+REGIMENES = (
+    ('propiedad definitiva', 'definitiva'),
+    ('pequeña propiedad', 'propiedad'),
+    ('ejido', 'ejidal'),
+)
+
+
+def _armar_tabla_contratos():
+    tabla = {}
+    for commeta in (False, True):
+        for varios in (False, True):
+            sufijo = '_varios' if varios else ''
+            for regimen in ('definitiva', 'propiedad', 'ejidal'):
+                for pago in ('contado', 'pagos'):
+                    tabla[(regimen, pago, varios, commeta)] = f'contrato_{regimen}_{pago}{sufijo}'
+            # Sin régimen reconocido: Canario, o Commeta si el proyecto lo es.
+            # El contado de Commeta usa el contrato de Canario.
+            tabla[('otro', 'contado', varios, commeta)] = f'contrato_canario_contado{sufijo}'
+            proyecto = 'commeta' if commeta else 'canario'
+            tabla[('otro', 'pagos', varios, commeta)] = f'contrato_{proyecto}_pagos{sufijo}'
+    return tabla
+
+
+CONTRATOS = _armar_tabla_contratos()
+
+
+def regimen_contrato(tipo_contrato):
+    """Régimen ('definitiva', 'propiedad', 'ejidal' u 'otro') de Proyecto.tipo_contrato."""
+    tipo_contrato = (tipo_contrato or '').lower()
+    for fragmento, regimen in REGIMENES:
+        if fragmento in tipo_contrato:
+            return regimen
+    return 'otro'
+
+
+def resolver_contrato(tipo_contrato, tipo_pago, varios, commeta):
+    """Slug del contrato para la combinación dada."""
+    pago = 'contado' if tipo_pago == 'contado' else 'pagos'
+    return CONTRATOS[(regimen_contrato(tipo_contrato), pago, bool(varios), bool(commeta))]
+
+
+def slug_contrato(tramite):
+    """Slug del contrato que corresponde al trámite."""
+    fin = tramite.financiamiento
+    return resolver_contrato(
+        fin.lote.proyecto.tipo_contrato,
+        fin.tipo_pago,
+        tramite.cliente_2_id is not None,
+        fin.es_commeta,
+    )
+
+
+def slugs_contrato(tramites):
+    """
+    {tramite_id: slug del contrato} para un queryset de trámites, con una sola
+    consulta y sin instanciar los modelos. Pensado para regenerar documentos
+    en lote.
+    """
+    filas = tramites.values_list(
+        'pk',
+        'financiamiento__lote__proyecto__tipo_contrato',
+        'financiamiento__tipo_pago',
+        'cliente_2_id',
+        'financiamiento__lote__proyecto__tipo_proyecto',
+    )
+    return {
+        pk: resolver_contrato(tipo_contrato, tipo_pago, cliente_2_id is not None, tipo_proyecto == 'commeta')
+        for pk, tipo_contrato, tipo_pago, cliente_2_id, tipo_proyecto in filas
+    }
+
+
+# ---------------------------------------------------------------------------
+# Registro de plantillas
+# ---------------------------------------------------------------------------
+# Cada .docx se descomprime y parsea una sola vez por proceso; cada render
+# recibe una copia profunda del documento ya parseado, mucho más barata que
+# volver a leerlo de disco. Si el archivo cambia (mtime) se vuelve a cargar.
+
+_plantillas = {}  # ruta absoluta -> (mtime, DocxTemplate base sin renderizar)
+_plantillas_lock = threading.Lock()
+
+
+def obtener_plantilla(ruta):
+    """
+    DocxTemplate listo para renderizar a partir de `ruta` (absoluta o relativa
+    a BASE_DIR). Cada llamada entrega una copia aislada de la plantilla.
+    """
+    if not os.path.isabs(ruta):
+        ruta = os.path.join(settings.BASE_DIR, ruta)
+    mtime = os.path.getmtime(ruta)
+
+    with _plantillas_lock:
+        cargada = _plantillas.get(ruta)
+        if cargada is None or cargada[0] != mtime:
+            base = DocxTemplate(ruta)
+            base.init_docx()
+            cargada = (mtime, base)
+            _plantillas[ruta] = cargada
+
+    tpl = DocxTemplate(ruta)
+    tpl.docx = copy.deepcopy(cargada[1].docx)
+    return tpl
+
 
+def plantilla_documento(slug):
+    """Copia lista para renderizar de la plantilla de DOCUMENTOS[slug]."""
+    return obtener_plantilla(DOCUMENTOS[slug]['plantilla'])
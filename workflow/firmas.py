@@ -0,0 +1,143 @@
+# workflow/firmas.py
+"""
+Almacén de imágenes de firma.
+
+Las firmas llegan del canvas como data-URLs en base64. Aquí se decodifican y
+validan una sola vez, al capturarlas, y se guardan en dos lugares con el
+SHA-256 del data-URL como clave:
+
+  - el data-URL en una fila de FirmaAlmacenada, que es la copia que vale;
+  - la imagen como archivo binario en MEDIA_ROOT/firmas, que es una caché:
+    si falta (el disco del contenedor no es persistente) se vuelve a
+    escribir desde la fila la primera vez que se pide.
+
+Los builders reciben la ruta del archivo (o un InlineImage listo) sin volver
+a decodificar ni crear temporales en cada render. Quien ya registró una
+firma puede guardar sólo su clave y usarla en lugar del data-URL.
+"""
+import base64
+import binascii
+import hashlib
+import logging
+import os
+import re
+import tempfile
+
+from django.conf import settings
+from docx.image.exceptions import UnrecognizedImageError
+from docx.image.image import Image
+from docxtpl import InlineImage
+
+logger = logging.getLogger(__name__)
+
+# Formatos que python-docx sabe insertar
+EXTENSIONES = ('png', 'jpg', 'gif', 'bmp', 'tiff')
+
+# {clave: ruta} de las firmas ya resueltas en este proceso
+_rutas = {}
+
+_FORMATO_CLAVE = re.compile(r'[0-9a-f]{64}')
+
+
+def directorio_firmas():
+    return os.path.join(settings.MEDIA_ROOT, 'firmas')
+
+
+def clave_firma(data_url):
+    """Clave de la firma en el almacén: SHA-256 del data-URL."""
+    return hashlib.sha256(data_url.encode()).hexdigest()
+
+
+def _buscar(clave):
+    for ext in EXTENSIONES:
+        ruta = os.path.join(directorio_firmas(), f'{clave}.{ext}')
+        if os.path.exists(ruta):
+            return ruta
+    return None
+
+
+def _decodificar(data_url):
+    """(bytes, extensión) de la imagen del data-URL; ValueError si no es una imagen."""
+    # "data:image/png;base64,iVBOR..." -> bytes de la imagen
+    b64 = data_url.split(',', 1)[1] if ',' in data_url else data_url
+    try:
+        blob = base64.b64decode(b64)
+        return blob, Image.from_blob(blob).ext
+    except (binascii.Error, UnrecognizedImageError) as e:
+        raise ValueError(e) from e
+
+
+def _escribir(clave, ext, blob):
+    directorio = directorio_firmas()
+    os.makedirs(directorio, exist_ok=True)
+    ruta = os.path.join(directorio, f'{clave}.{ext}')
+
+    # Escritura atómica: otro worker puede estar guardando la misma firma
+    fd, tmp = tempfile.mkstemp(dir=directorio, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(blob)
+    os.replace(tmp, ruta)
+    return ruta
+
+
+def _restaurar(clave):
+    """Vuelve a escribir el archivo de la firma desde su fila, si la hay."""
+    from .models import FirmaAlmacenada
+
+    data_url = FirmaAlmacenada.objects.filter(clave=clave).values_list('data_url', flat=True).first()
+    if data_url is None:
+        return None
+    try:
+        blob, ext = _decodificar(data_url)
+    except ValueError as e:
+        logger.error('La firma %s guardada no es una imagen válida: %s', clave, e)
+        return None
+    logger.info('Firma %s restaurada desde la base de datos', clave)
+    return _escribir(clave, ext, blob)
+
+
+def ruta_firma(clave):
+    """Ruta del archivo de la firma `clave`, o None si no está en el almacén."""
+    ruta = _rutas.get(clave) or _buscar(clave) or _restaurar(clave)
+    if ruta:
+        _rutas[clave] = ruta
+    return ruta
+
+
+def registrar_firma(data_url):
+    """
+    Guarda la firma en el almacén (si no estaba) y devuelve la ruta del archivo.
+    `data_url` también puede ser la clave de una firma ya registrada.
+
+    Devuelve None si no hay firma o si el contenido no es una imagen válida.
+    """
+    if not data_url:
+        return None
+    if _FORMATO_CLAVE.fullmatch(data_url):
+        return ruta_firma(data_url)
+
+    from .models import FirmaAlmacenada
+
+    clave = clave_firma(data_url)
+    ruta = ruta_firma(clave)
+    if ruta:
+        return ruta
+
+    try:
+        blob, ext = _decodificar(data_url)
+    except ValueError as e:
+        logger.warning('Firma descartada, no es una imagen válida: %s', e)
+        return None
+
+    FirmaAlmacenada.objects.get_or_create(clave=clave, defaults={'data_url': data_url})
+    ruta = _escribir(clave, ext, blob)
+    _rutas[clave] = ruta
+    return ruta
+
+
+def imagen_firma(tpl, data_url, width=None, height=None):
+    """InlineImage de la firma (data-URL o clave) para `tpl`, o '' si no hay firma."""
+    ruta = registrar_firma(data_url)
+    if not ruta:
+        return ''
+    return InlineImage(tpl, ruta, width=width, height=height)
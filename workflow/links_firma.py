@@ -0,0 +1,115 @@
+# workflow/links_firma.py
+"""
+Links de firma de muchos trámites a la vez.
+
+generar_links_masivo() genera los tokens que falten a un queryset de
+trámites dentro de una transacción: un bulk_update sólo de los campos
+link_firma_* y un upsert en TokenFirma, sin guardar la fila completa de
+cada trámite. filas_urls_firma() arma las URLs igual que
+Tramite.obtener_urls_firma_completas() y exportar_csv() / exportar_json()
+las escriben para repartirlas (p. ej. antes de un evento de ventas).
+"""
+import csv
+import json
+import secrets
+
+from django.db import transaction
+from django.urls import reverse
+
+from workflow.models import LINKS_FIRMA, TokenFirma, Tramite
+
+# Vista de firma de cada rol de LINKS_FIRMA
+URLS_FIRMA = {
+    'cliente': 'workflow:firma_cliente',
+    'segundo_cliente': 'workflow:firma_segundo_cliente',
+    'beneficiario': 'workflow:firma_beneficiario',
+    'testigo1': 'workflow:firma_testigo1',
+    'testigo2': 'workflow:firma_testigo2',
+    'vendedor': 'workflow:firma_vendedor',
+}
+
+COLUMNAS_EXPORTACION = ['tramite', 'cliente', 'firmante', 'url']
+
+
+def _requisitos():
+    """(rol, campo link, attname del requisito o None) de LINKS_FIRMA."""
+    opts = Tramite._meta
+    return [
+        (rol, campo, opts.get_field(requisito).attname if requisito else None)
+        for rol, campo, requisito in LINKS_FIRMA
+    ]
+
+
+def generar_links_masivo(tramites, vigencia=None, un_solo_uso=False, tam_lote=500):
+    """
+    Genera los links de firma que falten a los trámites del queryset
+    `tramites` (mismas reglas que Tramite.generar_links_firma) en una sola
+    transacción. Devuelve (trámites modificados, links generados).
+    """
+    requisitos = _requisitos()
+    campos_link = [campo for _, campo, _ in requisitos]
+    campos_requisito = [attname for _, _, attname in requisitos if attname]
+
+    with transaction.atomic():
+        lista = list(
+            tramites.order_by('pk')
+            .select_for_update(of=('self',))
+            .only('pk', *campos_link, *campos_requisito)
+        )
+        modificados, generados = [], 0
+        for tramite in lista:
+            faltantes = [
+                campo for _, campo, attname in requisitos
+                if not getattr(tramite, campo) and (attname is None or getattr(tramite, attname))
+            ]
+            for campo in faltantes:
+                setattr(tramite, campo, secrets.token_urlsafe(32))
+            if faltantes:
+                modificados.append(tramite)
+                generados += len(faltantes)
+
+        if modificados:
+            Tramite.objects.bulk_update(modificados, campos_link, batch_size=tam_lote)
+        TokenFirma.objects.sincronizar(lista, vigencia=vigencia, un_solo_uso=un_solo_uso)
+
+    return len(modificados), generados
+
+
+def filas_urls_firma(tramites, base_url):
+    """
+    Una fila por link activo de los trámites del queryset `tramites`:
+    {'tramite', 'cliente', 'firmante', 'url'}. `base_url` es el esquema y
+    host, p. ej. 'https://app.ejemplo.com'.
+    """
+    requisitos = _requisitos()
+    base_url = base_url.rstrip('/')
+    filas = []
+    for tramite in (
+        tramites.order_by('pk')
+        .select_related('cliente')
+        .only('pk', 'cliente__nombre_completo',
+              *[campo for _, campo, _ in requisitos],
+              *[attname for _, _, attname in requisitos if attname])
+    ):
+        for rol, campo, attname in requisitos:
+            token = getattr(tramite, campo)
+            if token and (attname is None or getattr(tramite, attname)):
+                filas.append({
+                    'tramite': tramite.pk,
+                    'cliente': tramite.cliente.nombre_completo,
+                    'firmante': rol,
+                    'url': f"{base_url}{reverse(URLS_FIRMA[rol], args=[token])}",
+                })
+    return filas
+
+
+def exportar_csv(filas, salida):
+    """Escribe `filas` como CSV en el archivo de texto `salida`."""
+    writer = csv.DictWriter(salida, fieldnames=COLUMNAS_EXPORTACION)
+    writer.writeheader()
+    writer.writerows(filas)
+
+
+def exportar_json(filas, salida):
+    """Escribe `filas` como una lista JSON en el archivo de texto `salida`."""
+    json.dump(filas, salida, ensure_ascii=False, indent=2)
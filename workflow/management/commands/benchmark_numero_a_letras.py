@@ -0,0 +1,175 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from financiamiento.amortizacion import CENTAVO
+from workflow import utils
+
+
+def numero_a_letras_anterior(numero, apocopado=True):
+    """Implementación anterior (recursiva), sólo como referencia."""
+    # Caso especial para cero
+    if numero == 0:
+        return "CERO"
+    
+    # Diccionarios para conversión
+    if apocopado:
+        unidades = ['', 'UN', 'DOS', 'TRES', 'CUATRO', 'CINCO', 'SEIS', 'SIETE', 'OCHO', 'NUEVE']
+        veintiuno = 'VEINTIUN'
+    else:
+        unidades = ['', 'UNO', 'DOS', 'TRES', 'CUATRO', 'CINCO', 'SEIS', 'SIETE', 'OCHO', 'NUEVE']
+        veintiuno = 'VEINTIUNO'
+    
+    decenas = ['', 'DIEZ', 'VEINTE', 'TREINTA', 'CUARENTA', 'CINCUENTA', 'SESENTA', 'SETENTA', 'OCHENTA', 'NOVENTA']
+    especiales = {
+        11: 'ONCE', 12: 'DOCE', 13: 'TRECE', 14: 'CATORCE', 15: 'QUINCE',
+        16: 'DIECISÉIS', 17: 'DIECISIETE', 18: 'DIECIOCHO', 19: 'DIECINUEVE',
+        20: 'VEINTE', 21: veintiuno, 22: 'VEINTIDÓS', 23: 'VEINTITRÉS',
+        24: 'VEINTICUATRO', 25: 'VEINTICINCO', 26: 'VEINTISÉIS', 27: 'VEINTISIETE',
+        28: 'VEINTIOCHO', 29: 'VEINTINUEVE'
+    }
+    
+    # Manejar decimales
+    entero = int(numero)
+    decimales = int(round((numero - entero) * 100))
+    
+    # Convertir parte entera
+    resultado = []
+    
+    # Manejar millones
+    if entero >= 1000000:
+        millones = entero // 1000000
+        entero %= 1000000
+        
+        if millones == 1:
+            resultado.append("UN MILLÓN")
+        elif millones > 1:
+            # pasar el mismo modo apocopado a la recursión
+            resultado.append(numero_a_letras_anterior(millones, apocopado=apocopado))
+            resultado.append("MILLONES")
+    
+    # Manejar miles
+    if entero >= 1000:
+        miles = entero // 1000
+        entero %= 1000
+        
+        if miles == 1:
+            resultado.append("MIL")
+        elif miles > 1:
+            resultado.append(numero_a_letras_anterior(miles, apocopado=apocopado))
+            resultado.append("MIL")
+    
+    # Convertir centenas (0-999)
+    if entero > 0:
+        centena = entero // 100
+        resto = entero % 100
+        
+        if centena > 0:
+            if centena == 1:
+                if resto == 0:
+                    resultado.append("CIEN")
+                else:
+                    resultado.append("CIENTO")
+            elif centena == 5:
+                resultado.append("QUINIENTOS")
+            elif centena == 7:
+                resultado.append("SETECIENTOS")
+            elif centena == 9:
+                resultado.append("NOVECIENTOS")
+            else:
+                # unidades[centena] funciona porque tenemos valores como 'DOS' etc.
+                resultado.append(unidades[centena] + "CIENTOS")
+        
+        if resto > 0:
+            if resto in especiales:
+                resultado.append(especiales[resto])
+            else:
+                decena = resto // 10
+                unidad = resto % 10
+                
+                if decena > 0:
+                    resultado.append(decenas[decena])
+                
+                if unidad > 0:
+                    if decena > 0 and unidad > 0:
+                        resultado.append('Y')
+                    resultado.append(unidades[unidad])
+    
+    # Unir todas las partes
+    letras = ' '.join(resultado)
+    
+    # Agregar decimales si existen
+    if decimales > 0:
+        letras += f" CON {decimales:02d}/100"
+    
+    return letras
+
+
+def _medir(funcion, valores, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion(valores)
+    return time.perf_counter() - inicio
+
+
+class Command(BaseCommand):
+    help = 'Compara numero_a_letras con la implementación anterior (resultados y tiempos)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=200,
+                            help='Veces que se convierte cada juego de valores')
+        parser.add_argument('--cuotas', type=int, default=240,
+                            help='Cuotas de la columna de amortización simulada')
+
+    def handle(self, *args, **options):
+        repeticiones = options['repeticiones']
+        aleatorio = random.Random(0)
+
+        # Lo que convierte un contrato: montos, día y año de la fecha
+        contrato = [
+            float(Decimal(aleatorio.randint(100000, 2000000)).quantize(CENTAVO)) for _ in range(10)
+        ] + [float(aleatorio.randint(1, 31)), 2026.0]
+        # Una columna de cuotas: casi todas iguales, la última distinta
+        mensualidad = float(aleatorio.randint(1000, 9000))
+        columna = [mensualidad] * (options['cuotas'] - 1) + [mensualidad * 3.5]
+        # Montos sin repetir, para ver el costo sin caché
+        variados = [round(aleatorio.uniform(0, 10000000), 2) for _ in range(2000)]
+
+        for nombre, valores in (('contrato', contrato), ('columna', columna), ('variados', variados)):
+            distintos = [
+                v for v in valores
+                if numero_a_letras_anterior(v) != utils.numero_a_letras(v)
+                or numero_a_letras_anterior(v, apocopado=False) != utils.numero_a_letras(v, apocopado=False)
+            ]
+            if distintos:
+                raise CommandError(f'Resultados distintos en {nombre}: {distintos[:5]}')
+
+        def anterior(valores):
+            return [numero_a_letras_anterior(v) for v in valores]
+
+        def nueva(valores):
+            return [utils.numero_a_letras(v) for v in valores]
+
+        def nueva_sin_cache(valores):
+            utils._letras.cache_clear()
+            return nueva(valores)
+
+        pruebas = [
+            ('contrato', contrato, (('anterior', anterior), ('nueva', nueva), ('nueva sin caché', nueva_sin_cache))),
+            ('columna', columna, (('anterior', anterior), ('nueva', nueva), ('lote', utils.numeros_a_letras))),
+            ('variados', variados, (('anterior', anterior), ('nueva sin caché', nueva_sin_cache))),
+        ]
+        for nombre, valores, funciones in pruebas:
+            self.stdout.write(f'{nombre} ({len(valores)} valores x {repeticiones}):')
+            base = None
+            for etiqueta, funcion in funciones:
+                segundos = _medir(funcion, valores, repeticiones)
+                base = base or segundos
+                por_valor = segundos / (len(valores) * repeticiones) * 1e6
+                self.stdout.write(
+                    f'  {etiqueta:<16} {segundos:8.3f} s  {por_valor:7.2f} µs/valor  x{base / segundos:5.1f}'
+                )
+
+        self.stdout.write(self.style.SUCCESS('Resultados idénticos a la implementación anterior'))
@@ -0,0 +1,63 @@
+import io
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from workflow.links_firma import exportar_csv, exportar_json, filas_urls_firma, generar_links_masivo
+from workflow.models import Tramite
+
+EXPORTADORES = {'csv': exportar_csv, 'json': exportar_json}
+
+
+class Command(BaseCommand):
+    help = 'Genera los links de firma que falten a varios trámites y exporta sus URLs en CSV o JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--proyecto', type=int,
+                            help='Sólo trámites de lotes de este proyecto (ID)')
+        parser.add_argument('--tramite', type=int, nargs='+',
+                            help='Sólo estos trámites (IDs)')
+        parser.add_argument('--usuario', type=int,
+                            help='Sólo trámites creados por este usuario (ID)')
+        parser.add_argument('--vigencia-dias', type=int,
+                            help='Los links nuevos expiran después de N días')
+        parser.add_argument('--un-solo-uso', action='store_true',
+                            help='Los links nuevos dejan de funcionar después de firmar')
+        parser.add_argument('--base-url',
+                            help='Esquema y host de las URLs exportadas, p. ej. https://app.ejemplo.com')
+        parser.add_argument('--formato', choices=sorted(EXPORTADORES), default='csv')
+        parser.add_argument('--salida',
+                            help='Archivo de salida (por defecto, la salida estándar)')
+
+    def handle(self, *args, **options):
+        tramites = Tramite.objects.all()
+        if options['proyecto']:
+            tramites = tramites.filter(financiamiento__lote__proyecto_id=options['proyecto'])
+        if options['tramite']:
+            tramites = tramites.filter(pk__in=options['tramite'])
+        if options['usuario']:
+            tramites = tramites.filter(usuario_creador_id=options['usuario'])
+
+        vigencia = timedelta(days=options['vigencia_dias']) if options['vigencia_dias'] else None
+        modificados, generados = generar_links_masivo(
+            tramites, vigencia=vigencia, un_solo_uso=options['un_solo_uso']
+        )
+        self.stderr.write(self.style.SUCCESS(
+            f'{generados} links generados en {modificados} trámites'
+        ))
+
+        if not options['base_url']:
+            if options['salida']:
+                raise CommandError('--salida requiere --base-url para armar las URLs')
+            return
+
+        filas = filas_urls_firma(tramites, options['base_url'])
+        exportar = EXPORTADORES[options['formato']]
+        if options['salida']:
+            with open(options['salida'], 'w', newline='', encoding='utf-8') as salida:
+                exportar(filas, salida)
+            self.stderr.write(f"{len(filas)} URLs exportadas a {options['salida']}")
+        else:
+            salida = io.StringIO()
+            exportar(filas, salida)
+            self.stdout.write(salida.getvalue())
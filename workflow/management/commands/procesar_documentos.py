@@ -0,0 +1,74 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from workflow import trabajos
+from workflow.borradores import purgar_borradores
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Worker de la cola de documentos: genera los paquetes ZIP encolados desde el paso 3'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--una-vez', action='store_true',
+                            help='Procesa los trabajos pendientes y termina')
+        parser.add_argument('--intervalo', type=float, default=2.0,
+                            help='Segundos de espera cuando la cola está vacía')
+        parser.add_argument('--purgar-dias', type=int, default=2,
+                            help='Borra trabajos finalizados (y su ZIP) con más de N días')
+        parser.add_argument('--borradores-dias', type=int, default=30,
+                            help='Borra borradores del asistente sin trámite con más de N días sin cambios')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('Worker de documentos iniciado'))
+        self.ultima_purga = 0
+
+        try:
+            while True:
+                # Conexiones que la base cerró (p. ej. Neon tras un rato inactivo)
+                # se descartan antes de cada vuelta, igual que entre peticiones
+                close_old_connections()
+                try:
+                    if not self._vuelta(options):
+                        break
+                except Exception:
+                    # Un error de base de datos no debe matar al worker: los
+                    # trabajos pendientes se quedarían así para siempre
+                    logger.exception('Error en el worker de documentos')
+                    if options['una_vez']:
+                        raise
+                    time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Worker de documentos detenido'))
+
+    def _vuelta(self, options):
+        """Una iteración del worker. Devuelve False cuando debe terminar."""
+        # Mantenimiento: trabajos de workers caídos, ZIPs viejos y borradores abandonados
+        if time.monotonic() - self.ultima_purga > 300:
+            liberados = trabajos.liberar_atascados()
+            borrados = trabajos.purgar_terminados(options['purgar_dias'])
+            if liberados or borrados:
+                self.stdout.write(f'{liberados} trabajos reencolados, {borrados} trabajos purgados')
+            abandonados = purgar_borradores(options['borradores_dias'])
+            if abandonados:
+                self.stdout.write(f'{abandonados} borradores abandonados borrados')
+            self.ultima_purga = time.monotonic()
+
+        trabajo = trabajos.tomar_siguiente()
+        if trabajo is None:
+            if options['una_vez']:
+                return False
+            time.sleep(options['intervalo'])
+            return True
+
+        self.stdout.write(f'Procesando trabajo {trabajo.pk} (trámite #{trabajo.tramite_id})...')
+        trabajo = trabajos.procesar(trabajo)
+        if trabajo.estado == 'terminado':
+            self.stdout.write(self.style.SUCCESS(f'Trabajo {trabajo.pk} terminado'))
+        else:
+            self.stdout.write(self.style.ERROR(f'Trabajo {trabajo.pk} falló: {trabajo.error}'))
+        return True
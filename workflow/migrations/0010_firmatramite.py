@@ -0,0 +1,126 @@
+# Generated by Django 5.0.3 on 2026-10-18 20:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+CAMPOS_FIRMA = ('firma_cliente', 'firma_cliente2', 'firma_vendedor', 'testigo_1_firma', 'testigo_2_firma', 'beneficiario_1_firma', 'beneficiario_2_firma')
+
+
+def mover_firmas(apps, schema_editor):
+    """Copia las firmas de Tramite a FirmaTramite y marca la fecha de firma."""
+    Tramite = apps.get_model('workflow', 'Tramite')
+    FirmaTramite = apps.get_model('workflow', 'FirmaTramite')
+
+    for tramite in Tramite.objects.only('id', 'actualizado_en', *CAMPOS_FIRMA).iterator(chunk_size=100):
+        firmas = []
+        for campo in CAMPOS_FIRMA:
+            data_url = getattr(tramite, campo)
+            if data_url:
+                firmas.append(FirmaTramite(tramite_id=tramite.id, campo=campo, data_url=data_url))
+        if firmas:
+            FirmaTramite.objects.bulk_create(firmas)
+            # No se sabe cuándo firmó; la última modificación es la mejor aproximación
+            Tramite.objects.filter(id=tramite.id).update(
+                **{f'{f.campo}_en': tramite.actualizado_en for f in firmas}
+            )
+
+
+def regresar_firmas(apps, schema_editor):
+    Tramite = apps.get_model('workflow', 'Tramite')
+    FirmaTramite = apps.get_model('workflow', 'FirmaTramite')
+
+    for firma in FirmaTramite.objects.iterator(chunk_size=100):
+        Tramite.objects.filter(id=firma.tramite_id).update(**{firma.campo: firma.data_url})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0009_tramite_link_firma_vendedor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FirmaTramite',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('campo', models.CharField(choices=[('firma_cliente', 'firma_cliente'), ('firma_cliente2', 'firma_cliente2'), ('firma_vendedor', 'firma_vendedor'), ('testigo_1_firma', 'testigo_1_firma'), ('testigo_2_firma', 'testigo_2_firma'), ('beneficiario_1_firma', 'beneficiario_1_firma'), ('beneficiario_2_firma', 'beneficiario_2_firma')], help_text='Firmante (nombre del antiguo campo en Tramite)', max_length=30)),
+                ('data_url', models.TextField(help_text='Data‑URL base64 de la firma')),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('tramite', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='firmas', to='workflow.tramite')),
+            ],
+            options={
+                'verbose_name': 'Firma del Trámite',
+                'verbose_name_plural': 'Firmas de los Trámites',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='firmatramite',
+            constraint=models.UniqueConstraint(fields=('tramite', 'campo'), name='firma_unica_por_firmante'),
+        ),
+        migrations.AddField(
+            model_name='tramite',
+            name='firma_cliente_en',
+            field=models.DateTimeField(blank=True, help_text='Fecha en que firmó el cliente', null=True),
+        ),
+        migrations.AddField(
+            model_name='tramite',
+            name='firma_cliente2_en',
+            field=models.DateTimeField(blank=True, help_text='Fecha en que firmó el segundo cliente', null=True),
+        ),
+        migrations.AddField(
+            model_name='tramite',
+            name='firma_vendedor_en',
+            field=models.DateTimeField(blank=True, help_text='Fecha en que firmó el vendedor', null=True),
+        ),
+        migrations.AddField(
+            model_name='tramite',
+            name='testigo_1_firma_en',
+            field=models.DateTimeField(blank=True, help_text='Fecha en que firmó el testigo 1', null=True),
+        ),
+        migrations.AddField(
+            model_name='tramite',
+            name='testigo_2_firma_en',
+            field=models.DateTimeField(blank=True, help_text='Fecha en que firmó el testigo 2', null=True),
+        ),
+        migrations.AddField(
+            model_name='tramite',
+            name='beneficiario_1_firma_en',
+            field=models.DateTimeField(blank=True, help_text='Fecha en que firmó el beneficiario 1', null=True),
+        ),
+        migrations.AddField(
+            model_name='tramite',
+            name='beneficiario_2_firma_en',
+            field=models.DateTimeField(blank=True, help_text='Fecha en que firmó el beneficiario 2', null=True),
+        ),
+        migrations.RunPython(mover_firmas, regresar_firmas),
+        migrations.RemoveField(
+            model_name='tramite',
+            name='firma_cliente',
+        ),
+        migrations.RemoveField(
+            model_name='tramite',
+            name='firma_cliente2',
+        ),
+        migrations.RemoveField(
+            model_name='tramite',
+            name='firma_vendedor',
+        ),
+        migrations.RemoveField(
+            model_name='tramite',
+            name='testigo_1_firma',
+        ),
+        migrations.RemoveField(
+            model_name='tramite',
+            name='testigo_2_firma',
+        ),
+        migrations.RemoveField(
+            model_name='tramite',
+            name='beneficiario_1_firma',
+        ),
+        migrations.RemoveField(
+            model_name='tramite',
+            name='beneficiario_2_firma',
+        ),
+    ]
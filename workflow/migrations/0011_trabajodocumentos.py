@@ -0,0 +1,41 @@
+# Generated by Django 5.0.3 on 2026-10-18 20:44
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0010_firmatramite'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoDocumentos',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('documentos', models.JSONField(default=list, help_text='Slugs de DOCUMENTOS en el orden seleccionado')),
+                ('progreso', models.JSONField(blank=True, default=dict, help_text='Estado de cada documento: {slug: estado}')),
+                ('datos_sesion', models.JSONField(blank=True, default=dict, help_text='Datos de la sesión que leen los builders')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('terminado', 'Terminado'), ('error', 'Error')], default='pendiente', max_length=20)),
+                ('archivo', models.FileField(blank=True, upload_to='trabajos_documentos/')),
+                ('error', models.TextField(blank=True)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('iniciado_en', models.DateTimeField(blank=True, null=True)),
+                ('terminado_en', models.DateTimeField(blank=True, null=True)),
+                ('tramite', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trabajos_documentos', to='workflow.tramite')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Documentos',
+                'verbose_name_plural': 'Trabajos de Documentos',
+                'ordering': ['creado_en'],
+                'indexes': [models.Index(fields=['estado', 'creado_en'], name='trabajo_doc_estado_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.3 on 2026-10-18 21:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0011_trabajodocumentos'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tramite',
+            index=models.Index(fields=['-creado_en', '-id'], name='tramite_creado_id_idx'),
+        ),
+    ]
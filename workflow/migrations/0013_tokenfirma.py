@@ -0,0 +1,63 @@
+# Generated by Django 5.0.3 on 2026-10-18 22:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+LINKS_FIRMA = (
+    ('cliente', 'link_firma_cliente'),
+    ('segundo_cliente', 'link_firma_cliente2'),
+    ('beneficiario', 'link_firma_beneficiario1'),
+    ('testigo1', 'link_firma_testigo1'),
+    ('testigo2', 'link_firma_testigo2'),
+    ('vendedor', 'link_firma_vendedor'),
+)
+
+
+def copiar_tokens(apps, schema_editor):
+    """Crea un TokenFirma por cada link de firma ya generado."""
+    Tramite = apps.get_model('workflow', 'Tramite')
+    TokenFirma = apps.get_model('workflow', 'TokenFirma')
+
+    campos = [campo for _, campo in LINKS_FIRMA]
+    tokens = []
+    for tramite in Tramite.objects.only('id', *campos).iterator(chunk_size=500):
+        for rol, campo in LINKS_FIRMA:
+            token = getattr(tramite, campo)
+            if token:
+                tokens.append(TokenFirma(tramite_id=tramite.id, rol=rol, token=token))
+        if len(tokens) >= 500:
+            TokenFirma.objects.bulk_create(tokens, ignore_conflicts=True)
+            tokens = []
+    TokenFirma.objects.bulk_create(tokens, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0012_tramite_creado_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenFirma',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rol', models.CharField(choices=[('cliente', 'cliente'), ('segundo_cliente', 'segundo_cliente'), ('beneficiario', 'beneficiario'), ('testigo1', 'testigo1'), ('testigo2', 'testigo2'), ('vendedor', 'vendedor')], help_text='Tipo de firmante del link', max_length=20)),
+                ('token', models.CharField(max_length=255, unique=True)),
+                ('expira_en', models.DateTimeField(blank=True, help_text='Vacío: no expira', null=True)),
+                ('un_solo_uso', models.BooleanField(default=False)),
+                ('usado_en', models.DateTimeField(blank=True, null=True)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('tramite', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tokens_firma', to='workflow.tramite')),
+            ],
+            options={
+                'verbose_name': 'Token de Firma',
+                'verbose_name_plural': 'Tokens de Firma',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='tokenfirma',
+            constraint=models.UniqueConstraint(fields=('tramite', 'rol'), name='token_firma_unico_por_rol'),
+        ),
+        migrations.RunPython(copiar_tokens, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.0.3 on 2026-10-18 21:28
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_proyecto_version_catalogo'),
+        ('financiamiento', '0006_financiamiento_nombre_cliente_busqueda'),
+        ('workflow', '0013_tokenfirma'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BorradorTramite',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo_financiamiento', models.CharField(choices=[('normal', 'Normal'), ('commeta', 'Commeta')], default='normal', max_length=10)),
+                ('cliente_2_datos', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('beneficiario_datos', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('testigo_1_nombre', models.CharField(blank=True, max_length=150)),
+                ('testigo_2_nombre', models.CharField(blank=True, max_length=150)),
+                ('testigo_1_idmex', models.CharField(blank=True, max_length=50)),
+                ('testigo_2_idmex', models.CharField(blank=True, max_length=50)),
+                ('edad_cliente_1', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('edad_cliente_2', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('vecino', models.CharField(blank=True, max_length=255)),
+                ('vecino_2', models.CharField(blank=True, max_length=255)),
+                ('persona_tipo', models.CharField(blank=True, choices=[('vendedor', 'Vendedor'), ('propietario', 'Propietario')], max_length=20)),
+                ('persona_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('aviso_aceptado', models.BooleanField(default=False)),
+                ('tipo_firma', models.CharField(blank=True, choices=[('digital', 'Digital'), ('fisica', 'Física')], max_length=10)),
+                ('firma_cliente', models.CharField(blank=True, help_text='Clave de la firma en el almacén de firmas (SHA-256 del data-URL)', max_length=64)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('cliente', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.cliente')),
+                ('financiamiento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='financiamiento.financiamiento')),
+                ('financiamiento_commeta', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='financiamiento.financiamientocommeta')),
+                ('tramite', models.OneToOneField(blank=True, help_text='Se asigna al aceptar el aviso de privacidad', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='borrador', to='workflow.tramite')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='borradores_tramite', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Borrador de Trámite',
+                'verbose_name_plural': 'Borradores de Trámites',
+            },
+        ),
+    ]
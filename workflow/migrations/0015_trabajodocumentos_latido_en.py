@@ -0,0 +1,18 @@
+# Generated by Django 5.0.3 on 2026-10-18 21:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0014_borradortramite'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trabajodocumentos',
+            name='latido_en',
+            field=models.DateTimeField(blank=True, help_text='Último aviso de vida del worker que lo procesa', null=True),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.0.3 on 2026-10-18 21:52
+
+import base64
+import os
+import re
+
+from django.conf import settings
+from django.db import migrations, models
+
+TIPOS = {'png': 'png', 'jpg': 'jpeg', 'gif': 'gif', 'bmp': 'bmp', 'tiff': 'tiff'}
+
+
+def copiar_firmas_existentes(apps, schema_editor):
+    """Las firmas ya guardadas sólo como archivo pasan también a la base de datos."""
+    FirmaAlmacenada = apps.get_model('workflow', 'FirmaAlmacenada')
+    directorio = os.path.join(settings.MEDIA_ROOT, 'firmas')
+    if not os.path.isdir(directorio):
+        return
+    nuevas = []
+    for archivo in os.listdir(directorio):
+        coincidencia = re.fullmatch(r'([0-9a-f]{64})\.(\w+)', archivo)
+        if not coincidencia or coincidencia.group(2) not in TIPOS:
+            continue
+        clave, ext = coincidencia.groups()
+        with open(os.path.join(directorio, archivo), 'rb') as f:
+            b64 = base64.b64encode(f.read()).decode()
+        nuevas.append(FirmaAlmacenada(clave=clave, data_url=f'data:image/{TIPOS[ext]};base64,{b64}'))
+    FirmaAlmacenada.objects.bulk_create(nuevas, batch_size=200, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0015_trabajodocumentos_latido_en'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FirmaAlmacenada',
+            fields=[
+                ('clave', models.CharField(help_text='SHA-256 del data-URL', max_length=64, primary_key=True, serialize=False)),
+                ('data_url', models.TextField(help_text='Data‑URL base64 de la firma')),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Firma Almacenada',
+                'verbose_name_plural': 'Firmas Almacenadas',
+            },
+        ),
+        migrations.RunPython(copiar_firmas_existentes, migrations.RunPython.noop),
+    ]
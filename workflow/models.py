@@ -1,8 +1,141 @@
+import operator
+import uuid
+from functools import reduce
+
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models.functions import Cast
 from django.conf import settings
 from financiamiento.models import Financiamiento
 from core.models import Cliente, Vendedor, Propietario
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+# Firmas de un trámite. La imagen (data-URL) vive en FirmaTramite; en el
+# Tramite sólo queda la fecha en que firmó cada quien (campo + '_en').
+CAMPOS_FIRMA = (
+    'firma_cliente',
+    'firma_cliente2',
+    'firma_vendedor',
+    'testigo_1_firma',
+    'testigo_2_firma',
+    'beneficiario_1_firma',
+    'beneficiario_2_firma',
+)
+
+# Quién debe firmar el trámite: (etiqueta, campo con la fecha de firma,
+# campo que hace requerida la firma o None si siempre se requiere). Lo usan
+# las propiedades de firmas y TramiteQuerySet.con_estado_firmas().
+FIRMANTES = (
+    ('Cliente Principal', 'firma_cliente_en', None),
+    ('Segundo Cliente', 'firma_cliente2_en', 'cliente_2'),
+    ('Beneficiario', 'beneficiario_1_firma_en', 'beneficiario_1'),
+    ('Testigo 1', 'testigo_1_firma_en', 'testigo_1_nombre'),
+    ('Testigo 2', 'testigo_2_firma_en', 'testigo_2_nombre'),
+    ('Vendedor', 'firma_vendedor_en', None),
+)
+
+# Links de firma: (rol del firmante, campo de Tramite con su token, campo
+# que hace necesario el link o None si siempre se genera). El rol es el
+# tipo_firmante de las vistas de firma; cada token se copia a TokenFirma
+# para resolverlo con una sola consulta.
+LINKS_FIRMA = (
+    ('cliente', 'link_firma_cliente', None),
+    ('segundo_cliente', 'link_firma_cliente2', 'cliente_2'),
+    ('beneficiario', 'link_firma_beneficiario1', 'beneficiario_1'),
+    ('testigo1', 'link_firma_testigo1', 'testigo_1_nombre'),
+    ('testigo2', 'link_firma_testigo2', 'testigo_2_nombre'),
+    ('vendedor', 'link_firma_vendedor', None),
+)
+
+
+def _propiedad_firma(campo):
+    """
+    Acceso a la firma `campo` como si fuera un campo del trámite.
+
+    La lectura carga todas las firmas del trámite en una sola consulta; la
+    escritura queda pendiente hasta el siguiente save() del trámite.
+    """
+    def getter(self):
+        return self._firmas().get(campo, '')
+
+    def setter(self, valor):
+        valor = valor or ''
+        firmas = self._firmas()
+        if firmas.get(campo, '') == valor:
+            return
+        firmas[campo] = valor
+        self._firmas_pendientes.add(campo)
+        setattr(self, f'{campo}_en', timezone.now() if valor else None)
+
+    return property(getter, setter)
+
+
+class TramiteQuerySet(models.QuerySet):
+
+    def _requiere_firma(self, requisito):
+        """Q del trámite que requiere la firma: FK asignada o texto no vacío."""
+        requerido = models.Q(**{f'{requisito}__isnull': False})
+        if not self.model._meta.get_field(requisito).is_relation:
+            requerido &= ~models.Q(**{requisito: ''})
+        return requerido
+
+    def con_estado_firmas(self):
+        """
+        Anota firmas_requeridas, firmas_completadas y con_firmas_pendientes,
+        calculados en SQL con las reglas de FIRMANTES.
+        """
+        entero = models.IntegerField()
+        requeridas = []
+        completadas = []
+        for _, campo_en, requisito in FIRMANTES:
+            firmada = models.Q(**{f'{campo_en}__isnull': False})
+            if requisito is None:
+                requeridas.append(models.Value(1, output_field=entero))
+            else:
+                requerido = self._requiere_firma(requisito)
+                requeridas.append(models.Case(models.When(requerido, then=1), default=0, output_field=entero))
+                firmada &= requerido
+            completadas.append(models.Case(models.When(firmada, then=1), default=0, output_field=entero))
+        return self.annotate(
+            firmas_requeridas=reduce(operator.add, requeridas),
+            firmas_completadas=reduce(operator.add, completadas),
+        ).annotate(
+            con_firmas_pendientes=models.ExpressionWrapper(
+                models.Q(firmas_completadas__lt=models.F('firmas_requeridas')),
+                output_field=models.BooleanField(),
+            ),
+        )
+
+    def con_resumen_pagos(self, hoy=None):
+        """
+        Anota el estado de pagos de cada trámite, calculado en SQL:
+        total_cuotas, cuotas_pendientes, cuotas_atrasadas, cuotas_pagadas,
+        monto_cuotas, monto_abonado, saldo_cuotas, proximo_vencimiento,
+        estado_pagos y porcentaje_pagado. Es la fuente de
+        pagos.resumen.calcular_resumenes().
+        """
+        from pagos.resumen import expresiones_resumen
+
+        hoy = hoy or timezone.localdate()
+        return self.annotate(
+            **expresiones_resumen(hoy, prefijo='pagos__'),
+        ).annotate(
+            estado_pagos=models.Case(
+                models.When(cuotas_atrasadas__gt=0, then=models.Value('atrasado')),
+                models.When(cuotas_pendientes__gt=0, then=models.Value('pendiente')),
+                models.When(cuotas_pagadas__gt=0, then=models.Value('pagado')),
+                default=models.Value('sin_cuotas'),
+                output_field=models.CharField(),
+            ),
+            porcentaje_pagado=models.Case(
+                # En float: con decimales enteros, SQLite haría división entera
+                models.When(monto_cuotas__gt=0, then=Cast('monto_abonado', models.FloatField()) * 100 / Cast('monto_cuotas', models.FloatField())),
+                default=models.Value(0.0),
+                output_field=models.FloatField(),
+            ),
+        )
+
 
 class Tramite(models.Model):
     financiamiento = models.ForeignKey(Financiamiento, on_delete=models.PROTECT)
@@ -43,8 +176,8 @@ class Tramite(models.Model):
     )
 
     # Firma del vendedor (en aviso de privacidad)
-    firma_vendedor = models.TextField(
-        blank=True, help_text="Data‑URL base64 de la firma del vendedor"
+    firma_vendedor_en = models.DateTimeField(
+        null=True, blank=True, help_text="Fecha en que firmó el vendedor"
     )
     link_firma_vendedor = models.CharField(
         max_length=255, 
@@ -52,22 +185,22 @@ class Tramite(models.Model):
         help_text="Link único para firma del vendedor"
     )
     
-    firma_cliente = models.TextField(
-        blank=True, help_text="Data‑URL base64 de la firma del cliente"
+    firma_cliente_en = models.DateTimeField(
+        null=True, blank=True, help_text="Fecha en que firmó el cliente"
     )
     link_firma_cliente = models.CharField(max_length=255, blank=True, help_text="Link único para firma del cliente")
     cliente_2 = models.ForeignKey(Cliente, on_delete=models.PROTECT, null=True, blank=True, related_name='tramites_as_second')
-    firma_cliente2 = models.TextField(
-        blank=True, help_text="Data‑URL base64 de la firma del segundo cliente"
+    firma_cliente2_en = models.DateTimeField(
+        null=True, blank=True, help_text="Fecha en que firmó el segundo cliente"
     )
     link_firma_cliente2 = models.CharField(max_length=255, blank=True, help_text="Link único para firma del segundo cliente")
 
     # Testigos (máximo 2, uno de ellos es el vendedor)
     testigo_1_nombre = models.CharField(max_length=150, blank=True, help_text="Nombre del testigo 1")
-    testigo_1_firma = models.TextField(blank=True, help_text="Firma del testigo 1")
+    testigo_1_firma_en = models.DateTimeField(null=True, blank=True, help_text="Fecha en que firmó el testigo 1")
     
     testigo_2_nombre = models.CharField(max_length=150, blank=True, help_text="Nombre del testigo 2")
-    testigo_2_firma = models.TextField(blank=True, help_text="Firma del testigo 2")
+    testigo_2_firma_en = models.DateTimeField(null=True, blank=True, help_text="Fecha en que firmó el testigo 2")
     link_firma_testigo1 = models.CharField(max_length=255, blank=True, help_text="Link único para firma de testigo")
     link_firma_testigo2 = models.CharField(max_length=255, blank=True, help_text="Link único para firma del segundo testigo")
 
@@ -109,9 +242,8 @@ class Tramite(models.Model):
         related_name='tramites_beneficiario2',
         verbose_name="Beneficiario 2"
     )
-    # MANTENEMOS estos campos para las firmas (no cambian)
-    beneficiario_1_firma = models.TextField(blank=True, help_text="Firma del beneficiario 1")
-    beneficiario_2_firma = models.TextField(blank=True, help_text="Firma del beneficiario 2")
+    beneficiario_1_firma_en = models.DateTimeField(null=True, blank=True, help_text="Fecha en que firmó el beneficiario 1")
+    beneficiario_2_firma_en = models.DateTimeField(null=True, blank=True, help_text="Fecha en que firmó el beneficiario 2")
     link_firma_beneficiario1 = models.CharField(max_length=255, blank=True)
     link_firma_beneficiario2 = models.CharField(max_length=255, blank=True)
 
@@ -144,9 +276,47 @@ class Tramite(models.Model):
     creado_en = models.DateTimeField(auto_now_add=True)
     actualizado_en = models.DateTimeField(auto_now=True)
 
+    objects = TramiteQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Orden del listado y de la paginación por cursor
+            models.Index(fields=['-creado_en', '-id'], name='tramite_creado_id_idx'),
+        ]
+
     def __str__(self):
         return f"Trámite #{self.pk} – {self.cliente.nombre_completo}"
 
+    # Firmas (data-URL), guardadas en FirmaTramite
+    firma_cliente = _propiedad_firma('firma_cliente')
+    firma_cliente2 = _propiedad_firma('firma_cliente2')
+    firma_vendedor = _propiedad_firma('firma_vendedor')
+    testigo_1_firma = _propiedad_firma('testigo_1_firma')
+    testigo_2_firma = _propiedad_firma('testigo_2_firma')
+    beneficiario_1_firma = _propiedad_firma('beneficiario_1_firma')
+    beneficiario_2_firma = _propiedad_firma('beneficiario_2_firma')
+
+    def _firmas(self):
+        """{campo: data_url} de las firmas del trámite (una consulta, o el prefetch)."""
+        if '_firmas_cache' not in self.__dict__:
+            self._firmas_pendientes = set()
+            self._firmas_cache = {}
+            if self.pk:
+                self._firmas_cache = {f.campo: f.data_url for f in self.firmas.all()}
+        return self._firmas_cache
+
+    def _guardar_firmas(self):
+        """Persiste las firmas asignadas desde el último save()."""
+        for campo in self._firmas_pendientes:
+            valor = self._firmas_cache.get(campo, '')
+            if valor:
+                FirmaTramite.objects.update_or_create(
+                    tramite=self, campo=campo, defaults={'data_url': valor}
+                )
+            else:
+                FirmaTramite.objects.filter(tramite=self, campo=campo).delete()
+        self._firmas_pendientes.clear()
+
     # En la misma clase Tramite, agregar estas propiedades:
 
     @property
@@ -201,11 +371,21 @@ class Tramite(models.Model):
         elif self.propietario:
             self.persona_tipo = 'propietario'
             self.persona_id = self.propietario.id
+
+        pendientes = self.__dict__.get('_firmas_pendientes')
+        if pendientes and kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {f'{c}_en' for c in pendientes}
         
         super().save(*args, **kwargs)
 
-    def generar_links_firma(self):
-        """Genera links únicos SOLO para las firmas de involucrados existentes"""
+        if pendientes:
+            self._guardar_firmas()
+
+    def generar_links_firma(self, vigencia=None, un_solo_uso=False):
+        """
+        Genera links únicos SOLO para las firmas de involucrados existentes.
+        `vigencia` (timedelta) y `un_solo_uso` aplican a los tokens nuevos.
+        """
         import secrets
         
         # Helper function para generar tokens
@@ -256,9 +436,15 @@ class Tramite(models.Model):
             print(f"🎯 Links generados para: {', '.join(links_generados)}")
         else:
             print("ℹ️  No se generaron nuevos links - todos los necesarios ya existían")
+
+        self.sincronizar_tokens_firma(vigencia=vigencia, un_solo_uso=un_solo_uso)
         
         return links_generados
 
+    def sincronizar_tokens_firma(self, vigencia=None, un_solo_uso=False):
+        """Copia los link_firma_* a TokenFirma (ver TokenFirmaQuerySet.sincronizar)."""
+        TokenFirma.objects.sincronizar([self], vigencia=vigencia, un_solo_uso=un_solo_uso)
+
     # También agregamos un método para obtener los links activos
     @property
     def links_activos(self):
@@ -319,53 +505,29 @@ class Tramite(models.Model):
         
         return urls
 
+    def _firmantes(self):
+        """(etiqueta, firmó) de cada firma que requiere este trámite."""
+        for etiqueta, campo_en, requisito in FIRMANTES:
+            if requisito is None or getattr(self, self._meta.get_field(requisito).attname):
+                yield etiqueta, getattr(self, campo_en) is not None
+
+    def _conteo_firmas(self):
+        """(completadas, requeridas); usa las anotaciones de con_estado_firmas() si están."""
+        if 'firmas_requeridas' in self.__dict__:
+            return self.firmas_completadas, self.firmas_requeridas
+        firmantes = list(self._firmantes())
+        return sum(firmo for _, firmo in firmantes), len(firmantes)
+
     @property
     def estado_firmas(self):
         """Retorna el estado general de las firmas"""
-        firmas_completadas = 0
-        firmas_totales = 0
-        
-        # Cliente principal siempre cuenta
-        firmas_totales += 1
-        if self.firma_cliente:
-            firmas_completadas += 1
-        
-        # Segundo cliente si existe
-        if self.cliente_2:
-            firmas_totales += 1
-            if self.firma_cliente2:
-                firmas_completadas += 1
-        
-        # Beneficiario si existe
-        if self.beneficiario_1:
-            firmas_totales += 1
-            if self.beneficiario_1_firma:
-                firmas_completadas += 1
-        
-        # Testigos si existen
-        if self.testigo_1_nombre:
-            firmas_totales += 1
-            if self.testigo_1_firma:
-                firmas_completadas += 1
-        
-        if self.testigo_2_nombre:
-            firmas_totales += 1
-            if self.testigo_2_firma:
-                firmas_completadas += 1
-
-        # Vendedor - siempre cuenta               # ← NUEVO
-        firmas_totales += 1
-        if self.firma_vendedor:
-            firmas_completadas += 1
+        firmas_completadas, firmas_totales = self._conteo_firmas()
         
         if firmas_totales == 0:
             return "sin_firmas"
-        
-        porcentaje = (firmas_completadas / firmas_totales) * 100
-        
-        if porcentaje == 100:
+        if firmas_completadas == firmas_totales:
             return "completado"
-        elif porcentaje > 0:
+        elif firmas_completadas > 0:
             return "en_proceso"
         else:
             return "pendiente"
@@ -373,57 +535,21 @@ class Tramite(models.Model):
     @property
     def porcentaje_firmas(self):
         """Calcula el porcentaje de firmas completadas"""
-        firmas_completadas = 0
-        firmas_totales = 0
-        
-        # Misma lógica que arriba
-        if self.firma_cliente: firmas_completadas += 1
-        firmas_totales += 1
-        
-        if self.cliente_2:
-            firmas_totales += 1
-            if self.firma_cliente2: firmas_completadas += 1
-        
-        if self.beneficiario_1:
-            firmas_totales += 1
-            if self.beneficiario_1_firma: firmas_completadas += 1
-        
-        if self.testigo_1_nombre:
-            firmas_totales += 1
-            if self.testigo_1_firma: firmas_completadas += 1
-        
-        if self.testigo_2_nombre:
-            firmas_totales += 1
-            if self.testigo_2_firma: firmas_completadas += 1
-
-        # Vendedor - siempre cuenta               # ← NUEVO
-        firmas_totales += 1
-        if self.firma_vendedor: firmas_completadas += 1
-        
+        firmas_completadas, firmas_totales = self._conteo_firmas()
         return int((firmas_completadas / firmas_totales) * 100) if firmas_totales > 0 else 0
 
     @property
     def firmas_pendientes(self):
         """Lista de firmas pendientes"""
-        pendientes = []
-        if not self.firma_cliente:
-            pendientes.append("Cliente Principal")
-        if self.cliente_2 and not self.firma_cliente2:
-            pendientes.append("Segundo Cliente")
-        if self.beneficiario_1 and not self.beneficiario_1_firma:
-            pendientes.append("Beneficiario")
-        if self.testigo_1_nombre and not self.testigo_1_firma:
-            pendientes.append("Testigo 1")
-        if self.testigo_2_nombre and not self.testigo_2_firma:
-            pendientes.append("Testigo 2")
-        if not self.firma_vendedor:                           # ← NUEVO
-            pendientes.append("Vendedor")
-        return pendientes
+        return [etiqueta for etiqueta, firmo in self._firmantes() if not firmo]
 
     @property
     def tiene_firmas_pendientes(self):
         """Verifica si hay firmas pendientes"""
-        return len(self.firmas_pendientes) > 0
+        if 'con_firmas_pendientes' in self.__dict__:
+            return self.con_firmas_pendientes
+        firmas_completadas, firmas_totales = self._conteo_firmas()
+        return firmas_completadas < firmas_totales
 
     @property
     def saldo_a_favor_disponible(self):
@@ -464,7 +590,164 @@ class Tramite(models.Model):
         
         return urls
 
+class FirmaTramite(models.Model):
+    """Imagen de una firma del trámite, fuera de la fila principal de Tramite."""
+    tramite = models.ForeignKey(
+        Tramite,
+        on_delete=models.CASCADE,
+        related_name='firmas'
+    )
+    campo = models.CharField(
+        max_length=30,
+        choices=[(c, c) for c in CAMPOS_FIRMA],
+        help_text="Firmante (nombre del antiguo campo en Tramite)"
+    )
+    data_url = models.TextField(help_text="Data‑URL base64 de la firma")
+    creado_en = models.DateTimeField(auto_now_add=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Firma del Trámite"
+        verbose_name_plural = "Firmas de los Trámites"
+        constraints = [
+            models.UniqueConstraint(fields=['tramite', 'campo'], name='firma_unica_por_firmante'),
+        ]
+
+    def __str__(self):
+        return f"{self.campo} - Trámite #{self.tramite_id}"
+
+
+class FirmaAlmacenada(models.Model):
+    """
+    Copia en la base de datos de cada firma del almacén de workflow.firmas.
+    El archivo en MEDIA_ROOT/firmas es sólo una caché que se vuelve a escribir
+    desde aquí si falta (p. ej. si el contenedor perdió el disco).
+    """
+    clave = models.CharField(max_length=64, primary_key=True, help_text="SHA-256 del data-URL")
+    data_url = models.TextField(help_text="Data‑URL base64 de la firma")
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Firma Almacenada"
+        verbose_name_plural = "Firmas Almacenadas"
+
+    def __str__(self):
+        return self.clave
+
 # workflow/models.py
+class TokenFirmaQuerySet(models.QuerySet):
+
+    def vigentes(self, ahora=None):
+        """Tokens sin expirar y, si son de un solo uso, todavía sin usar."""
+        ahora = ahora or timezone.now()
+        return self.filter(
+            models.Q(expira_en__isnull=True) | models.Q(expira_en__gt=ahora),
+            models.Q(un_solo_uso=False) | models.Q(usado_en__isnull=True),
+        )
+
+    def sincronizar(self, tramites, vigencia=None, un_solo_uso=False):
+        """
+        Copia los link_firma_* de `tramites` a TokenFirma. Sólo escribe los
+        tokens nuevos o cambiados (un token regenerado vuelve a estar sin
+        usar) y borra los de links vacíos. `vigencia` (timedelta) y
+        `un_solo_uso` aplican a los tokens que se escriben.
+        """
+        existentes = {
+            (tramite_id, rol): (pk, token)
+            for pk, tramite_id, rol, token in self.filter(tramite__in=tramites)
+            .values_list('pk', 'tramite_id', 'rol', 'token')
+        }
+        expira_en = timezone.now() + vigencia if vigencia else None
+
+        nuevos, actuales = [], set()
+        for tramite in tramites:
+            for rol, campo, _ in LINKS_FIRMA:
+                token = getattr(tramite, campo)
+                if not token:
+                    continue
+                actuales.add((tramite.pk, rol))
+                if existentes.get((tramite.pk, rol), (None, None))[1] != token:
+                    nuevos.append(self.model(
+                        tramite=tramite, rol=rol, token=token,
+                        expira_en=expira_en, un_solo_uso=un_solo_uso,
+                    ))
+        if nuevos:
+            self.bulk_create(
+                nuevos,
+                batch_size=500,
+                update_conflicts=True,
+                unique_fields=['tramite', 'rol'],
+                update_fields=['token', 'expira_en', 'un_solo_uso', 'usado_en', 'creado_en'],
+            )
+        sobrantes = [pk for clave, (pk, _) in existentes.items() if clave not in actuales]
+        if sobrantes:
+            self.filter(pk__in=sobrantes).delete()
+        return len(nuevos)
+
+    def resolver(self, token):
+        """
+        TokenFirma vigente de `token` con el trámite y lo que muestran las
+        páginas de firma, en una sola consulta; None si no existe o ya no vale.
+        """
+        return (
+            self.vigentes()
+            .select_related(
+                'tramite__cliente',
+                'tramite__cliente_2',
+                'tramite__beneficiario_1',
+                'tramite__financiamiento__lote__proyecto',
+            )
+            .filter(token=token)
+            .first()
+        )
+
+
+class TokenFirma(models.Model):
+    """Token de un link de firma, indexado para resolverlo de una vez."""
+    tramite = models.ForeignKey(
+        Tramite,
+        on_delete=models.CASCADE,
+        related_name='tokens_firma'
+    )
+    rol = models.CharField(
+        max_length=20,
+        choices=[(rol, rol) for rol, _, _ in LINKS_FIRMA],
+        help_text="Tipo de firmante del link"
+    )
+    token = models.CharField(max_length=255, unique=True)
+    expira_en = models.DateTimeField(null=True, blank=True, help_text="Vacío: no expira")
+    un_solo_uso = models.BooleanField(default=False)
+    usado_en = models.DateTimeField(null=True, blank=True)
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    objects = TokenFirmaQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Token de Firma"
+        verbose_name_plural = "Tokens de Firma"
+        constraints = [
+            models.UniqueConstraint(fields=['tramite', 'rol'], name='token_firma_unico_por_rol'),
+        ]
+
+    def __str__(self):
+        return f"{self.rol} - Trámite #{self.tramite_id}"
+
+    def reclamar(self):
+        """
+        Marca como usado un token de un solo uso. Devuelve False si ya no está
+        vigente (otra petición lo usó primero o expiró). El UPDATE condicional
+        hace que, entre peticiones simultáneas, sólo una lo consiga.
+        """
+        ahora = timezone.now()
+        vigente = TokenFirma.objects.vigentes(ahora).filter(pk=self.pk)
+        if not self.un_solo_uso:
+            return vigente.exists()
+        if not vigente.update(usado_en=ahora):
+            return False
+        self.usado_en = ahora
+        return True
+
+
 class ClausulasEspeciales(models.Model):
     tramite = models.OneToOneField(
         'Tramite', 
@@ -494,4 +777,161 @@ class ClausulasEspeciales(models.Model):
         return f"Cláusulas especiales - Trámite #{self.tramite.id}"
 
 
+class BorradorTramite(models.Model):
+    """
+    Estado del asistente de captura (paso 1 al paso 3) de un trámite.
+
+    La sesión sólo guarda el id de la fila (workflow.borradores); cada paso
+    guarda con actualizar() únicamente los campos que cambió. La firma del
+    aviso se guarda por referencia: la clave del almacén de workflow.firmas,
+    no el data-URL.
+    """
+    TIPOS_FINANCIAMIENTO = [('normal', 'Normal'), ('commeta', 'Commeta')]
+    TIPOS_FIRMA = [('digital', 'Digital'), ('fisica', 'Física')]
+
+    usuario = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='borradores_tramite'
+    )
+    tramite = models.OneToOneField(
+        Tramite, on_delete=models.CASCADE, null=True, blank=True, related_name='borrador',
+        help_text="Se asigna al aceptar el aviso de privacidad"
+    )
+
+    # Paso 1: plan elegido
+    financiamiento = models.ForeignKey(Financiamiento, on_delete=models.CASCADE, related_name='+')
+    financiamiento_commeta = models.ForeignKey(
+        'financiamiento.FinanciamientoCommeta', on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    tipo_financiamiento = models.CharField(max_length=10, choices=TIPOS_FINANCIAMIENTO, default='normal')
+
+    # Paso 2: clientes, testigos y beneficiario. El segundo cliente y el
+    # beneficiario se crean al aceptar el aviso; hasta entonces sólo son
+    # los datos del formulario.
+    cliente = models.ForeignKey(Cliente, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    cliente_2_datos = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    beneficiario_datos = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    testigo_1_nombre = models.CharField(max_length=150, blank=True)
+    testigo_2_nombre = models.CharField(max_length=150, blank=True)
+    testigo_1_idmex = models.CharField(max_length=50, blank=True)
+    testigo_2_idmex = models.CharField(max_length=50, blank=True)
+    edad_cliente_1 = models.PositiveSmallIntegerField(null=True, blank=True)
+    edad_cliente_2 = models.PositiveSmallIntegerField(null=True, blank=True)
+    vecino = models.CharField(max_length=255, blank=True)
+    vecino_2 = models.CharField(max_length=255, blank=True)
+
+    # Paso vendedor: persona que atendió
+    persona_tipo = models.CharField(
+        max_length=20, choices=[('vendedor', 'Vendedor'), ('propietario', 'Propietario')], blank=True
+    )
+    persona_id = models.PositiveIntegerField(null=True, blank=True)
+
+    # Aviso de privacidad
+    aviso_aceptado = models.BooleanField(default=False)
+    tipo_firma = models.CharField(max_length=10, choices=TIPOS_FIRMA, blank=True)
+    firma_cliente = models.CharField(
+        max_length=64, blank=True, help_text="Clave de la firma en el almacén de firmas (SHA-256 del data-URL)"
+    )
+
+    creado_en = models.DateTimeField(auto_now_add=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    # Lo capturado en el paso 2 que pasa al trámite al aceptar el aviso
+    CAPTURA_CLIENTES = {
+        'cliente_2_datos': None,
+        'beneficiario_datos': None,
+        'testigo_1_nombre': '',
+        'testigo_2_nombre': '',
+        'testigo_1_idmex': '',
+        'testigo_2_idmex': '',
+        'edad_cliente_1': None,
+        'edad_cliente_2': None,
+        'vecino': '',
+        'vecino_2': '',
+    }
+
+    class Meta:
+        verbose_name = "Borrador de Trámite"
+        verbose_name_plural = "Borradores de Trámites"
+
+    def __str__(self):
+        if self.tramite_id:
+            return f"Borrador del trámite #{self.tramite_id}"
+        return f"Borrador #{self.pk} (sin trámite)"
+
+    @property
+    def tiene_testigos(self):
+        return any((self.testigo_1_nombre, self.testigo_2_nombre, self.testigo_1_idmex, self.testigo_2_idmex))
+
+    def actualizar(self, **campos):
+        """
+        Asigna `campos` y guarda sólo los que cambiaron. Las relaciones se
+        pasan por su id (cliente_id=...). Devuelve los campos guardados.
+        """
+        cambiados = [campo for campo, valor in campos.items() if getattr(self, campo) != valor]
+        for campo in cambiados:
+            setattr(self, campo, campos[campo])
+        if self.pk is None:
+            self.save()
+        elif cambiados:
+            self.save(update_fields=cambiados + ['actualizado_en'])
+        return cambiados
+
+
+class TrabajoDocumentos(models.Model):
+    """
+    Generación en segundo plano de un paquete de documentos.
+
+    La tabla funciona como cola: la vista encola el trabajo y el comando
+    `procesar_documentos` lo toma, genera los PDF y deja el ZIP en el storage.
+    """
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('procesando', 'Procesando'),
+        ('terminado', 'Terminado'),
+        ('error', 'Error'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    tramite = models.ForeignKey(
+        Tramite,
+        on_delete=models.CASCADE,
+        related_name='trabajos_documentos'
+    )
+    usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    documentos = models.JSONField(default=list, help_text="Slugs de DOCUMENTOS en el orden seleccionado")
+    progreso = models.JSONField(default=dict, blank=True, help_text="Estado de cada documento: {slug: estado}")
+    datos_sesion = models.JSONField(default=dict, blank=True, help_text="Datos de la sesión que leen los builders")
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
+    archivo = models.FileField(upload_to='trabajos_documentos/', blank=True)
+    error = models.TextField(blank=True)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    iniciado_en = models.DateTimeField(null=True, blank=True)
+    latido_en = models.DateTimeField(
+        null=True, blank=True, help_text="Último aviso de vida del worker que lo procesa"
+    )
+    terminado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['creado_en']
+        indexes = [
+            models.Index(fields=['estado', 'creado_en'], name='trabajo_doc_estado_idx'),
+        ]
+        verbose_name = "Trabajo de Documentos"
+        verbose_name_plural = "Trabajos de Documentos"
+
+    def __str__(self):
+        return f"Trabajo {self.pk} - Trámite #{self.tramite_id} ({self.estado})"
+
+    @property
+    def finalizado(self):
+        return self.estado in ('terminado', 'error')
+
+    @property
+    def porcentaje(self):
+        """Porcentaje de documentos ya convertidos."""
+        if not self.documentos:
+            return 0
+        listos = sum(1 for estado in self.progreso.values() if estado == 'listo')
+        return int(listos * 100 / len(self.documentos))
 
@@ -0,0 +1,186 @@
+# workflow/paquetes.py
+"""
+Generación del paquete de documentos de un trámite (paso 3 del workflow).
+
+La usan SeleccionDocumentosView, dentro de la petición, y el worker de
+trabajos en segundo plano (workflow.trabajos), fuera de ella.
+"""
+import io
+import os
+import zipfile
+
+from django.conf import settings
+
+from pdfs.utils import convert_docx_batch_to_pdf, convert_docx_to_pdf, espacio_temporal
+from workflow.docs import construir_contexto, plantilla_documento
+from workflow.snapshot import TramiteSnapshot
+
+
+class PeticionDiferida:
+    """
+    Sustituto mínimo de HttpRequest para generar documentos. Los builders
+    sólo consultan request.session (la firma capturada en el aviso y las
+    cláusulas especiales). Las vistas la arman desde el borrador del trámite
+    (workflow.borradores.peticion_documentos) y el worker desde el trabajo.
+    """
+
+    def __init__(self, session=None, user=None):
+        self.session = dict(session or {})
+        self.user = user
+
+
+# Claves de sesión que leen los builders
+CLAVES_SESION = ('firma_cliente_data', 'clausulas_especiales')
+
+
+def _avisador(progreso):
+    def avisar(slug, estado):
+        if progreso:
+            progreso(slug, estado)
+    return avisar
+
+
+def _renderizar(tramite, slugs, request, directorio, avisar):
+    """
+    Renderiza en `directorio` los DOCX de `slugs`, uno por uno.
+
+    Va produciendo (slug, arcname, ruta_pdf, ruta_docx) en el orden
+    seleccionado; ruta_docx es None para los PDF estáticos que no necesitan
+    conversión.
+    """
+    # Todo lo que leen los builders, cargado una vez para el paquete
+    snapshot = TramiteSnapshot.de(tramite)
+
+    # Cláusulas especiales de la base de datos o, si no hay, las de la sesión
+    clausulas_adicionales = snapshot.clausulas_adicionales
+    if clausulas_adicionales is None:
+        clausulas_adicionales = request.session.get('clausulas_especiales', {})
+
+    for slug in slugs:
+
+        if slug == 'reglamento_commeta':
+            # Ruta al archivo PDF estático
+            static_pdf_path = os.path.join(settings.BASE_DIR, 'static', 'docs', 'Reglamento_Commeta.pdf')
+            # Fallback usando staticfiles finder (útil en desarrollo)
+            if not os.path.exists(static_pdf_path):
+                from django.contrib.staticfiles.finders import find
+                found = find('docs/Reglamento_Commeta.pdf')
+                if found:
+                    static_pdf_path = found
+                else:
+                    print(f"❌ No se encontró el archivo estático: Reglamento_Commeta.pdf")
+                    avisar(slug, 'error')
+                    continue  # Saltar este documento si no existe
+
+            # Se añadirá al ZIP con nombre "reglamento_commeta.pdf"
+            yield slug, 'reglamento_commeta.pdf', static_pdf_path, None
+            continue  # Saltar el resto de la lógica (builder, conversión)
+
+        # 1) generar contexto
+        tpl = plantilla_documento(slug)
+        context = construir_contexto(slug, snapshot, request, tpl, clausulas_adicionales=clausulas_adicionales)
+
+        # 2) rellenar plantilla Word
+        tmp_docx = os.path.join(directorio, f"{slug}.docx")
+        tpl.render(context)
+        tpl.save(tmp_docx)
+        avisar(slug, 'renderizado')
+
+        out_pdf = os.path.join(directorio, f"{slug}.pdf")
+        yield slug, os.path.basename(out_pdf), out_pdf, tmp_docx
+
+
+def generar_paquete(tramite, slugs, request, directorio, progreso=None):
+    """
+    Renderiza en `directorio` los documentos `slugs` del trámite y los
+    convierte a PDF.
+
+    Devuelve [(arcname, ruta)] en el orden seleccionado. Si se indica
+    `progreso`, se llama progreso(slug, estado) con 'renderizado' al llenar
+    cada plantilla y 'listo' cuando su PDF está disponible.
+    """
+    avisar = _avisador(progreso)
+
+    # Primero se renderizan todos los DOCX y después se convierten a PDF
+    # en una sola tanda (convert_docx_batch_to_pdf).
+    archivos = []       # (arcname, ruta) en el orden seleccionado
+    conversiones = []   # (slug, docx, pdf) pendientes de convertir
+    for slug, arcname, ruta, docx in _renderizar(tramite, slugs, request, directorio, avisar):
+        archivos.append((arcname, ruta))
+        if docx is None:
+            avisar(slug, 'listo')
+        else:
+            conversiones.append((slug, docx, ruta))
+
+    convert_docx_batch_to_pdf([(docx, pdf) for _, docx, pdf in conversiones])
+    for slug, _, _ in conversiones:
+        avisar(slug, 'listo')
+
+    return archivos
+
+
+def iterar_paquete(tramite, slugs, request, directorio, progreso=None):
+    """
+    Igual que generar_paquete, pero produce cada (arcname, ruta) en cuanto
+    su PDF está listo en lugar de esperar a que termine todo el paquete.
+    """
+    avisar = _avisador(progreso)
+    for slug, arcname, ruta, docx in _renderizar(tramite, slugs, request, directorio, avisar):
+        if docx is not None:
+            convert_docx_to_pdf(docx, ruta)
+        avisar(slug, 'listo')
+        yield arcname, ruta
+
+
+class _SalidaZip(io.RawIOBase):
+    """
+    Destino de zipfile que sólo acumula lo escrito hasta que se vacía.
+
+    No implementa tell()/seek(), así que zipfile escribe en modo flujo
+    (descriptores de datos tras cada archivo) y nunca vuelve atrás.
+    """
+
+    def __init__(self):
+        self._partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def vaciar(self):
+        datos = b''.join(self._partes)
+        self._partes = []
+        return datos
+
+
+def zip_en_flujo(archivos, tam_bloque=64 * 1024):
+    """
+    Escribe un ZIP con los (arcname, ruta) de `archivos` y lo va produciendo
+    en bloques de bytes, sin armar el ZIP completo en memoria.
+    """
+    salida = _SalidaZip()
+    with zipfile.ZipFile(salida, 'w') as zf:
+        for arcname, ruta in archivos:
+            info = zipfile.ZipInfo.from_file(ruta, arcname)
+            with open(ruta, 'rb') as origen, zf.open(info, 'w') as destino:
+                for bloque in iter(lambda: origen.read(tam_bloque), b''):
+                    destino.write(bloque)
+                    datos = salida.vaciar()
+                    if datos:
+                        yield datos
+            yield salida.vaciar()
+    # Directorio central del ZIP
+    yield salida.vaciar()
+
+
+def flujo_paquete(tramite, slugs, request):
+    """
+    Genera el paquete en un espacio temporal propio y lo devuelve como flujo
+    de bytes del ZIP, para StreamingHttpResponse. El espacio temporal se
+    borra cuando termina (o se corta) la descarga.
+    """
+    with espacio_temporal() as directorio:
+        yield from zip_en_flujo(iterar_paquete(tramite, slugs, request, directorio))
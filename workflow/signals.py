@@ -0,0 +1,39 @@
+# workflow/signals.py
+from django.db.models import Q
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from core.models import Proyecto, Lote, Propietario, Vendedor, Cliente, Beneficiario
+from financiamiento.models import Financiamiento, FinanciamientoCommeta
+from .models import Tramite, ClausulasEspeciales, FirmaTramite
+from . import doc_cache
+
+
+# Filtro de trámites afectados por el cambio de cada modelo
+FILTROS_TRAMITE = {
+    Tramite: lambda obj: Q(pk=obj.pk),
+    ClausulasEspeciales: lambda obj: Q(pk=obj.tramite_id),
+    FirmaTramite: lambda obj: Q(pk=obj.tramite_id),
+    Financiamiento: lambda obj: Q(financiamiento=obj),
+    FinanciamientoCommeta: lambda obj: Q(financiamiento_id=obj.financiamiento_id),
+    Cliente: lambda obj: Q(cliente=obj) | Q(cliente_2=obj),
+    Beneficiario: lambda obj: Q(beneficiario_1=obj) | Q(beneficiario_2=obj),
+    Vendedor: lambda obj: Q(vendedor=obj),
+    Propietario: lambda obj: Q(propietario=obj) | Q(financiamiento__lote__proyecto_id=obj.proyecto_id),
+    Lote: lambda obj: Q(financiamiento__lote__proyecto_id=obj.proyecto_id),
+    Proyecto: lambda obj: Q(financiamiento__lote__proyecto=obj),
+}
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidar_documentos_en_cache(sender, instance, **kwargs):
+    """Borra los documentos en caché de los trámites que dependen de ``instance``."""
+    filtro = FILTROS_TRAMITE.get(sender)
+    if filtro is None:
+        return
+    if sender is Tramite:
+        ids = [instance.pk]
+    else:
+        ids = list(Tramite.objects.filter(filtro(instance)).values_list('pk', flat=True).distinct())
+    doc_cache.invalidar_tramites(ids)
@@ -0,0 +1,93 @@
+# workflow/snapshot.py
+"""
+Datos de entrada de los builders de documentos.
+
+Un contrato recorre fin.lote.proyecto, el segundo cliente, el beneficiario,
+las cláusulas especiales, el detalle Commeta, las firmas y el propietario
+del proyecto. Cargados de forma perezosa son una docena de consultas en
+serie por documento; TramiteSnapshot los trae todos en una sola carga
+(select_related + prefetch_related) que se reutiliza para todo el paquete.
+"""
+from django.db.models import Count, IntegerField, OuterRef, Prefetch, Subquery
+from django.shortcuts import get_object_or_404
+
+from core.models import Lote, Propietario
+from .models import Tramite
+
+
+def queryset_snapshot(queryset=None):
+    """Trámites con todo lo que leen los builders ya cargado."""
+    if queryset is None:
+        queryset = Tramite.objects.all()
+    lotes_en_proyecto = (
+        Lote.objects.filter(proyecto_id=OuterRef('financiamiento__lote__proyecto_id'))
+        .order_by()
+        .values('proyecto_id')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return queryset.select_related(
+        'financiamiento__lote__proyecto',
+        'financiamiento__detalle_commeta',
+        'financiamiento_commeta__configuracion_original',
+        'cliente',
+        'cliente_2',
+        'vendedor',
+        'propietario',
+        'beneficiario_1',
+        'beneficiario_2',
+        'clausulas_especiales',
+    ).prefetch_related(
+        # Ordenado para que propietario.first() salga del prefetch
+        Prefetch('financiamiento__lote__proyecto__propietario', queryset=Propietario.objects.order_by('pk')),
+        'firmas',
+    ).annotate(
+        lotes_en_proyecto=Subquery(lotes_en_proyecto, output_field=IntegerField()),
+    )
+
+
+class TramiteSnapshot:
+    """
+    Trámite con sus relaciones precargadas y los argumentos que esperan los
+    builders (fin, cli, cli2, ven, clausulas_adicionales, fecha).
+    """
+
+    def __init__(self, tramite):
+        self.tramite = tramite
+        self.fin = tramite.financiamiento
+        self.cli = tramite.cliente
+        self.cli2 = tramite.cliente_2
+        # La persona que atendió: vendedor o propietario
+        if tramite.persona_tipo == 'vendedor':
+            self.ven = tramite.vendedor
+        else:
+            self.ven = tramite.propietario
+        self.fin_commeta = tramite.obtener_detalle_commeta
+        self.fecha = tramite.creado_en
+
+        self.clausulas_adicionales = None
+        if hasattr(tramite, 'clausulas_especiales'):
+            clausulas_db = tramite.clausulas_especiales
+            self.clausulas_adicionales = {
+                'pago': clausulas_db.clausula_pago,
+                'deslinde': clausulas_db.clausula_deslinde,
+                'promesa': clausulas_db.clausula_promesa,
+            }
+
+        # obtener_letra_identificador() lo usa en lugar de contar los lotes
+        if 'lotes_en_proyecto' in tramite.__dict__:
+            self.fin.lote.lotes_en_proyecto = tramite.lotes_en_proyecto
+
+    @classmethod
+    def cargar(cls, pk):
+        """Snapshot del trámite `pk`; Http404 si no existe."""
+        return cls(get_object_or_404(queryset_snapshot(), pk=pk))
+
+    @classmethod
+    def de(cls, tramite):
+        """Snapshot de un trámite ya cargado (o el mismo snapshot)."""
+        if isinstance(tramite, cls):
+            return tramite
+        if 'lotes_en_proyecto' in tramite.__dict__:
+            return cls(tramite)
+        return cls(queryset_snapshot().get(pk=tramite.pk))
@@ -1,3 +1,101 @@
+from datetime import date
+from decimal import Decimal
+
 from django.test import TestCase
 
-# Create your tests here.
+from core.models import Beneficiario, Cliente, ConfiguracionCommeta, Lote, Propietario, Proyecto, Vendedor
+from financiamiento.models import Financiamiento, FinanciamientoCommeta
+from workflow.docs import construir_contexto, plantilla_documento, slug_contrato
+from workflow.models import Tramite
+from workflow.paquetes import PeticionDiferida
+from workflow.snapshot import TramiteSnapshot
+
+
+class ConsultasPorDocumentoTests(TestCase):
+    """
+    Cargar el TramiteSnapshot cuesta tres consultas (el trámite y los dos
+    prefetch) y, con él, construir el contexto de cualquier documento no debe
+    volver a la base de datos. Si un builder empieza a leer una relación que
+    el snapshot no precarga, estas pruebas lo detectan.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tramite_normal = cls._crear_tramite('normal', 'Pequeña propiedad')
+        cls.tramite_commeta = cls._crear_tramite('commeta', 'Commeta Community')
+
+    @staticmethod
+    def _crear_tramite(tipo_proyecto, tipo_contrato):
+        proyecto = Proyecto.objects.create(
+            nombre=f'Proyecto {tipo_proyecto}',
+            tipo_contrato=tipo_contrato,
+            ubicacion='Mérida, Yucatán',
+            tipo_proyecto=tipo_proyecto,
+        )
+        Propietario.objects.create(
+            proyecto=proyecto, nombre_completo='Rosa Pech', nacionalidad='Mexicana',
+            domicilio='Calle 60', ine='INE123', telefono='9990000000',
+            email='rosa@ejemplo.com', tipo='propietario',
+        )
+        lote = Lote.objects.create(
+            proyecto=proyecto, identificador='12',
+            norte='10 m', sur='10 m', este='20 m', oeste='20 m',
+        )
+        vendedor = Vendedor.objects.create(
+            nombre_completo='Luis Canul', nacionalidad='Mexicana', domicilio='Calle 50',
+            ine='INE456', telefono='9991111111', email='luis@ejemplo.com', tipo='vendedor',
+        )
+        vendedor.proyectos.add(proyecto)
+        cliente = Cliente.objects.create(
+            nombre_completo='Ana Chan', domicilio='Calle 40', telefono='9992222222',
+            email='ana@ejemplo.com', tipo_id='INE', numero_id='INE789',
+        )
+        beneficiario = Beneficiario.objects.create(nombre_completo='Jorge Chan', parentesco='Hijo')
+        financiamiento = Financiamiento.objects.create(
+            nombre_cliente='Ana Chan', lote=lote, tipo_pago='financiado',
+            precio_lote=Decimal('300000'), apartado=Decimal('5000'),
+            enganche=Decimal('25000'), fecha_enganche=date(2025, 1, 15),
+            num_mensualidades=24, monto_mensualidad=Decimal('11250'),
+            fecha_primer_pago=date(2025, 2, 15), fecha_ultimo_pago=date(2027, 1, 15),
+        )
+        detalle_commeta = None
+        if tipo_proyecto == 'commeta':
+            configuracion = ConfiguracionCommeta.objects.create(
+                lote=lote, zona='aqua', precio_base=Decimal('300000'),
+                enganche_sugerido=Decimal('25000'), total_meses=24,
+            )
+            detalle_commeta = FinanciamientoCommeta.objects.create(
+                financiamiento=financiamiento, configuracion_original=configuracion,
+            )
+        return Tramite.objects.create(
+            financiamiento=financiamiento, financiamiento_commeta=detalle_commeta,
+            cliente=cliente, beneficiario_1=beneficiario, vendedor=vendedor,
+            persona_tipo='vendedor', persona_id=vendedor.pk,
+        )
+
+    def _comprobar_sin_consultas(self, tramite, slugs):
+        with self.assertNumQueries(3):
+            snapshot = TramiteSnapshot.de(tramite)
+        request = PeticionDiferida({'firma_cliente_data': ''})
+        for slug in slugs:
+            tpl = plantilla_documento(slug)
+            with self.subTest(slug=slug), self.assertNumQueries(0):
+                construir_contexto(slug, snapshot, request, tpl)
+
+    def test_documentos_de_tramite_normal(self):
+        self._comprobar_sin_consultas(self.tramite_normal, [
+            'aviso_privacidad',
+            'carta_intencion',
+            'solicitud_contrato',
+            'financiamiento',
+            slug_contrato(self.tramite_normal),
+        ])
+
+    def test_documentos_de_tramite_commeta(self):
+        self._comprobar_sin_consultas(self.tramite_commeta, [
+            'aviso_privacidad_commeta',
+            'carta_intencion_commeta',
+            'solicitud_contrato_commeta',
+            'financiamiento',
+            slug_contrato(self.tramite_commeta),
+        ])
@@ -0,0 +1,154 @@
+# workflow/trabajos.py
+"""
+Cola de trabajos de documentos respaldada por la base de datos.
+
+No necesita broker externo: los trabajos son filas de TrabajoDocumentos y el
+comando `python manage.py procesar_documentos` los va tomando con
+SELECT ... FOR UPDATE SKIP LOCKED, así que pueden correr varios workers a la vez.
+Mientras procesa, el worker actualiza latido_en del trabajo; un trabajo sólo se
+devuelve a la cola cuando ese latido deja de llegar (el worker murió).
+"""
+import logging
+import os
+import threading
+import zipfile
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.core.files import File
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from pdfs.utils import espacio_temporal
+from workflow.models import TrabajoDocumentos
+from workflow.paquetes import CLAVES_SESION, PeticionDiferida, generar_paquete
+
+logger = logging.getLogger(__name__)
+
+# Cada cuántos segundos avisa el worker que sigue vivo
+INTERVALO_LATIDO = 30
+
+
+def encolar_trabajo(tramite, slugs, request):
+    """Crea el trabajo para generar `slugs` del trámite y lo deja pendiente."""
+    datos_sesion = {clave: request.session.get(clave) for clave in CLAVES_SESION}
+    usuario = request.user if request.user.is_authenticated else None
+    return TrabajoDocumentos.objects.create(
+        tramite=tramite,
+        usuario=usuario,
+        documentos=list(slugs),
+        progreso={slug: 'pendiente' for slug in slugs},
+        datos_sesion=datos_sesion,
+    )
+
+
+def tomar_siguiente():
+    """Marca como 'procesando' el trabajo pendiente más antiguo y lo devuelve (o None)."""
+    with transaction.atomic():
+        trabajo = (
+            TrabajoDocumentos.objects
+            .select_for_update(skip_locked=True)
+            .filter(estado='pendiente')
+            .order_by('creado_en')
+            .first()
+        )
+        if trabajo is None:
+            return None
+        trabajo.estado = 'procesando'
+        trabajo.iniciado_en = trabajo.latido_en = timezone.now()
+        trabajo.intentos += 1
+        trabajo.save(update_fields=['estado', 'iniciado_en', 'latido_en', 'intentos'])
+    return trabajo
+
+
+@contextmanager
+def latido(trabajo, intervalo=INTERVALO_LATIDO):
+    """
+    Actualiza trabajo.latido_en cada `intervalo` segundos desde otro hilo
+    mientras dura el bloque, aunque una conversión tarde varios minutos.
+    """
+    detener = threading.Event()
+
+    def latir():
+        try:
+            while not detener.wait(intervalo):
+                try:
+                    TrabajoDocumentos.objects.filter(pk=trabajo.pk, estado='procesando').update(
+                        latido_en=timezone.now()
+                    )
+                except Exception:
+                    logger.exception('No se pudo registrar el latido del trabajo %s', trabajo.pk)
+                    connection.close()
+        finally:
+            # El hilo tiene su propia conexión
+            connection.close()
+
+    hilo = threading.Thread(target=latir, name=f'latido-{trabajo.pk}', daemon=True)
+    hilo.start()
+    try:
+        yield
+    finally:
+        detener.set()
+        hilo.join()
+
+
+def liberar_atascados(minutos=5, max_intentos=3):
+    """
+    Devuelve a la cola los trabajos 'procesando' cuyo worker no da señales
+    de vida desde hace más de `minutos` (el worker murió); tras
+    `max_intentos` se marcan como error. Un worker vivo refresca latido_en
+    cada INTERVALO_LATIDO segundos, así que su trabajo nunca se reencola.
+    """
+    limite = timezone.now() - timedelta(minutes=minutos)
+    atascados = TrabajoDocumentos.objects.filter(
+        Q(latido_en__lt=limite) | Q(latido_en__isnull=True, iniciado_en__lt=limite),
+        estado='procesando',
+    )
+    atascados.filter(intentos__gte=max_intentos).update(
+        estado='error', error='El trabajo se interrumpió demasiadas veces.', terminado_en=timezone.now()
+    )
+    return atascados.filter(intentos__lt=max_intentos).update(estado='pendiente')
+
+
+def procesar(trabajo):
+    """Genera los documentos del trabajo y guarda el ZIP en el storage."""
+    request = PeticionDiferida(session=trabajo.datos_sesion, user=trabajo.usuario)
+
+    def progreso(slug, estado):
+        trabajo.progreso[slug] = estado
+        trabajo.save(update_fields=['progreso'])
+
+    try:
+        with latido(trabajo), espacio_temporal(prefijo='trabajo_') as directorio:
+            archivos = generar_paquete(trabajo.tramite, trabajo.documentos, request, directorio, progreso)
+
+            ruta_zip = os.path.join(directorio, 'documentos.zip')
+            with zipfile.ZipFile(ruta_zip, 'w', zipfile.ZIP_DEFLATED) as zf:
+                for arcname, ruta in archivos:
+                    zf.write(ruta, arcname)
+
+            with open(ruta_zip, 'rb') as f:
+                trabajo.archivo.save(f'documentos_{trabajo.tramite_id}_{trabajo.pk}.zip', File(f), save=False)
+    except Exception as e:
+        logger.exception('Error en el trabajo de documentos %s', trabajo.pk)
+        trabajo.estado = 'error'
+        trabajo.error = str(e)
+    else:
+        trabajo.estado = 'terminado'
+    trabajo.terminado_en = timezone.now()
+    trabajo.save()
+    return trabajo
+
+
+def purgar_terminados(dias=2):
+    """Borra los trabajos finalizados hace más de `dias` días junto con su ZIP."""
+    limite = timezone.now() - timedelta(days=dias)
+    viejos = TrabajoDocumentos.objects.filter(estado__in=['terminado', 'error'], terminado_en__lt=limite)
+    borrados = 0
+    for trabajo in viejos.iterator():
+        if trabajo.archivo:
+            trabajo.archivo.delete(save=False)
+        trabajo.delete()
+        borrados += 1
+    return borrados
@@ -23,7 +23,10 @@ urlpatterns = [
     path('vendedor/', SeleccionVendedorView.as_view(), name='paso_vendedor'),
     path('aviso-privacidad/', AvisoPrivacidadView.as_view(), name='aviso_privacidad'),
     path('documentos/', SeleccionDocumentosView.as_view(), name='paso3_documentos'),
+    path('documentos/trabajo/<uuid:pk>/', views.TrabajoDocumentosView.as_view(), name='trabajo_documentos'),
+    path('documentos/trabajo/<uuid:pk>/descargar/', views.DescargarTrabajoDocumentosView.as_view(), name='descargar_trabajo_documentos'),
     path('ajax/lotes/<int:proyecto_id>/', views.ajax_lotes, name='ajax_lotes'),
+    path('ajax/planes/', views.ajax_planes_financiamiento, name='ajax_planes_financiamiento'),
     path('clausulas-especiales/', ClausulasEspecialesView.as_view(), name='clausulas_especiales'),
     path('health-check/', views.health_check, name='health_check'),
     # reemplaza AvancePruebaView por la vista real cuando la crees
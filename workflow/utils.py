@@ -1,3 +1,6 @@
+from functools import lru_cache
+
+
 def calcular_superficie(norte, sur, este, oeste):
     # Este es solo un ejemplo sencillo
     try:
@@ -11,6 +14,83 @@ def calcular_superficie(norte, sur, este, oeste):
     except:
         return 0.0
     
+# Tablas para numero_a_letras
+_UNIDADES = ('', 'UN', 'DOS', 'TRES', 'CUATRO', 'CINCO', 'SEIS', 'SIETE', 'OCHO', 'NUEVE')
+_DECENAS = ('', 'DIEZ', 'VEINTE', 'TREINTA', 'CUARENTA', 'CINCUENTA', 'SESENTA', 'SETENTA', 'OCHENTA', 'NOVENTA')
+_ESPECIALES = {
+    11: 'ONCE', 12: 'DOCE', 13: 'TRECE', 14: 'CATORCE', 15: 'QUINCE',
+    16: 'DIECISÉIS', 17: 'DIECISIETE', 18: 'DIECIOCHO', 19: 'DIECINUEVE',
+    20: 'VEINTE', 21: 'VEINTIUN', 22: 'VEINTIDÓS', 23: 'VEINTITRÉS',
+    24: 'VEINTICUATRO', 25: 'VEINTICINCO', 26: 'VEINTISÉIS', 27: 'VEINTISIETE',
+    28: 'VEINTIOCHO', 29: 'VEINTINUEVE'
+}
+_CENTENAS = {1: 'CIENTO', 5: 'QUINIENTOS', 7: 'SETECIENTOS', 9: 'NOVECIENTOS'}
+
+
+def _tabla_0_999(apocopado):
+    """Letras de 0 a 999 ('' para el 0), calculadas una sola vez."""
+    unidades = list(_UNIDADES)
+    especiales = dict(_ESPECIALES)
+    if not apocopado:
+        unidades[1] = 'UNO'
+        especiales[21] = 'VEINTIUNO'
+
+    tabla = []
+    for n in range(1000):
+        centena, resto = divmod(n, 100)
+        partes = []
+        if centena == 1 and resto == 0:
+            partes.append('CIEN')
+        elif centena:
+            partes.append(_CENTENAS.get(centena) or unidades[centena] + 'CIENTOS')
+        if resto in especiales:
+            partes.append(especiales[resto])
+        elif resto:
+            decena, unidad = divmod(resto, 10)
+            if decena:
+                partes.append(_DECENAS[decena])
+            if unidad:
+                if decena:
+                    partes.append('Y')
+                partes.append(unidades[unidad])
+        tabla.append(' '.join(partes))
+    return tuple(tabla)
+
+
+_TABLAS_0_999 = {True: _tabla_0_999(True), False: _tabla_0_999(False)}
+
+
+def _entero_a_letras(entero, apocopado):
+    tabla = _TABLAS_0_999[apocopado]
+    resultado = []
+
+    millones, entero = divmod(entero, 1000000)
+    if millones == 1:
+        resultado.append("UN MILLÓN")
+    elif millones > 1:
+        resultado.append(_entero_a_letras(millones, apocopado))
+        resultado.append("MILLONES")
+
+    miles, entero = divmod(entero, 1000)
+    if miles == 1:
+        resultado.append("MIL")
+    elif miles > 1:
+        resultado.append(tabla[miles])
+        resultado.append("MIL")
+
+    if entero > 0:
+        resultado.append(tabla[entero])
+    return ' '.join(resultado)
+
+
+@lru_cache(maxsize=4096)
+def _letras(entero, decimales, apocopado):
+    letras = _entero_a_letras(entero, apocopado) if entero > 0 else ''
+    if decimales > 0:
+        letras += f" CON {decimales:02d}/100"
+    return letras
+
+
 def numero_a_letras(numero, apocopado=True):
     """Convierte un número a su representación en letras en español, incluyendo millones.
     Parámetros:
@@ -20,99 +100,29 @@ def numero_a_letras(numero, apocopado=True):
     Ejemplo:
       numero_a_letras(1) -> "UN"        (por defecto, útil para precios)
       numero_a_letras(1, apocopado=False) -> "UNO"  (útil para fechas)
+    Las letras de 0 a 999 salen de una tabla precalculada y los montos
+    completos se guardan en un caché LRU.
     """
     # Caso especial para cero
     if numero == 0:
         return "CERO"
     
-    # Diccionarios para conversión
-    if apocopado:
-        unidades = ['', 'UN', 'DOS', 'TRES', 'CUATRO', 'CINCO', 'SEIS', 'SIETE', 'OCHO', 'NUEVE']
-        veintiuno = 'VEINTIUN'
-    else:
-        unidades = ['', 'UNO', 'DOS', 'TRES', 'CUATRO', 'CINCO', 'SEIS', 'SIETE', 'OCHO', 'NUEVE']
-        veintiuno = 'VEINTIUNO'
-    
-    decenas = ['', 'DIEZ', 'VEINTE', 'TREINTA', 'CUARENTA', 'CINCUENTA', 'SESENTA', 'SETENTA', 'OCHENTA', 'NOVENTA']
-    especiales = {
-        11: 'ONCE', 12: 'DOCE', 13: 'TRECE', 14: 'CATORCE', 15: 'QUINCE',
-        16: 'DIECISÉIS', 17: 'DIECISIETE', 18: 'DIECIOCHO', 19: 'DIECINUEVE',
-        20: 'VEINTE', 21: veintiuno, 22: 'VEINTIDÓS', 23: 'VEINTITRÉS',
-        24: 'VEINTICUATRO', 25: 'VEINTICINCO', 26: 'VEINTISÉIS', 27: 'VEINTISIETE',
-        28: 'VEINTIOCHO', 29: 'VEINTINUEVE'
-    }
-    
     # Manejar decimales
     entero = int(numero)
     decimales = int(round((numero - entero) * 100))
-    
-    # Convertir parte entera
+    return _letras(entero, decimales, apocopado)
+
+
+def numeros_a_letras(numeros, apocopado=True):
+    """
+    numero_a_letras() para una columna completa (p. ej. las cuotas de una
+    TablaAmortizacion). Los montos repetidos se convierten una sola vez.
+    """
+    convertidos = {}
     resultado = []
-    
-    # Manejar millones
-    if entero >= 1000000:
-        millones = entero // 1000000
-        entero %= 1000000
-        
-        if millones == 1:
-            resultado.append("UN MILLÓN")
-        elif millones > 1:
-            # pasar el mismo modo apocopado a la recursión
-            resultado.append(numero_a_letras(millones, apocopado=apocopado))
-            resultado.append("MILLONES")
-    
-    # Manejar miles
-    if entero >= 1000:
-        miles = entero // 1000
-        entero %= 1000
-        
-        if miles == 1:
-            resultado.append("MIL")
-        elif miles > 1:
-            resultado.append(numero_a_letras(miles, apocopado=apocopado))
-            resultado.append("MIL")
-    
-    # Convertir centenas (0-999)
-    if entero > 0:
-        centena = entero // 100
-        resto = entero % 100
-        
-        if centena > 0:
-            if centena == 1:
-                if resto == 0:
-                    resultado.append("CIEN")
-                else:
-                    resultado.append("CIENTO")
-            elif centena == 5:
-                resultado.append("QUINIENTOS")
-            elif centena == 7:
-                resultado.append("SETECIENTOS")
-            elif centena == 9:
-                resultado.append("NOVECIENTOS")
-            else:
-                # unidades[centena] funciona porque tenemos valores como 'DOS' etc.
-                resultado.append(unidades[centena] + "CIENTOS")
-        
-        if resto > 0:
-            if resto in especiales:
-                resultado.append(especiales[resto])
-            else:
-                decena = resto // 10
-                unidad = resto % 10
-                
-                if decena > 0:
-                    resultado.append(decenas[decena])
-                
-                if unidad > 0:
-                    if decena > 0 and unidad > 0:
-                        resultado.append('Y')
-                    resultado.append(unidades[unidad])
-    
-    # Unir todas las partes
-    letras = ' '.join(resultado)
-    
-    # Agregar decimales si existen
-    if decimales > 0:
-        letras += f" CON {decimales:02d}/100"
-    
-    return letras
+    for numero in numeros:
+        letras = convertidos.get(numero)
+        if letras is None:
+            letras = convertidos[numero] = numero_a_letras(numero, apocopado=apocopado)
+        resultado.append(letras)
+    return resultado
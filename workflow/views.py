@@ -13,7 +13,10 @@ from core.models import Cliente, Beneficiario
 from django.shortcuts import get_object_or_404, redirect
 from .forms import VendorSelectForm
 from django import forms
-from workflow.docs import DOCUMENTOS
+from workflow.borradores import borrador_actual, iniciar_borrador, peticion_documentos
+from workflow.docs import DOCUMENTOS, plantilla_documento, slug_contrato
+from workflow.firmas import clave_firma, registrar_firma
+from workflow.utils import numero_a_letras
 from .forms import SeleccionDocumentosForm
 from requests import request
 from .forms import SegundoClienteForm
@@ -23,18 +26,25 @@ from django.http import HttpResponse
 import os
 from docxtpl import DocxTemplate
 from django.views import View
-from django.http import FileResponse, Http404
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.db import transaction
 from django.utils import timezone
 from .forms import SolicitudContratoForm, FirmaForm
 #from .views import SolicitudContratoView  # si lo necesitas
-from .models import ClausulasEspeciales, Tramite
+from .models import BorradorTramite, ClausulasEspeciales, TokenFirma, Tramite, TrabajoDocumentos
 from django.shortcuts import redirect
 from datetime import date
 from workflow.forms import ClausulasEspecialesForm
 from django.conf import settings
 from pdfs.utils import fill_word_template, convert_docx_to_pdf
-
-from core.models import Lote
+from workflow.paquetes import flujo_paquete
+from workflow.trabajos import encolar_trabajo
+
+from core.models import Lote, Proyecto
+from core.catalogo import consulta_en_cache, version_plan, version_proyecto
+from core.utils import normalizar_busqueda
+from dashboard.paginacion import paginar_por_cursor
+from django.template.loader import render_to_string
 import time
 from django.views.decorators.csrf import csrf_exempt
 
@@ -50,6 +60,7 @@ def health_check(request):
         "app": "workflow"
     })
 
+@consulta_en_cache(lambda request, proyecto_id: version_proyecto(proyecto_id), 'lotes')
 def ajax_lotes(request, proyecto_id):
     lotes = Lote.objects.filter(proyecto_id=proyecto_id, activo=True).order_by('identificador')
     data = [{'id': l.id, 'identificador': l.identificador} for l in lotes]
@@ -95,6 +106,12 @@ class SolicitudContratoView(FormView):
         return redirect('workflow:generar_carta')
 
 
+def _version_plan_solicitado(request):
+    id_fin = request.GET.get('id', '')
+    return version_plan(id_fin) if id_fin.isdigit() else None
+
+
+@consulta_en_cache(_version_plan_solicitado, 'datos-plan')
 def obtener_datos_financiamiento(request):
     id_fin = request.GET.get('id')
     if not id_fin:
@@ -243,71 +260,44 @@ class GenerarCartaIntencionView(View):
             raise Http404("No se encontró el archivo generado.")
 
 
-
-def numero_a_letras(numero):
-    """Convierte un número a su representación en letras en español"""
-    unidades = ['', 'UN', 'DOS', 'TRES', 'CUATRO', 'CINCO', 'SEIS', 'SIETE', 'OCHO', 'NUEVE']
-    decenas = ['', 'DIEZ', 'VEINTE', 'TREINTA', 'CUARENTA', 'CINCUENTA', 'SESENTA', 'SETENTA', 'OCHENTA', 'NOVENTA']
-    especiales = {
-        11: 'ONCE', 12: 'DOCE', 13: 'TRECE', 14: 'CATORCE', 15: 'QUINCE',
-        16: 'DIECISÉIS', 17: 'DIECISIETE', 18: 'DIECIOCHO', 19: 'DIECINUEVE',
-        20: 'VEINTE', 21: 'VEINTIUN', 22: 'VEINTIDÓS', 23: 'VEINTITRÉS',
-        24: 'VEINTICUATRO', 25: 'VEINTICINCO', 26: 'VEINTISÉIS', 27: 'VEINTISIETE',
-        28: 'VEINTIOCHO', 29: 'VEINTINUEVE'
-    }
-    
-    # Manejar decimales (centavos)
-    entero = int(numero)
-    decimales = int(round((numero - entero) * 100))
-    
-    # Convertir parte entera
-    if entero in especiales:
-        resultado = especiales[entero]
-    elif entero < 10:
-        resultado = unidades[entero]
-    elif entero < 100:
-        decena = entero // 10
-        unidad = entero % 10
-        if unidad == 0:
-            resultado = decenas[decena]
-        else:
-            resultado = f"{decenas[decena]} Y {unidades[unidad]}"
-    elif entero < 1000:
-        centena = entero // 100
-        resto = entero % 100
-        if resto == 0:
-            resultado = f"{unidades[centena]}CIENTOS" if centena > 1 else "CIEN"
-        else:
-            resultado = f"{unidades[centena]}CIENTOS {numero_a_letras(resto)}"
-    else:
-        miles = entero // 1000
-        resto = entero % 1000
-        if resto == 0:
-            resultado = f"{numero_a_letras(miles)} MIL"
-        else:
-            resultado = f"{numero_a_letras(miles)} MIL {numero_a_letras(resto)}"
-    
-    # Agregar decimales si existen
-    if decimales > 0:
-        resultado += f" CON {decimales:02d}/100"
-    
-    return resultado
-
 class FinanciamientoSelectView(FormView):
     template_name = "workflow/paso1_financiamiento.html"
     form_class = Paso1Form# que veremos más abajo
 
     def form_valid(self, form):
         fin = form.cleaned_data['financiamiento']
-        self.request.session['financiamiento_id'] = fin.id
+        iniciar_borrador(self.request, financiamiento=fin)
         return redirect('workflow:paso2_cliente')
 
+# Datos del segundo cliente que se guardan en el borrador hasta crearlo
+CAMPOS_SEGUNDO_CLIENTE = (
+    'nombre_completo', 'sexo', 'rfc', 'domicilio', 'telefono', 'email', 'ocupacion',
+    'estado_civil', 'nacionalidad', 'originario', 'tipo_id', 'numero_id',
+)
+
+# (campo del borrador y del trámite, nombre en el formulario del paso 2)
+CAMPOS_TESTIGOS = (
+    ('testigo_1_nombre', 'testigo1_nombre'),
+    ('testigo_2_nombre', 'testigo2_nombre'),
+    ('testigo_1_idmex', 'testigo1_idmex'),
+    ('testigo_2_idmex', 'testigo2_idmex'),
+)
+
+
+def _edad(valor):
+    """Edad capturada en el paso 2 como entero, o None si está vacía o no es válida."""
+    try:
+        return int(valor.strip()) if valor and valor.strip() else None
+    except ValueError:
+        return None
+
+
 class ClienteDataView(FormView):
     template_name = "workflow/paso2_cliente.html"
     form_class = ClienteForm
 
     def dispatch(self, request, *args, **kwargs):
-        if not request.session.get('financiamiento_id'):
+        if borrador_actual(request) is None:
             return redirect('workflow:paso1_financiamiento')
         return super().dispatch(request, *args, **kwargs)
 
@@ -317,8 +307,7 @@ class ClienteDataView(FormView):
         que ya guardó la inmobiliaria en el plan.
         """
         initial = super().get_initial()
-        fin_id = self.request.session['financiamiento_id']
-        fin = get_object_or_404(Financiamiento, id=fin_id)
+        fin = borrador_actual(self.request).financiamiento
         initial['nombre_completo'] = fin.nombre_cliente
         return initial
 
@@ -329,9 +318,7 @@ class ClienteDataView(FormView):
         y lote asociado).
         """
         ctx = super().get_context_data(**kwargs)
-        fin_id = self.request.session['financiamiento_id']
-        fin = get_object_or_404(Financiamiento, id=fin_id)
-        ctx['financiamiento'] = fin
+        ctx['financiamiento'] = borrador_actual(self.request).financiamiento
 
         # segundo_form con prefix (si ya existe en contexto, respetarlo)
         if 'segundo_form' not in ctx:
@@ -365,95 +352,47 @@ class ClienteDataView(FormView):
             return self.form_invalid(main_form, segundo_form)
 
         # main_form válido: guardar primer cliente a BD (igual que antes)
+        borrador = borrador_actual(request)
         cliente = main_form.save()
-        self.request.session['cliente_id'] = cliente.id
 
         # ----------------------------------------------------------------
-        # Campos extra (Edad y Vecino) — no pertenecen al modelo Cliente,
-        # se guardan en sesión como un dict identificado por cliente.
+        # Lo demás se guarda en el borrador y pasa al trámite al aceptar el
+        # aviso. Edad y vecino no pertenecen al modelo Cliente.
         # ----------------------------------------------------------------
-        extra_fields = {}
-
-        edad_c1 = request.POST.get('edad_cliente_1', '').strip()
-        if edad_c1:
-            extra_fields['edad_cliente_1'] = edad_c1
-
-        vecino_c1 = request.POST.get('vecino_cliente_1', '').strip()
-        if vecino_c1:
-            extra_fields['vecino_cliente_1'] = vecino_c1
+        captura = dict(
+            BorradorTramite.CAPTURA_CLIENTES,
+            cliente_id=cliente.id,
+            edad_cliente_1=_edad(request.POST.get('edad_cliente_1')),
+            vecino=request.POST.get('vecino_cliente_1', '').strip(),
+        )
 
         # Manejar segundo cliente (si solicitado)
         if add_second:
             if not segundo_form.is_valid():
                 # segundo formulario inválido -> mostrar errores
+                borrador.actualizar(cliente_id=cliente.id)
                 return self.form_invalid(main_form, segundo_form)
 
-            # segundo válido -> guardamos sus datos en sesión (no lo persistimos aún)
-            # guardamos solo campos primitivos (strings, números)
+            # segundo válido -> guardamos sus datos (no lo persistimos aún)
             cd2 = segundo_form.cleaned_data
-            cliente2_data = {
-                'nombre_completo': cd2.get('nombre_completo', ''),
-                'sexo': cd2.get('sexo', ''),
-                'rfc': cd2.get('rfc', ''),
-                'domicilio': cd2.get('domicilio', ''),
-                'telefono': cd2.get('telefono', ''),
-                'email': cd2.get('email', ''),
-                'ocupacion': cd2.get('ocupacion', ''),
-                'estado_civil': cd2.get('estado_civil', ''),
-                'nacionalidad': cd2.get('nacionalidad', ''),
-                'originario': cd2.get('originario', ''),
-                'tipo_id': cd2.get('tipo_id', ''),
-                'numero_id': cd2.get('numero_id', ''),
-            }
-            self.request.session['cliente2_data'] = cliente2_data
-
-            # Campos extra del segundo cliente
-            edad_c2 = request.POST.get('edad_cliente_2', '').strip()
-            if edad_c2:
-                extra_fields['edad_cliente_2'] = edad_c2
-
-            vecino_c2 = request.POST.get('vecino_cliente_2', '').strip()
-            if vecino_c2:
-                extra_fields['vecino_cliente_2'] = vecino_c2
-                
-        else:
-            # si no lo seleccionó, nos aseguramos de limpiar la sesión
-            self.request.session.pop('cliente2_data', None)
+            captura['cliente_2_datos'] = {campo: cd2.get(campo, '') for campo in CAMPOS_SEGUNDO_CLIENTE}
+            captura['edad_cliente_2'] = _edad(request.POST.get('edad_cliente_2'))
+            captura['vecino_2'] = request.POST.get('vecino_cliente_2', '').strip()
 
-        # Guardar campos extra en sesión (vacío si no se proporcionaron)
-        self.request.session['extra_fields'] = extra_fields
-
-        # Manejar testigos (opcionales)
-        testigos_data = {}
+        # Manejar testigos (ambos son opcionales)
         if add_testigos:
-            # Ahora ambos testigos son opcionales
-            testigo1_nombre = request.POST.get('testigo1_nombre', '').strip()
-            testigo2_nombre = request.POST.get('testigo2_nombre', '').strip()
-            testigo1_idmex  = request.POST.get('testigo1_idmex', '').strip()
-            testigo2_idmex  = request.POST.get('testigo2_idmex', '').strip()
-            
-            if testigo1_nombre:
-                testigos_data['testigo1_nombre'] = testigo1_nombre
-            if testigo2_nombre:
-                testigos_data['testigo2_nombre'] = testigo2_nombre
-
-            if testigo1_idmex:
-                testigos_data['testigo1_idmex'] = testigo1_idmex
-            if testigo2_idmex:
-                testigos_data['testigo2_idmex'] = testigo2_idmex
-        
-        self.request.session['testigos_data'] = testigos_data
+            for campo, nombre_post in CAMPOS_TESTIGOS:
+                captura[campo] = request.POST.get(nombre_post, '').strip()
 
-        # NUEVO: Manejar beneficiario (opcional)
-        beneficiario_data = {}
+        # Manejar beneficiario (opcional)
         if add_beneficiarios:
             if not beneficiario_form.is_valid():
+                borrador.actualizar(cliente_id=cliente.id)
                 return self.form_invalid(main_form, segundo_form, beneficiario_form)
+            captura['beneficiario_datos'] = beneficiario_form.cleaned_data
 
-            # beneficiario válido -> guardamos sus datos en sesión
-            beneficiario_data = beneficiario_form.cleaned_data
-        
-        self.request.session['beneficiario_data'] = beneficiario_data
+        # Sólo se escriben las columnas que cambiaron
+        borrador.actualizar(**captura)
         
         # redirigir al siguiente paso
         return redirect('workflow:paso_vendedor')
@@ -469,22 +408,21 @@ class SeleccionVendedorView(FormView):
     form_class = VendorSelectForm
 
     def dispatch(self, request, *args, **kwargs):
-        if not request.session.get('financiamiento_id'):
+        borrador = borrador_actual(request)
+        if borrador is None:
             return redirect('workflow:paso1_financiamiento')
-        if not request.session.get('cliente_id'):
+        if not borrador.cliente_id:
             return redirect('workflow:paso2_cliente')
         return super().dispatch(request, *args, **kwargs)
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
-        fin_id = self.request.session['financiamiento_id']
-        fin = get_object_or_404(Financiamiento, id=fin_id)
-        kwargs['financiamiento'] = fin
+        kwargs['financiamiento'] = borrador_actual(self.request).financiamiento
         return kwargs
     
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        fin = get_object_or_404(Financiamiento, id=self.request.session['financiamiento_id'])
+        fin = borrador_actual(self.request).financiamiento
         ctx['financiamiento'] = fin
         
         # Obtener vendedores y propietarios del proyecto
@@ -527,8 +465,7 @@ class SeleccionVendedorView(FormView):
         
         # El formato del valor es "tipo-id" (ej: "vendedor-1" o "propietario-3")
         tipo, id_val = persona_id.split('-')
-        self.request.session['persona_tipo'] = tipo
-        self.request.session['persona_id'] = int(id_val)
+        borrador_actual(self.request).actualizar(persona_tipo=tipo, persona_id=int(id_val))
         
         return redirect('workflow:aviso_privacidad')
 
@@ -541,27 +478,23 @@ class ClausulasEspecialesView(FormView):
     form_class = ClausulasEspecialesForm
 
     def dispatch(self, request, *args, **kwargs):
+        borrador = borrador_actual(request)
         # Requiere haber aceptado el aviso
-        if not request.session.get('privacy_accepted'):
+        if borrador is None or not borrador.aviso_aceptado:
             return redirect('workflow:aviso_privacidad')
         
-        # Requiere haber seleccionado financiamiento, cliente y persona (vendedor o propietario)
-        required_keys = ['financiamiento_id', 'cliente_id', 'persona_tipo', 'persona_id']
-        for key in required_keys:
-            if not request.session.get(key):
-                return redirect('workflow:paso1_financiamiento')
+        # Requiere haber seleccionado cliente y persona (vendedor o propietario)
+        if not (borrador.cliente_id and borrador.persona_tipo and borrador.persona_id):
+            return redirect('workflow:paso1_financiamiento')
                 
         return super().dispatch(request, *args, **kwargs)
 
     def form_valid(self, form):
-        # Guardar las cláusulas en la sesión
         # Obtener el trámite actual
-        tramite_id = self.request.session.get('tramite_id')
-        if not tramite_id:
+        tramite = borrador_actual(self.request).tramite
+        if tramite is None:
             # Si no hay trámite, redirigir al inicio
             return redirect('workflow:paso1_financiamiento')
-        
-        tramite = get_object_or_404(Tramite, id=tramite_id)
 
         # Guardar las cláusulas en la base de datos
         ClausulasEspeciales.objects.update_or_create(
@@ -572,12 +505,6 @@ class ClausulasEspecialesView(FormView):
                 'clausula_promesa': form.cleaned_data['clausula_promesa'],
             }
         )
-
-        self.request.session['clausulas_especiales'] = {
-            'pago': form.cleaned_data['clausula_pago'],
-            'deslinde': form.cleaned_data['clausula_deslinde'],
-            'promesa': form.cleaned_data['clausula_promesa'],
-        }
         return redirect('workflow:paso3_documentos')
 
 class SeleccionDocumentosView(FormView):
@@ -585,22 +512,19 @@ class SeleccionDocumentosView(FormView):
     form_class = SeleccionDocumentosForm
 
     def dispatch(self, request, *args, **kwargs):
+        borrador = borrador_actual(request)
         # Requiere haber aceptado el aviso
-        if not request.session.get('privacy_accepted'):
+        if borrador is None or not borrador.aviso_aceptado:
             return redirect('workflow:aviso_privacidad')
-        # NUEVO: Requiere tener tramite_id en sesión (ya que ahora se crea en aviso)
-        if not request.session.get('tramite_id'):
-            print("⚠️ No hay tramite_id en sesión, redirigiendo a inicio")
+        # Requiere que el borrador ya tenga trámite (se crea en el aviso)
+        if not borrador.tramite_id:
+            print("⚠️ El borrador no tiene trámite, redirigiendo a inicio")
             return redirect('workflow:paso1_financiamiento')
         return super().dispatch(request, *args, **kwargs)
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
-        tramite_id = self.request.session.get('tramite_id')
-        if not tramite_id:
-            raise Http404("No se encontró el trámite")
-            
-        tramite = get_object_or_404(Tramite, id=tramite_id)
+        tramite = borrador_actual(self.request).tramite
         fin = tramite.financiamiento
 
         # 1) Empezamos con los documentos que siempre queremos mostrar
@@ -621,71 +545,8 @@ class SeleccionDocumentosView(FormView):
         if fin.tipo_pago == 'financiado':
             slugs.append('financiamiento')
 
-        # 2) Ahora, agregamos el contrato correspondiente según régimen y tipo de pago
-        regime = fin.lote.proyecto.tipo_contrato.lower()
-        pago   = fin.tipo_pago
-
-        # Verificar si hay segundo cliente
-        has_second_client = tramite and tramite.cliente_2 is not None
-
-        if 'propiedad definitiva' in regime:
-            if has_second_client:
-                if pago == 'contado':
-                    slugs.append('contrato_definitiva_contado_varios')
-                else:
-                    slugs.append('contrato_definitiva_pagos_varios')
-            else:
-                if pago == 'contado':
-                    slugs.append('contrato_definitiva_contado')
-                else:
-                    slugs.append('contrato_definitiva_pagos')
-        elif 'pequeña propiedad' in regime:
-            # Contratos especiales para cuando hay 2 clientes
-            if has_second_client:
-                if pago == 'contado':
-                    slugs.append('contrato_propiedad_contado_varios')
-                else:
-                    slugs.append('contrato_propiedad_pagos_varios')
-            else:
-                if pago == 'contado':
-                    slugs.append('contrato_propiedad_contado')
-                else:
-                    slugs.append('contrato_propiedad_pagos')
-        elif 'ejido' in regime:
-            # ejidal o comunal
-            if has_second_client:
-                if pago == 'contado':
-                    slugs.append('contrato_ejidal_contado_varios')
-                else:
-                    slugs.append('contrato_ejidal_pagos_varios')
-            else:
-                if pago == 'contado':
-                    slugs.append('contrato_ejidal_contado')
-                else:
-                    slugs.append('contrato_ejidal_pagos')
-        else:
-            if fin.es_commeta:
-                if has_second_client:
-                    if pago == 'contado':
-                        slugs.append('contrato_canario_contado_varios')
-                    else:
-                        slugs.append('contrato_commeta_pagos_varios')
-                else:
-                    if pago == 'contado':
-                        slugs.append('contrato_canario_contado')
-                    else:
-                        slugs.append('contrato_commeta_pagos')
-            else:
-                if has_second_client:
-                    if pago == 'contado':
-                        slugs.append('contrato_canario_contado_varios')
-                    else:
-                        slugs.append('contrato_canario_pagos_varios')
-                else:
-                    if pago == 'contado':
-                        slugs.append('contrato_canario_contado')
-                    else:
-                        slugs.append('contrato_canario_pagos')
+        # 3) El contrato correspondiente según régimen, tipo de pago, segundo cliente y Commeta
+        slugs.append(slug_contrato(tramite))
 
         if tramite.es_commeta:
             slugs.append('reglamento_commeta')
@@ -695,12 +556,8 @@ class SeleccionDocumentosView(FormView):
     
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        # Obtener trámite desde la sesión
-        tramite_id = self.request.session.get('tramite_id')
-        if not tramite_id:
-            raise Http404("No se encontró el trámite")
-            
-        tramite = get_object_or_404(Tramite, id=tramite_id)
+        # Trámite del borrador en captura
+        tramite = borrador_actual(self.request).tramite
         # ✅ GENERAR LOS LINKS SI NO EXISTEN
         if not tramite.link_firma_cliente:  # Si no hay links generados
             print("⚠️ Links no generados - generando ahora...")
@@ -739,175 +596,72 @@ class SeleccionDocumentosView(FormView):
 
     def form_valid(self, form):
         # 1) Carga el trámite
-        tramite_id = self.request.session.get('tramite_id')
-        if not tramite_id:
-            raise Http404("No se encontró el trámite")
-            
-        tramite = get_object_or_404(Tramite, id=tramite_id)
+        tramite = borrador_actual(self.request).tramite
         print(f"📄 Generando documentos para trámite {tramite.id}, tipo: {'Commeta' if tramite.es_commeta else 'Normal'}")
 
-        fin = tramite.financiamiento
-        cli = tramite.cliente
-        
-        # Obtener la persona correcta según el tipo
-        if tramite.persona_tipo == 'vendedor':
-            ven = tramite.vendedor
-        else:
-            ven = tramite.propietario
-            
-        cli2 = tramite.cliente_2
-        
-        # Obtener cláusulas especiales de la base de datos
-        clausulas_adicionales = {}
-        if hasattr(tramite, 'clausulas_especiales'):
-            clausulas_db = tramite.clausulas_especiales
-            clausulas_adicionales = {
-                'pago': clausulas_db.clausula_pago,
-                'deslinde': clausulas_db.clausula_deslinde,
-                'promesa': clausulas_db.clausula_promesa,
-            }
-        else:
-            # Fallback a la sesión por si acaso
-            clausulas_adicionales = self.request.session.get('clausulas_especiales', {})
-
         selected = form.cleaned_data['documentos']
         print(f"📋 Documentos seleccionados: {selected}")
 
-        buffer = io.BytesIO()
-        with zipfile.ZipFile(buffer, 'w') as zf:
-            for slug in selected:
-
-                if slug == 'reglamento_commeta':
-                    # Ruta al archivo PDF estático
-                    static_pdf_path = os.path.join(settings.BASE_DIR, 'static', 'docs', 'Reglamento_Commeta.pdf')
-                    # Fallback usando staticfiles finder (útil en desarrollo)
-                    if not os.path.exists(static_pdf_path):
-                        from django.contrib.staticfiles.finders import find
-                        found = find('docs/Reglamento_Commeta.pdf')
-                        if found:
-                            static_pdf_path = found
-                        else:
-                            print(f"❌ No se encontró el archivo estático: Reglamento_Commeta.pdf")
-                            continue  # Saltar este documento si no existe
-                    
-                    # Leer el archivo y añadirlo al ZIP con nombre "reglamento_commeta.pdf"
-                    with open(static_pdf_path, 'rb') as f:
-                        zf.writestr('reglamento_commeta.pdf', f.read())
-                    continue  # Saltar el resto de la lógica (builder, conversión)
-                    
-                doc_info = DOCUMENTOS[slug]
-                tpl_path = os.path.join(settings.BASE_DIR, doc_info['plantilla'])
-                
-                # 1) generar contexto
-                tpl = DocxTemplate(tpl_path)
-                
-                # Manejo especial para el documento de financiamiento
-                if slug == 'financiamiento':
-                    # Para financiamiento, usar el builder unificado con parámetros Commeta si aplica
-                    try:
-                        if tramite.es_commeta:
-                            # Obtener el detalle de Commeta
-                            fin_commeta = tramite.obtener_detalle_commeta
-                            print(f"📊 Usando builder unificado para Commeta, esquema: {fin_commeta.tipo_esquema}")
-                            
-                            # Llamar al builder unificado con parámetros Commeta
-                            context = doc_info['builder'](
-                                fin, cli, ven, 
-                                request=self.request, 
-                                tpl=tpl, 
-                                firma_data=tramite.firma_cliente,
-                                clausulas_adicionales=clausulas_adicionales,
-                                cliente2=cli2,
-                                tramite=tramite,
-                                is_commeta=True,
-                                fin_commeta=fin_commeta
-                            )
-                        else:
-                            # Llamar al builder unificado para financiamiento normal
-                            context = doc_info['builder'](
-                                fin, cli, ven, 
-                                request=self.request, 
-                                tpl=tpl, 
-                                firma_data=tramite.firma_cliente,
-                                clausulas_adicionales=clausulas_adicionales,
-                                cliente2=cli2,
-                                tramite=tramite,
-                                is_commeta=False,
-                                fin_commeta=None
-                            )
-                    except Exception as e:
-                        print(f"❌ Error en builder de financiamiento: {str(e)}")
-                        # Fallback a la versión simple
-                        context = doc_info['builder'](
-                            fin, cli, ven, 
-                            request=self.request, 
-                            tpl=tpl, 
-                            firma_data=tramite.firma_cliente
-                        )
-                else:
-                    # Para los otros documentos, usar el método existente
-                    try:
-                        # Intenta pasar el segundo cliente si el builder lo soporta
-                        context = doc_info['builder'](
-                            fin, cli, ven, 
-                            request=self.request, 
-                            tpl=tpl, 
-                            firma_data=tramite.firma_cliente, 
-                            clausulas_adicionales=clausulas_adicionales,
-                            cliente2=cli2,
-                            tramite=tramite
-                        )
-                    except TypeError:
-                        try:
-                            # Versión sin cliente2
-                            context = doc_info['builder'](
-                                fin, cli, ven, 
-                                request=self.request, 
-                                tpl=tpl, 
-                                firma_data=tramite.firma_cliente, 
-                                clausulas_adicionales=clausulas_adicionales,
-                                tramite=tramite
-                            )
-                        except TypeError:
-                            try:
-                                # Versión mínima con Trámite (Ej. Solicitud de contrato)
-                                context = doc_info['builder'](
-                                    fin, cli, ven,
-                                    request=self.request, 
-                                    tpl=tpl,
-                                    firma_data=tramite.firma_cliente, 
-                                    tramite=tramite
-                                )
-                            except TypeError:
-                                #Versión sin Trámite
-                                context = doc_info['builder'](
-                                    fin, cli, ven,
-                                    request=self.request, 
-                                    tpl=tpl,
-                                    firma_data=tramite.firma_cliente
-                                )
-
-                # 2) rellenar plantilla Word
-                tmp_docx = os.path.join(settings.MEDIA_ROOT, 'temp', f"{slug}.docx")
-                os.makedirs(os.path.dirname(tmp_docx), exist_ok=True)
-                tpl.render(context)
-                tpl.save(tmp_docx)
-
-                # 3) convertir a PDF
-                out_pdf = os.path.join(settings.MEDIA_ROOT, 'temp', f"{slug}.pdf")
-                success = convert_docx_to_pdf(tmp_docx, out_pdf)
-                final_file = out_pdf if success else tmp_docx
-
-                # 4) añadir al zip
-                arcname = os.path.basename(final_file)
-                with open(final_file, 'rb') as f:
-                    zf.writestr(arcname, f.read())
-
-        buffer.seek(0)
-        response = HttpResponse(buffer.getvalue(), content_type='application/zip')
+        # Los builders leen la firma del borrador, no de la sesión
+        peticion = peticion_documentos(self.request, tramite)
+
+        # Por defecto el paquete se genera en segundo plano (procesar_documentos)
+        # y la página de progreso consulta el avance con HTMX.
+        if getattr(settings, 'DOCUMENTOS_ASINCRONOS', True):
+            trabajo = encolar_trabajo(tramite, selected, peticion)
+            return redirect('workflow:trabajo_documentos', pk=trabajo.pk)
+
+        # El ZIP se envía mientras se genera: cada PDF sale en cuanto se convierte
+        response = StreamingHttpResponse(
+            flujo_paquete(tramite, selected, peticion),
+            content_type='application/zip'
+        )
         response['Content-Disposition'] = 'attachment; filename=documentos.zip'
         return response
 
+class TrabajoDocumentosView(TemplateView):
+    """Progreso de un paquete de documentos generado en segundo plano."""
+    template_name = "workflow/trabajo_documentos.html"
+
+    def get_trabajo(self):
+        trabajo = get_object_or_404(
+            TrabajoDocumentos.objects.select_related('tramite__cliente'), pk=self.kwargs['pk']
+        )
+        if trabajo.usuario_id and trabajo.usuario_id != self.request.user.id:
+            raise Http404("Trabajo no encontrado")
+        return trabajo
+
+    def get_template_names(self):
+        # HTMX sólo pide el bloque de progreso para refrescarlo
+        if self.request.headers.get('HX-Request'):
+            return ["workflow/partials/trabajo_documentos_progreso.html"]
+        return [self.template_name]
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        trabajo = self.get_trabajo()
+        ctx['trabajo'] = trabajo
+        ctx['documentos'] = [
+            {
+                'slug': slug,
+                'titulo': DOCUMENTOS[slug]['titulo'],
+                'estado': trabajo.progreso.get(slug, 'pendiente'),
+            }
+            for slug in trabajo.documentos
+        ]
+        return ctx
+
+
+class DescargarTrabajoDocumentosView(TrabajoDocumentosView):
+    """Entrega el ZIP de un trabajo terminado desde el storage."""
+
+    def get(self, request, *args, **kwargs):
+        trabajo = self.get_trabajo()
+        if trabajo.estado != 'terminado' or not trabajo.archivo:
+            raise Http404("El paquete todavía no está listo")
+        return FileResponse(trabajo.archivo.open('rb'), as_attachment=True, filename='documentos.zip')
+
+
 class AvisoForm(forms.Form):
     FIRMAR_CHOICES = [
         ('sí', 'Sí, deseo firmar digitalmente'),
@@ -956,73 +710,54 @@ class AvisoPrivacidadView(FormView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        tipo_financiamiento = self.request.session.get('tipo_financiamiento', 'normal')
-        context['es_commeta'] = (tipo_financiamiento == 'commeta')
+        borrador = borrador_actual(self.request)
+        context['es_commeta'] = borrador is not None and borrador.tipo_financiamiento == 'commeta'
         return context
 
     def form_valid(self, form):
         print("=== INICIANDO form_valid ===")  # Esto debería aparecer
-        # 1) Guarda aceptación y firma en sesión
-        self.request.session['privacy_accepted'] = True
+        # 1) El borrador debe tener cliente y persona de los pasos previos
+        borrador = borrador_actual(self.request)
+        if borrador is None or not (borrador.cliente_id and borrador.persona_tipo and borrador.persona_id):
+            return redirect('workflow:paso1_financiamiento')
+
         firmar_digitalmente = form.cleaned_data.get('firmar') == 'sí'
         firma = form.cleaned_data.get('firma_data')
         print(f"¿Firmará digitalmente?: {firmar_digitalmente}")
-        print(f"Firma obtenida: {firma[:50] if firma else 'None'}...")  # Debug
-        # Guardar en sesión según la elección
+        # La firma queda en el almacén de firmas; el borrador guarda sólo su clave
+        clave_firma_cliente = ''
         if firmar_digitalmente and firma:
-            self.request.session['firma_cliente_data'] = firma
-            self.request.session['tipo_firma'] = 'digital'
-            print("✅ Firma digital guardada en sesión")
+            if not registrar_firma(firma):
+                form.add_error('firma_data', 'La firma no es una imagen válida. Vuelve a firmar.')
+                return self.form_invalid(form)
+            clave_firma_cliente = clave_firma(firma)
+            print("✅ Firma digital registrada")
         else:
-            # Usuario prefiere firma física
-            self.request.session['firma_cliente_data'] = None
-            self.request.session['tipo_firma'] = 'fisica'
             print("✅ Usuario optó por firma física")
-        
-        # 2) Recupera IDs de pasos previos (deben existir en sesión)
-        fin_id = self.request.session.get('financiamiento_id')
-        cli_id = self.request.session.get('cliente_id')
-        persona_tipo = self.request.session.get('persona_tipo')  # 'vendedor' o 'propietario'
-        persona_id = self.request.session.get('persona_id')      # ID correspondiente
-        cliente2_data = self.request.session.get('cliente2_data')
-        testigos_data = self.request.session.get('testigos_data', {})
-        beneficiario_data = self.request.session.get('beneficiario_data', {})  # CAMBIO: ahora es beneficiario_data (singular)
-
-        # Campos extra (Edad y Vecino — no pertenecen al modelo Cliente)
-        extra_fields = self.request.session.get('extra_fields', {})
 
-        # NUEVO: Recuperar información de tipo de financiamiento y detalle Commeta
-        tipo_financiamiento = self.request.session.get('tipo_financiamiento', 'normal')
-        fin_commeta_id = self.request.session.get('financiamiento_commeta_id')
+        persona_tipo = borrador.persona_tipo  # 'vendedor' o 'propietario'
+        persona_id = borrador.persona_id      # ID correspondiente
+        print(f"Borrador {borrador.pk} - fin_id: {borrador.financiamiento_id}, cli_id: {borrador.cliente_id}, "
+              f"persona_tipo: {persona_tipo}, tipo financiamiento: {borrador.tipo_financiamiento}")
 
-        print(f"Datos sesión - fin_id: {fin_id}, cli_id: {cli_id}, persona_tipo: {persona_tipo}")
-        print(f"Tipo financiamiento: {tipo_financiamiento}, Fin Commeta ID: {fin_commeta_id}")  # NUEVO
-
-        # Si falta alguno, aborta o redirige al inicio
-        if not (fin_id and cli_id and persona_tipo and persona_id):
-            return redirect('workflow:paso1_financiamiento')
-
-        # 3) Obtén las instancias reales
-        financiamiento = get_object_or_404(Financiamiento, id=fin_id)
-        cliente = get_object_or_404(Cliente, id=cli_id)
+        # 2) Obtén las instancias reales
+        financiamiento = borrador.financiamiento
+        cliente = borrador.cliente
 
         # En form_valid, recuperar la selección de lugar
         lugar_firma = self.request.POST.get('lugar_firma', '')
         es_tonameca = (lugar_firma == 'puerto_escondido')
 
-        # NUEVO: Obtener instancia de FinanciamientoCommeta si existe
+        # Instancia de FinanciamientoCommeta si existe
         financiamiento_commeta = None
-        if tipo_financiamiento == 'commeta' and fin_commeta_id:
-            financiamiento_commeta = get_object_or_404(
-                FinanciamientoCommeta, 
-                id=fin_commeta_id
-            )
+        if borrador.tipo_financiamiento == 'commeta' and borrador.financiamiento_commeta_id:
+            financiamiento_commeta = borrador.financiamiento_commeta
             # Verificar que corresponde al financiamiento base
-            if financiamiento_commeta.financiamiento != financiamiento:
+            if financiamiento_commeta.financiamiento_id != financiamiento.id:
                 raise ValueError("El financiamiento Commeta no corresponde al financiamiento base")
             print(f"✅ Financiamiento Commeta obtenido: {financiamiento_commeta.id}")
 
-        # 3.1) Obtener la instancia correcta según el tipo
+        # 2.1) Obtener la instancia correcta según el tipo
         vendedor = None
         propietario = None
         
@@ -1031,47 +766,28 @@ class AvisoPrivacidadView(FormView):
         else:
             propietario = get_object_or_404(Propietario, id=persona_id)
 
-        # 3.2) Crear segundo cliente si existe
+        # 2.2) Crear segundo cliente si existe
         cliente2 = None
-        if cliente2_data:
-            cliente2 = Cliente.objects.create(**cliente2_data)
+        if borrador.cliente_2_datos:
+            cliente2 = Cliente.objects.create(**borrador.cliente_2_datos)
 
-        # 3.3) NUEVO: Crear beneficiario si existe
+        # 2.3) Crear beneficiario si existe
         beneficiario = None
-        if beneficiario_data:
-            beneficiario = Beneficiario.objects.create(**beneficiario_data)
+        if borrador.beneficiario_datos:
+            beneficiario = Beneficiario.objects.create(**borrador.beneficiario_datos)
             print(f"Beneficiario creado: {beneficiario.nombre_completo}")
 
-        # 3.4) Parsear campos extra — convertir edad a int si está presente
-        edad_cliente_1 = None
-        edad_cliente_2 = None
-        vecino_cliente_1 = None
-        vecino_cliente_2 = None
-
-        if extra_fields:
-            try:
-                edad_cliente_1 = int(extra_fields['edad_cliente_1']) if extra_fields.get('edad_cliente_1') else None
-            except (ValueError, TypeError):
-                edad_cliente_1 = None
-
-            try:
-                edad_cliente_2 = int(extra_fields['edad_cliente_2']) if extra_fields.get('edad_cliente_2') else None
-            except (ValueError, TypeError):
-                edad_cliente_2 = None
-
-            vecino_cliente_1 = extra_fields.get('vecino_cliente_1') or None
-            vecino_cliente_2 = extra_fields.get('vecino_cliente_2') or None
+        # Campos extra (Edad y Vecino — no pertenecen al modelo Cliente)
+        vecino_cliente_1 = borrador.vecino or None
+        vecino_cliente_2 = borrador.vecino_2 or None
 
-        # 4) Crea o actualiza el Tramite
-        tramite_id = self.request.session.get('tramite_id')
-        print(f"Tramite ID en sesión: {tramite_id}")
+        # 3) Crea o actualiza el Tramite
+        tramite = borrador.tramite
 
-        if tramite_id:
+        if tramite is not None:
             # Si ya existe, actualiza
-            tramite = get_object_or_404(Tramite, id=tramite_id)
             print(f"Actualizando trámite existente: {tramite.id}")
             tramite.financiamiento = financiamiento
-            # NUEVO: Actualizar financiamiento_commeta
             tramite.financiamiento_commeta = financiamiento_commeta
             tramite.cliente = cliente
             tramite.vendedor = vendedor
@@ -1083,7 +799,6 @@ class AvisoPrivacidadView(FormView):
             else:
                 tramite.firma_vendedor = None  # O "" si el campo no acepta None
                 print("⚠️ Trámite sin firma digital (se firmará en físico)")
-            #tramite.firma_vendedor = firma or tramite.firma_cliente
             if cliente2:
                 tramite.cliente_2 = cliente2
 
@@ -1091,23 +806,20 @@ class AvisoPrivacidadView(FormView):
             if not tramite.usuario_creador:
                 tramite.usuario_creador = self.request.user
 
-            # Actualizar testigos y beneficiarios si existen
-            if testigos_data:
-                # Ahora ambos testigos son opcionales
-                tramite.testigo_1_nombre = testigos_data.get('testigo1_nombre', '')
-                tramite.testigo_2_nombre = testigos_data.get('testigo2_nombre', '')
-                tramite.testigo_1_idmex  = testigos_data.get('testigo1_idmex', '')   # ← añadir
-                tramite.testigo_2_idmex  = testigos_data.get('testigo2_idmex', '')   # ← añadir
+            # Actualizar testigos si se capturaron
+            if borrador.tiene_testigos:
+                for campo, _ in CAMPOS_TESTIGOS:
+                    setattr(tramite, campo, getattr(borrador, campo))
             
-            # NUEVO: Actualizar beneficiario si existe
+            # Actualizar beneficiario si existe
             if beneficiario:
                 tramite.beneficiario_1 = beneficiario
 
             # Asignar campos extra (solo sobreescribe si hay valor; preserva lo anterior si es None)
-            if edad_cliente_1 is not None:
-                tramite.edad_cliente_1 = edad_cliente_1
-            if edad_cliente_2 is not None:
-                tramite.edad_cliente_2 = edad_cliente_2
+            if borrador.edad_cliente_1 is not None:
+                tramite.edad_cliente_1 = borrador.edad_cliente_1
+            if borrador.edad_cliente_2 is not None:
+                tramite.edad_cliente_2 = borrador.edad_cliente_2
             if vecino_cliente_1 is not None:
                 tramite.vecino = vecino_cliente_1
             if vecino_cliente_2 is not None:
@@ -1119,19 +831,12 @@ class AvisoPrivacidadView(FormView):
             print(f"Trámite {tramite.id} actualizado correctamente")
         else:
             print("Creando nuevo trámite")
-            # Nuevo trámite - asignar testigos y beneficiarios
-            testigo_1_nombre = ""
-            if vendedor:
-                testigo_1_nombre = f"{vendedor.nombre_completo}"
-            elif propietario:
-                testigo_1_nombre = f"{propietario.nombre_completo}"
-
             # ✅ CORRECCIÓN: Asignar firma según la elección
             firma_para_guardar = firma if (firmar_digitalmente and firma) else ""
 
             tramite = Tramite.objects.create(
                 financiamiento=financiamiento,
-                # NUEVO: Asignar financiamiento_commeta (puede ser None)
+                # Asignar financiamiento_commeta (puede ser None)
                 financiamiento_commeta=financiamiento_commeta,
                 cliente=cliente,
                 vendedor=vendedor,
@@ -1142,34 +847,37 @@ class AvisoPrivacidadView(FormView):
                 cliente_2=cliente2,
                 usuario_creador=self.request.user,  # ← Aquí asignamos el usuario
                 # Asignar testigos
-                testigo_1_nombre=testigos_data.get('testigo1_nombre', ''),  # <-- Usa testigos_data
-                testigo_2_nombre=testigos_data.get('testigo2_nombre', ''),
-                testigo_1_idmex=testigos_data.get('testigo1_idmex', ''),   # ← añadir
-                testigo_2_idmex=testigos_data.get('testigo2_idmex', ''),   # ← añadir
-                # NUEVO: Asignar beneficiario (puede ser None)
+                testigo_1_nombre=borrador.testigo_1_nombre,
+                testigo_2_nombre=borrador.testigo_2_nombre,
+                testigo_1_idmex=borrador.testigo_1_idmex,
+                testigo_2_idmex=borrador.testigo_2_idmex,
+                # Asignar beneficiario (puede ser None)
                 beneficiario_1=beneficiario,
                 es_tonameca=es_tonameca,  # ← añadir esta línea
                 # Campos extra Commeta Community
-                edad_cliente_1=edad_cliente_1,
-                edad_cliente_2=edad_cliente_2,
+                edad_cliente_1=borrador.edad_cliente_1,
+                edad_cliente_2=borrador.edad_cliente_2,
                 vecino=vecino_cliente_1,
                 vecino_2=vecino_cliente_2,
             )
             if tramite.financiamiento.tipo_pago == 'PAGOS':
                 GeneradorCuotasService.generar_cuotas(tramite)
-            
-            self.request.session['tramite_id'] = tramite.id
 
-        # 5) Generar los links de firma para todos los involucrados
+        # 4) Generar los links de firma para todos los involucrados
         tramite.generar_links_firma()
 
-        # Limpiar datos temporales de la sesión
-        session_keys = ['cliente2_data', 'testigos_data', 'beneficiario_data', 'extra_fields']  # CAMBIO: beneficiarios_data -> beneficiario_data
-        for key in session_keys:
-            if key in self.request.session:
-                del self.request.session[key]
+        # 5) El borrador queda ligado al trámite con el aviso aceptado. Lo
+        # capturado en el paso 2 ya pasó al trámite y se vacía, para no
+        # volver a crear el segundo cliente ni el beneficiario si se reenvía.
+        borrador.actualizar(
+            tramite_id=tramite.id,
+            aviso_aceptado=True,
+            tipo_firma='digital' if firmar_digitalmente and firma else 'fisica',
+            firma_cliente=clave_firma_cliente,
+            **BorradorTramite.CAPTURA_CLIENTES,
+        )
 
-        # 5) Vamos a la selección de documentos
+        # 6) Vamos a las cláusulas especiales
         return redirect('workflow:clausulas_especiales')
     
     def form_invalid(self, form):
@@ -1178,32 +886,66 @@ class AvisoPrivacidadView(FormView):
         print(f"Errores: {form.errors}")
         return super().form_invalid(form)
 
+PLANES_POR_PAGINA = 12
+
+
+def planes_disponibles(params):
+    """
+    Planes de financiamiento que se pueden elegir en el paso 1, filtrados
+    por `params`: tipo ('normal' o 'commeta'), proyecto (ID), lote
+    (identificador exacto) y cliente (parte del nombre).
+    """
+    planes = Financiamiento.objects.select_related(
+        'lote__proyecto',
+        'detalle_commeta__configuracion_original',
+    ).filter(
+        activo=True,
+        es_cotizacion=False,
+        lote__proyecto__tipo_proyecto__in=('normal', 'commeta'),
+    )
+
+    tipo = params.get('tipo')
+    if tipo in ('normal', 'commeta'):
+        planes = planes.filter(lote__proyecto__tipo_proyecto=tipo)
+
+    proyecto = params.get('proyecto', '')
+    if proyecto.isdigit():
+        planes = planes.filter(lote__proyecto_id=proyecto)
+
+    lote = params.get('lote', '').strip()
+    if lote:
+        planes = planes.filter(lote__identificador=lote)
+
+    cliente = normalizar_busqueda(params.get('cliente', ''))
+    if cliente:
+        planes = planes.filter(nombre_cliente_busqueda__contains=cliente)
+
+    return planes
+
+
+def ajax_planes_financiamiento(request):
+    """
+    Siguiente página de planes del paso 1 (búsqueda y "Ver más"): el HTML de
+    las tarjetas y el cursor de la página que sigue.
+    """
+    pagina = paginar_por_cursor(
+        planes_disponibles(request.GET), PLANES_POR_PAGINA, despues=request.GET.get('despues')
+    )
+    html = render_to_string('workflow/partials/planes_financiamiento.html', {'planes': pagina}, request=request)
+    return JsonResponse({'html': html, 'siguiente': pagina.cursor_siguiente})
+
+
 class Paso1FinanciamientoView(TemplateView):
     template_name = "workflow/paso1_financiamiento.html"
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
         
-        # Obtener financiamientos normales activos
-        financiamientos_normales = Financiamiento.objects.select_related(
-            'lote__proyecto'
-        ).filter(
-            activo=True,
-            es_cotizacion=False,
-            lote__proyecto__tipo_proyecto='normal'  # Solo proyectos normales
-        )
-        
-        # Obtener financiamientos Commeta activos
-        financiamientos_commeta = Financiamiento.objects.select_related(
-            'lote__proyecto'
-        ).filter(
-            activo=True,
-            es_cotizacion=False,
-            lote__proyecto__tipo_proyecto='commeta'  # Solo proyectos Commeta
-        ).prefetch_related('detalle_commeta')  # Incluir detalle Commeta
-        
-        ctx['financiamientos_normales'] = financiamientos_normales
-        ctx['financiamientos_commeta'] = financiamientos_commeta
+        # Sólo la primera página; el resto se pide con ajax_planes_financiamiento
+        ctx['planes'] = paginar_por_cursor(planes_disponibles(self.request.GET), PLANES_POR_PAGINA)
+        ctx['proyectos'] = Proyecto.objects.filter(
+            tipo_proyecto__in=('normal', 'commeta')
+        ).order_by('nombre').only('id', 'nombre')
         
         return ctx
 
@@ -1214,46 +956,30 @@ class Paso1FinanciamientoView(TemplateView):
             messages.error(request, "Por favor selecciona un plan de financiamiento.")
             return self.get(request, *args, **kwargs)
 
-        # Limpiar todos los datos de sesión relacionados con trámites anteriores
-        session_keys_to_clear = [
-            'financiamiento_id',  # aunque lo vamos a reemplazar, es bueno limpiarlo primero
-            'financiamiento_commeta_id',  # NUEVO: para commeta
-            'tipo_financiamiento',        # NUEVO: para identificar tipo
-            'cliente_id',
-            'vendedor_id',
-            'tramite_id',
-            'privacy_accepted',
-            'firma_cliente_data',
-            'cliente2_data',
-            'clausulas_especiales'
-        ]
-        
-        for key in session_keys_to_clear:
-            if key in request.session:
-                del request.session[key]
-
-        # Guardar en sesión para los pasos siguientes
-        request.session['financiamiento_id'] = int(plan_id)
-
         # Determinar si es Commeta o normal
         try:
-            fin = Financiamiento.objects.select_related('lote__proyecto').get(id=plan_id)
-            
-            if fin.lote.proyecto.tipo_proyecto == 'commeta':
-                # Es Commeta - guardar tipo y detalle
-                request.session['tipo_financiamiento'] = 'commeta'
-                # Guardar ID del FinanciamientoCommeta si existe
-                if hasattr(fin, 'detalle_commeta'):
-                    request.session['financiamiento_commeta_id'] = fin.detalle_commeta.id
-                    print(f"✅ Financiamiento Commeta detectado. ID detalle: {fin.detalle_commeta.id}")
-            else:
-                # Es normal
-                request.session['tipo_financiamiento'] = 'normal'
-                
+            fin = Financiamiento.objects.select_related('lote__proyecto', 'detalle_commeta').get(id=plan_id)
         except Financiamiento.DoesNotExist:
             from django.contrib import messages
             messages.error(request, "El financiamiento seleccionado no existe.")
             return self.get(request, *args, **kwargs)
+
+        tipo_financiamiento = 'normal'
+        fin_commeta_id = None
+        if fin.lote.proyecto.tipo_proyecto == 'commeta':
+            tipo_financiamiento = 'commeta'
+            # ID del FinanciamientoCommeta si existe
+            if hasattr(fin, 'detalle_commeta'):
+                fin_commeta_id = fin.detalle_commeta.id
+                print(f"✅ Financiamiento Commeta detectado. ID detalle: {fin_commeta_id}")
+
+        # Cada plan elegido abre un borrador nuevo para los pasos siguientes
+        iniciar_borrador(
+            request,
+            financiamiento=fin,
+            financiamiento_commeta_id=fin_commeta_id,
+            tipo_financiamiento=tipo_financiamiento,
+        )
         
         return redirect('workflow:paso2_cliente')
 
@@ -1262,34 +988,29 @@ class FirmaBaseView(FormView):
     template_name = None  # Cada vista hija debe definir su template
     form_class = FirmaForm  # Necesitamos crear este formulario
     
+    def get_token_firma(self, token):
+        """TokenFirma vigente del link (resuelto una vez por petición) o None."""
+        if not hasattr(self, '_token_firma'):
+            self._token_firma = TokenFirma.objects.resolver(token)
+        return self._token_firma
+
     def get_tramite_desde_token(self, token):
-        """Encuentra el trámite a partir de cualquier token de firma"""
-        # Buscar en todos los campos posibles
-        campos_busqueda = [
-            ('link_firma_cliente', 'cliente'),
-            ('link_firma_cliente2', 'segundo_cliente'),
-            ('link_firma_beneficiario1', 'beneficiario'),
-            ('link_firma_testigo1', 'testigo1'),
-            ('link_firma_testigo2', 'testigo2'),
-            ('link_firma_vendedor', 'vendedor'),
-        ]
-        
-        for campo, tipo in campos_busqueda:
-            try:
-                tramite = Tramite.objects.get(**{campo: token})
-                return tramite, tipo
-            except Tramite.DoesNotExist:
-                continue
-        
-        return None, None
+        """Encuentra el trámite y el tipo de firmante a partir de cualquier token de firma"""
+        token_firma = self.get_token_firma(token)
+        if token_firma is None:
+            return None, None
+        return token_firma.tramite, token_firma.rol
+
+    def get_tramite_o_404(self):
+        """(trámite, tipo de firmante) del link, o Http404 si ya no vale."""
+        tramite, tipo_firmante = self.get_tramite_desde_token(self.kwargs['token'])
+        if not tramite:
+            raise Http404("Token no válido o enlace expirado.")
+        return tramite, tipo_firmante
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        token = self.kwargs['token']
-        tramite, tipo_firmante = self.get_tramite_desde_token(token)
-        
-        if not tramite:
-            raise Http404("Token no válido o enlace expirado.")
+        tramite, tipo_firmante = self.get_tramite_o_404()
         
         # Definir título y subtítulo según el tipo de firmante
         titulos = {
@@ -1314,24 +1035,36 @@ class FirmaBaseView(FormView):
 
     def form_valid(self, form):
         token = self.kwargs['token']
-        tramite, tipo_firmante = self.get_tramite_desde_token(token)
+        tramite, tipo_firmante = self.get_tramite_o_404()
         firma_data = form.cleaned_data['firma_data']
         
-        # Guardar la firma según el tipo de firmante
-        if tipo_firmante == 'cliente':
-            tramite.firma_cliente = firma_data
-        elif tipo_firmante == 'segundo_cliente':
-            tramite.firma_cliente2 = firma_data
-        elif tipo_firmante == 'beneficiario':
-            tramite.beneficiario_1_firma = firma_data
-        elif tipo_firmante == 'testigo1':
-            tramite.testigo_1_firma = firma_data
-        elif tipo_firmante == 'testigo2':
-            tramite.testigo_2_firma = firma_data
-        elif tipo_firmante == 'vendedor':
-            tramite.firma_vendedor = firma_data
+        # Decodificar y guardar la imagen una sola vez; los builders la toman
+        # del almacén de firmas en cada render
+        if not registrar_firma(firma_data):
+            form.add_error('firma_data', 'La firma no es una imagen válida. Vuelve a firmar.')
+            return self.form_invalid(form)
         
-        tramite.save()
+        with transaction.atomic():
+            # Reclamar el token antes de escribir: de dos envíos del mismo
+            # link de un solo uso, sólo uno guarda la firma
+            if not self.get_token_firma(token).reclamar():
+                raise Http404("Token no válido o enlace expirado.")
+
+            # Guardar la firma según el tipo de firmante
+            if tipo_firmante == 'cliente':
+                tramite.firma_cliente = firma_data
+            elif tipo_firmante == 'segundo_cliente':
+                tramite.firma_cliente2 = firma_data
+            elif tipo_firmante == 'beneficiario':
+                tramite.beneficiario_1_firma = firma_data
+            elif tipo_firmante == 'testigo1':
+                tramite.testigo_1_firma = firma_data
+            elif tipo_firmante == 'testigo2':
+                tramite.testigo_2_firma = firma_data
+            elif tipo_firmante == 'vendedor':
+                tramite.firma_vendedor = firma_data
+
+            tramite.save()
         
         # Redirigir a página de éxito
         return redirect('workflow:firma_exitosa')
@@ -1361,8 +1094,7 @@ class FirmaBeneficiarioView(FirmaBaseView):
     
     def post(self, request, *args, **kwargs):
         # Manejar tanto los datos del beneficiario como la firma
-        token = self.kwargs['token']
-        tramite, tipo_firmante = self.get_tramite_desde_token(token)
+        tramite, tipo_firmante = self.get_tramite_o_404()
         
         # Si el beneficiario existe, actualizar sus datos
         if tramite.beneficiario_1:
@@ -1381,12 +1113,11 @@ class FirmaTestigo1View(FirmaBaseView):
     template_name = 'workflow/firma_testigo.html'
 
     def form_valid(self, form):
-        token = self.kwargs['token']
-        tramite, _ = self.get_tramite_desde_token(token)
+        tramite, _ = self.get_tramite_o_404()
         idmex = self.request.POST.get('idmex_testigo', '').strip()
         if idmex:
+            # Se guarda junto con la firma, una vez reclamado el token
             tramite.testigo_1_idmex = idmex
-            tramite.save(update_fields=['testigo_1_idmex'])
         return super().form_valid(form)
 
 
@@ -1394,12 +1125,11 @@ class FirmaTestigo2View(FirmaBaseView):
     template_name = 'workflow/firma_testigo.html'
 
     def form_valid(self, form):
-        token = self.kwargs['token']
-        tramite, _ = self.get_tramite_desde_token(token)
+        tramite, _ = self.get_tramite_o_404()
         idmex = self.request.POST.get('idmex_testigo', '').strip()
         if idmex:
+            # Se guarda junto con la firma, una vez reclamado el token
             tramite.testigo_2_idmex = idmex
-            tramite.save(update_fields=['testigo_2_idmex'])
         return super().form_valid(form)
         
 # Vista de éxito después de firmar